@@ -4,11 +4,17 @@
 import logging
 import yaml
 import os
+import itertools
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 import sys
+import threading
+import time
 from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from typing import Any, Iterable, List
 
 import pandas as pd
@@ -19,14 +25,41 @@ try:
 except Exception:
     pytest = None
 
-from src.extract import APIDataExtractor
-from src.transform import DataTransformer
+from src.extract import APIDataExtractor, resolve_sources
+from src.cache import ExtractCache
+from src.checkpoint import RunCheckpoint
+from src.landing import LandingZone, new_run_id
+from src.lookup import ProductLookup
+from src.incremental import compute_watermark, date_filter_params, filter_new_carts
+from src.snapshot import read_snapshot, resolve_format, write_snapshot
+from src.records import RecordBatch, concat, distinct_values, take
+from src.scheduler import TaskGraph
+from src.spill import MB, ChunkedRecords, DatasetStore, MemoryBudget, iter_chunks, pin_datasets
+from src.state import StateStore
+from src.stages import StageRunner
+from src.streaming import StreamState
+from src.transform import create_transformer
+from src.writer import BackgroundWriter
 from src.load import DataLoader
 from src.data_quality import DataQualityChecker
-from src.utils import setup_logging, load_config
+from src.utils import batched, content_hash, setup_logging, load_config
+
+# Salidas procesadas de cada endpoint (para omitir entidades sin cambios)
+ENTITY_OUTPUTS = {
+    'products': ['products'],
+    'users': ['users', 'geography'],
+    'carts': ['sales', 'dates'],
+}
+
+# Dimensiones lookup opcionales (etl.lookup_dimensions): atributo -> (tipo de carga, dataset origen)
+LOOKUP_DIMENSIONS = {
+    'category': ('categories', 'products'),
+}
+
 
 class ETLPipeline:
-    def __init__(self, config_path="config/config.yaml", force_refresh=False):
+    def __init__(self, config_path="config/config.yaml", force_refresh=False, incremental=None,
+                 replay=None, streaming=None, overlap=None, dag=None, resume=None):
         """Inicializa el pipeline ETL con configuración."""
         # Get the directory containing the script
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -39,6 +72,29 @@ class ETLPipeline:
         self.config = load_config(config_path)
         setup_logging()
         self.logger = logging.getLogger(__name__)
+        # Modo incremental: CLI/argumento o etl.incremental.enabled
+        if incremental is None:
+            incremental = bool(self._incremental_config().get('enabled', False))
+        self.incremental = incremental
+        # Reprocesar una ejecución guardada en la landing zone en lugar de extraer
+        self.replay = replay
+        # Modo streaming: cada chunk pasa por transform/DQ/LOAD antes del siguiente
+        if streaming is None:
+            streaming = bool((self.config.get('etl') or {}).get('streaming', False))
+        self.streaming = streaming
+        # Etapas solapadas (extract || transform+DQ || load) sobre el flujo por chunks
+        if overlap is None:
+            overlap = bool(self._overlap_config().get('enabled', False))
+        self.overlap = overlap
+        # Modo batch como DAG de tareas por entidad ejecutadas en paralelo
+        if dag is None:
+            dag = bool(self._scheduler_config().get('enabled', False))
+        self.dag = dag
+        # Reanudar una ejecución fallida: los checkpoints son del flujo batch
+        self.resume = resume
+        if resume:
+            self.streaming = self.overlap = self.dag = False
+        self.run_id = new_run_id()
         
         # Seleccionar un directorio base escribible para cache/raw/processed.
         # Algunos entornos (p. ej. el contenedor Airflow) pueden montar el repo
@@ -81,25 +137,85 @@ class ETLPipeline:
         # Crear directorio de caché si no existe
         self.cache_dir = os.path.join(base_dir, 'ecommerce_etl', 'cache')
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.cache = ExtractCache(self.cache_dir, self.config)
 
         # Directorios para persistir datos raw y procesados
         self.raw_dir = os.path.join(base_dir, 'ecommerce_etl', 'data', 'raw')
         self.processed_dir = os.path.join(base_dir, 'ecommerce_etl', 'data', 'processed')
         os.makedirs(self.raw_dir, exist_ok=True)
         os.makedirs(self.processed_dir, exist_ok=True)
+        # Histórico raw particionado por endpoint/fecha/ejecución
+        self.landing = LandingZone(os.path.join(base_dir, 'ecommerce_etl', 'data', 'landing'), self.config)
+        # Formato de snapshots raw/processed: json (default), parquet o arrow
+        self.snapshot_format = resolve_format(self.config.get('etl', {}).get('snapshot_format', 'json'))
+
+        # Estado persistente entre ejecuciones (marcas de agua, etc.)
+        self.state_dir = os.path.join(base_dir, 'ecommerce_etl', 'state')
+        self.state = StateStore(os.path.join(self.state_dir, 'pipeline_state.json'))
+        # Checkpoint de esta ejecución (fases, salidas intermedias, offsets de LOAD);
+        # opt-in con etl.checkpoint.enabled: una ejecución exitosa nunca lo usa
+        checkpoint_cfg = (self.config.get('etl') or {}).get('checkpoint') or {}
+        checkpoint_root = os.path.join(self.state_dir, 'checkpoints')
+        checkpoint_fmt = checkpoint_cfg.get('format', 'arrow')
+        if resume:
+            self.checkpoint = RunCheckpoint.resume(checkpoint_root, resume, checkpoint_fmt)
+            self.run_id = self.checkpoint.run_id
+        else:
+            self.checkpoint = RunCheckpoint(checkpoint_root, self.run_id, checkpoint_fmt,
+                                            enabled=bool(checkpoint_cfg.get('enabled', False)))
+        # Presupuesto de memoria de los datasets intermedios (spill a disco local)
+        memory_cfg = (self.config.get('etl') or {}).get('memory') or {}
+        budget_mb = memory_cfg.get('budget_mb')
+        self.memory = MemoryBudget(
+            os.path.join(base_dir, 'ecommerce_etl', 'spill', self.run_id),
+            int(float(budget_mb) * MB) if budget_mb else None,
+            memory_cfg.get('spill_format', 'arrow'),
+            chunk_rows=int(memory_cfg.get('chunk_rows', 5000)),
+        )
+        self._pending_watermarks = {}
+        # Hashes de contenido raw de esta ejecución y salidas reutilizadas de
+        # entidades sin cambios desde el último LOAD
+        self._pending_hashes = {}
+        self.reused_data = {}
         
         # Inicializar componentes
-        self.extractor = APIDataExtractor(self.config)
-        self.transformer = DataTransformer(self.config)
+        self.extractor = APIDataExtractor(
+            self.config, pool_size=self._max_workers(), cache_dir=self.cache_dir
+        )
+        self.transformer = create_transformer(self.config)
         self.loader = DataLoader(self.config)
         self.dq_checker = DataQualityChecker(self.config)
+        # El memo vive en state_dir: el LRU del caché no debe desalojarlo
+        self.product_lookup = ProductLookup(
+            self.extractor,
+            os.path.join(self.state_dir, 'product_lookup.json'),
+            (self.config['api'].get('endpoints') or {}).get('products', '/products'),
+            self._lookup_negative_ttl()
+        )
+        self._source_lookups = {}
+        self._lookups_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Snapshots raw/processed y landing se escriben en segundo plano
+        writer_cfg = self.config.get('etl', {}).get('background_writer') or {}
+        self.writer = BackgroundWriter(
+            max_pending=writer_cfg.get('max_pending', 8),
+            enabled=writer_cfg.get('enabled', True),
+        )
+        # Las salidas de cada fase se persisten fuera del camino crítico
+        self.checkpoint.writer = self.writer
         
         self.stats = {
             'start_time': None,
             'end_time': None,
             'records_processed': 0,
-            'errors': []
+            'errors': [],
+            'cache': self.cache.stats,
+            'writer': self.writer.stats,
+            'skipped_entities': [],
+            'memory': self.memory.stats
         }
+        if self.extractor.hedging.enabled:
+            self.stats['hedging'] = self.extractor.hedging.stats
 
     def _log_sample(self, data: Any, label: str, max_cols: int = 10) -> None:
         """Loggea una muestra de los datos usando pandas si es posible."""
@@ -116,14 +232,16 @@ class ETLPipeline:
                 return
 
             if isinstance(data, Iterable) and not isinstance(data, (str, bytes)):
-                data_list = list(data)
-                if not data_list:
+                # Solo se necesita el primer registro (no copiar lotes grandes)
+                first = next(iter(data), None)
+                if first is None:
                     self.logger.info(f"Muestra {label}: []")
                     return
 
-                first = data_list[0]
+                if isinstance(first, Mapping):
+                    first = dict(first)
                 if isinstance(first, dict):
-                    df = pd.DataFrame(data_list[:1])
+                    df = pd.DataFrame([first])
                     if df.empty:
                         self.logger.info(f"Muestra {label}: <sin filas>")
                         return
@@ -142,50 +260,137 @@ class ETLPipeline:
 
     def _get_cache_path(self, endpoint_name):
         """Retorna la ruta del archivo de caché para un endpoint."""
-        return os.path.join(self.cache_dir, f"{endpoint_name}.json")
+        return self.cache.find_path(endpoint_name) or self.cache.path_for(endpoint_name)
 
-    def _load_from_cache(self, endpoint_name):
-        """Carga datos desde el caché si existe."""
-        cache_path = self._get_cache_path(endpoint_name)
-        if os.path.exists(cache_path):
+    def _load_from_cache(self, endpoint_name, allow_stale=False):
+        """Carga datos desde el caché si existe y su TTL sigue vigente."""
+        data = self.cache.get(endpoint_name, allow_stale=allow_stale)
+        if data is not None:
             self.logger.info(f"Cargando {endpoint_name} desde caché")
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-        return None
+        return data
+
+    def _iter_from_cache(self, endpoint_name, batch_size=None):
+        """Lee el caché de un endpoint de forma incremental (registros o lotes)."""
+        records = self.cache.iter_records(endpoint_name, batch_size=batch_size)
+        if records is not None:
+            self.logger.info(f"Leyendo {endpoint_name} desde caché en streaming")
+        return records
+
+    def _save_to_cache(self, endpoint_name, data, validators=None, extractor=None):
+        """Guarda en caché (atómico y comprimido) y luego los validadores.
+
+        Es síncrono: corre dentro del fill, con el lock de la entrada tomado,
+        para que otro proceso que espera el lock encuentre la entrada escrita.
+        """
+        extractor = extractor or self.extractor
+        self.cache.put(endpoint_name, data)
+        if validators is not None:
+            extractor.save_validators(endpoint_name, validators)
+        self.logger.info(f"{endpoint_name} guardado en caché")
+
+    def _persist_snapshot(self, directory, key, data, label):
+        """Encola la escritura de un snapshot raw/processed."""
+        def _write():
+            path = write_snapshot(data, directory, key, self.snapshot_format)
+            self.logger.info(f"{label} guardada en {path}")
 
-    def _save_to_cache(self, endpoint_name, data):
-        """Guarda datos en el caché."""
-        cache_path = self._get_cache_path(endpoint_name)
-        self.logger.info(f"Guardando {endpoint_name} en caché")
-        with open(cache_path, 'w') as f:
-            json.dump(data, f)
+        self.writer.submit(f"{label} {key}", _write)
+
+    def _drain_writer(self):
+        """Espera las escrituras pendientes y registra sus errores."""
+        for error in self.writer.flush():
+            self.stats['errors'].append(error)
 
     def run(self):
         """Ejecuta el pipeline ETL completo."""
         self.stats['start_time'] = datetime.now()
+        # Un único timestamp de ejecución para created_at/loaded_at
+        self.transformer.dates.start_run(self.stats['start_time'])
         self.logger.info("Iniciando pipeline ETL")
         
         try:
-            # EXTRACT
-            raw_data = self._extract_phase()
-            
-            # TRANSFORM
-            transformed_data = self._transform_phase(raw_data)
-            
-            # DATA QUALITY
-            dq_ok = self._data_quality_phase(transformed_data)
-            if not dq_ok:
-                self.logger.warning("Data Quality detectó problemas; registros inválidos fueron omitidos del LOAD.")
+            if self.overlap:
+                self._run_overlapped()
+                self._commit_watermarks()
+                self._drain_writer()
+                self.stats['end_time'] = datetime.now()
+                self._log_summary()
+                return
+
+            if self.streaming:
+                self._run_streaming()
+                self._commit_watermarks()
+                self._drain_writer()
+                self.stats['end_time'] = datetime.now()
+                self._log_summary()
+                return
+
+            if self.dag:
+                # EXTRACT -> TRANSFORM -> DQ -> LOAD por entidad, según dependencias
+                transformed_data = self._run_scheduled()
+            else:
+                checkpoint = self.checkpoint
+                if self.resume:
+                    self._restore_checkpoint_context()
+                    self.logger.info(f"Reanudando ejecución {self.run_id} desde la fase {checkpoint.next_phase()}")
+
+                # Al reanudar se parte de la salida persistida más reciente
+                if checkpoint.done('data_quality'):
+                    transformed_data = self.memory.datasets('transformed')
+                    transformed_data.update(checkpoint.iter_outputs('data_quality'))
+                elif checkpoint.done('transform'):
+                    transformed_data = self.memory.datasets('transformed')
+                    transformed_data.update(checkpoint.iter_outputs('transform'))
+                else:
+                    # Los payloads raw cuentan en el presupuesto de memoria (pueden ir a disco)
+                    raw_data = self.memory.datasets('raw')
+                    if checkpoint.done('extract'):
+                        raw_data.update(checkpoint.iter_outputs('extract'))
+                    else:
+                        # EXTRACT (o replay desde la landing zone)
+                        raw_data.update(self._replay_phase(self.replay) if self.replay else self._extract_phase())
+                        checkpoint.complete('extract', raw_data, fmt='json', context=self._checkpoint_context())
+                    
+                    # TRANSFORM
+                    transformed_data = self._transform_phase(raw_data)
+                    # Los payloads raw ya no se necesitan: se liberan antes de DQ y LOAD
+                    raw_data.clear()
+                    checkpoint.complete('transform', transformed_data, context=self._checkpoint_context())
+                
+                # DATA QUALITY
+                if not checkpoint.done('data_quality'):
+                    dq_ok = self._data_quality_phase(transformed_data)
+                    if not dq_ok:
+                        self.logger.warning("Data Quality detectó problemas; registros inválidos fueron omitidos del LOAD.")
+                    checkpoint.complete('data_quality', transformed_data)
+
+                # TESTS (pytest)
+                if not checkpoint.done('tests'):
+                    tests_ok = self._tests_phase()
+                    if not tests_ok:
+                        self.logger.warning("Tests fallidos. Se registraron errores, pero el LOAD continuará omitiendo registros inválidos.")
+                    checkpoint.complete('tests')
+
+                # (no synthetic fallback records by design)
 
-            # TESTS (pytest)
-            tests_ok = self._tests_phase()
-            if not tests_ok:
-                self.logger.warning("Tests fallidos. Se registraron errores, pero el LOAD continuará omitiendo registros inválidos.")
+                # LOAD (cada tabla desde su último lote confirmado). Las fases
+                # previas deben constar en el checkpoint antes del primer offset.
+                if checkpoint.enabled:
+                    self._drain_writer()
+                self._load_phase(transformed_data)
+                checkpoint.complete('load')
 
-            # (no synthetic fallback records by design)
+            # Avanzar marcas de agua y hashes solo después de un LOAD exitoso
+            self._commit_watermarks()
+            self._commit_content_hashes(transformed_data)
 
-            # LOAD
-            self._load_phase(transformed_data)
+            # Las escrituras en segundo plano se esperan solo al final
+            self._drain_writer()
+            self._apply_landing_retention()
+            # La ejecución terminó: su checkpoint y los spills ya no hacen falta
+            self.checkpoint.clear()
+            self._apply_checkpoint_retention()
+            self.memory.close()
             
             self.stats['end_time'] = datetime.now()
             self._log_summary()
@@ -193,108 +398,777 @@ class ETLPipeline:
         except Exception as e:
             self.logger.error(f"Error en pipeline ETL: {str(e)}")
             self.stats['errors'].append(str(e))
+            self._drain_writer()
+            self.memory.close()
+            if self.checkpoint.exists():
+                self.logger.error(f"Progreso guardado; reanudar con --resume {self.run_id}")
             raise
 
+    def _chunk_size(self):
+        """Registros por chunk del modo streaming (etl.chunk_size)."""
+        return max(1, int((self.config.get('etl') or {}).get('chunk_size', 500) or 500))
+
+    def _run_streaming(self):
+        """Pipeline por chunks: products, users y luego carts, cada chunk hasta LOAD.
+
+        Solo un chunk raw/transformado está vivo a la vez; lo que cruza chunks
+        (precios, claves cargadas, carritos vistos, date_keys) vive en StreamState.
+        """
+        self.logger.info(f"Iniciando pipeline en modo STREAMING (chunk_size={self._chunk_size()})")
+        if not self._tests_phase():
+            self.logger.warning("Tests fallidos. Se registraron errores, pero el LOAD continuará omitiendo registros inválidos.")
+
+        state = StreamState()
+        replayed = self._replay_phase(self.replay) if self.replay else None
+        sources = resolve_sources(self.config)
+        # Las dimensiones primero: las ventas se validan contra lo ya cargado
+        for endpoint_name in ('products', 'users', 'carts'):
+            if replayed is not None:
+                chunks = batched(replayed.pop(endpoint_name, []), self._chunk_size())
+            else:
+                chunks = (
+                    chunk
+                    for source in sources if endpoint_name in source['endpoints']
+                    for chunk in self._stream_endpoint(endpoint_name, source['endpoints'][endpoint_name], source)
+                )
+            for chunk in chunks:
+                self._process_chunk(endpoint_name, chunk, state)
+        stats = self.stats.get('streaming') or {}
+        self.logger.info(f"Streaming: {stats.get('chunks', 0)} chunks, {stats.get('records', 0)} registros raw")
+
+    def _stream_endpoint(self, endpoint_name, endpoint_path, source=None):
+        """Chunks de registros raw de un endpoint: caché vigente o API en streaming."""
+        key = self._source_key(endpoint_name, source)
+        extractor = self.extractor.for_source(source) if source and source.get('tagged') else self.extractor
+        chunk_size = self._chunk_size()
+        if self.incremental and endpoint_name in self._incremental_entities():
+            # El delta ya viene filtrado por la marca de agua
+            chunks = batched(self._extract_incremental(key, endpoint_path, extractor), chunk_size)
+        else:
+            chunks = None if self.force_refresh else self._iter_from_cache(key, batch_size=chunk_size)
+            if chunks is None:
+                chunks = extractor.stream_endpoint(key, endpoint_path, batch_size=chunk_size)
+        for chunk in chunks:
+            if source and source.get('tagged'):
+                for record in chunk:
+                    record['source'] = source['name']
+            yield chunk
+
+    def _process_chunk(self, endpoint_name, records, state):
+        """Transform, DQ y LOAD de un chunk raw."""
+        for data in self._prepare_chunk(endpoint_name, records, state):
+            self._load_datasets(data)
+
+    def _prepare_chunk(self, endpoint_name, records, state):
+        """Transform y DQ de un chunk raw; retorna los datasets a cargar, en orden.
+
+        Las claves validadas quedan en `state` de inmediato: la carga es FIFO,
+        así que las dimensiones llegan a la base antes que las ventas que las usan.
+        """
+        prepared = []
+        stats = self.stats.setdefault('streaming', {'chunks': 0, 'records': 0, 'duplicates': 0})
+        stats['chunks'] += 1
+        stats['records'] += len(records)
+
+        if endpoint_name == 'products':
+            state.add_products(records)
+            data = {'products': self.transformer.transform_products(records)}
+        elif endpoint_name == 'users':
+            data = dict(self.transformer.transform_users(records))
+        else:
+            records, duplicates = state.new_carts(records)
+            if duplicates:
+                stats['duplicates'] += duplicates
+                self.logger.warning(f"Streaming: {duplicates} carritos repetidos de chunks anteriores omitidos")
+            # Productos referenciados y ausentes: se cargan antes que las ventas
+            missing = self._lookup_missing_products(records, state.product_refs())
+            if missing:
+                prepared.extend(self._prepare_chunk('products', missing, state))
+            sales = self.transformer.transform_carts(records, None, state.price_index(self.transformer))
+            data = {
+                'sales': sales,
+                'dates': state.new_dates(self.transformer.generate_date_dimension(sales)),
+            }
+
+        results = self.dq_checker.validate_full_dataset(data, state.reference())
+        if not results['is_valid']:
+            self.logger.warning(f"DQ del chunk de {endpoint_name}: {results['errors_found']} problemas")
+        self._apply_dq_exclusions(data, results.get('error_details', []))
+        self.stats['errors'].extend(results['errors'])
+
+        state.remember(data)
+        prepared.append(data)
+        return prepared
+
+    def _overlap_config(self):
+        """Sección etl.overlap de la configuración."""
+        return (self.config.get('etl') or {}).get('overlap') or {}
+
+    def _run_overlapped(self):
+        """Modo streaming con etapas solapadas: EXTRACT || TRANSFORM+DQ || LOAD.
+
+        Cada endpoint se descarga en su propio thread hacia una cola acotada;
+        un thread transforma y valida (dimensiones primero) y el thread actual
+        carga. Las colas llenas frenan a la etapa anterior (backpressure).
+        """
+        runner = StageRunner(queue_size=int(self._overlap_config().get('queue_size', 4)))
+        self.logger.info(
+            f"Iniciando pipeline con etapas solapadas (chunk_size={self._chunk_size()}, cola={runner.queue_size})"
+        )
+        if not self._tests_phase():
+            self.logger.warning("Tests fallidos. Se registraron errores, pero el LOAD continuará omitiendo registros inválidos.")
+
+        state = StreamState()
+        replayed = self._replay_phase(self.replay) if self.replay else None
+        sources = resolve_sources(self.config)
+        endpoints = ('products', 'users', 'carts')
+        raw_channels = {name: runner.channel(name) for name in endpoints}
+        load_channel = runner.channel('load')
+
+        def _timed(stage, iterator):
+            # Tiempo de trabajo de la etapa sin contar las esperas de cola
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    runner.add_busy(stage, time.perf_counter() - start)
+                yield item
+
+        def _extract(endpoint_name):
+            if replayed is not None:
+                chunks = batched(replayed.get(endpoint_name, []), self._chunk_size())
+            else:
+                chunks = (
+                    chunk
+                    for source in sources if endpoint_name in source['endpoints']
+                    for chunk in self._stream_endpoint(endpoint_name, source['endpoints'][endpoint_name], source)
+                )
+            for chunk in _timed('extract', iter(chunks)):
+                raw_channels[endpoint_name].put(chunk)
+            raw_channels[endpoint_name].close()
+
+        def _transform():
+            for endpoint_name in endpoints:
+                for chunk in raw_channels[endpoint_name]:
+                    start = time.perf_counter()
+                    prepared = self._prepare_chunk(endpoint_name, chunk, state)
+                    runner.add_busy('transform', time.perf_counter() - start)
+                    for data in prepared:
+                        load_channel.put(data)
+            load_channel.close()
+
+        def _load():
+            for data in load_channel:
+                start = time.perf_counter()
+                self._load_datasets(data)
+                runner.add_busy('load', time.perf_counter() - start)
+
+        for endpoint_name in endpoints:
+            runner.spawn(f"extract-{endpoint_name}", _extract, endpoint_name)
+        runner.spawn('transform', _transform)
+        try:
+            runner.run_here('load', _load)
+        finally:
+            self.stats['stages'] = runner.snapshot()
+
+    def _checkpoint_context(self):
+        """Estado de la ejecución que debe sobrevivir a una reanudación."""
+        # Copias: el contexto se serializa en segundo plano mientras el pipeline sigue
+        return {
+            'watermarks': dict(self._pending_watermarks),
+            'hashes': dict(self._pending_hashes),
+            'skipped_entities': list(self.stats['skipped_entities']),
+        }
+
+    def _restore_checkpoint_context(self):
+        """Restaura marcas/hashes pendientes y las salidas reutilizadas de la ejecución original."""
+        context = self.checkpoint.context()
+        self._pending_watermarks = context.get('watermarks') or {}
+        self._pending_hashes = context.get('hashes') or {}
+        self.stats['skipped_entities'] = context.get('skipped_entities') or []
+        for endpoint_name in self.stats['skipped_entities']:
+            for key in ENTITY_OUTPUTS[endpoint_name]:
+                self.reused_data[key] = read_snapshot(self._loaded_dir(), key)
+
+    def _scheduler_config(self):
+        """Sección etl.scheduler de la configuración."""
+        return (self.config.get('etl') or {}).get('scheduler') or {}
+
+    def _run_scheduled(self):
+        """Pipeline batch como DAG de tareas por entidad; retorna las salidas validadas.
+
+        products, users y carts avanzan cada uno a su ritmo por extract ->
+        transform -> DQ -> LOAD. Solo las ventas dependen de otras entidades:
+        necesitan los precios de productos (transform), las dimensiones para
+        la integridad referencial (DQ) y dates/products/users en la base (LOAD).
+        """
+        graph = TaskGraph()
+        workers = max(1, int(self._scheduler_config().get('max_workers', 4) or 4))
+        self.logger.info(f"Iniciando pipeline como DAG de tareas ({workers} workers)")
+        # pytest captura la salida del proceso: se ejecuta antes de lanzar tareas
+        if not self._tests_phase():
+            self.logger.warning("Tests fallidos. Se registraron errores, pero el LOAD continuará omitiendo registros inválidos.")
+
+        # EXTRACT: una tarea por origen y endpoint (o los datos de la landing zone)
+        extracts = defaultdict(list)
+        if self.replay:
+            for endpoint_name, records in self._replay_phase(self.replay).items():
+                extracts[endpoint_name].append(
+                    graph.add(f"extract:{endpoint_name}", partial(list, records))
+                )
+        else:
+            for source in resolve_sources(self.config):
+                for endpoint_name, endpoint_path in source['endpoints'].items():
+                    key = self._source_key(endpoint_name, source)
+                    extracts[endpoint_name].append(graph.add(
+                        f"extract:{key}", partial(self._extract_endpoint, endpoint_name, endpoint_path, source)
+                    ))
+
+        raw_data = self.memory.datasets('raw')
+
+        def _merge(endpoint_name, *parts):
+            # None si el endpoint no se extrajo (como una clave ausente en raw_data).
+            # El raw unido queda bajo el presupuesto de memoria (por chunks si es grande).
+            if not parts:
+                return None
+            raw_data[endpoint_name] = [record for part in parts for record in part]
+            return raw_data[endpoint_name]
+
+        for endpoint_name in ENTITY_OUTPUTS:
+            graph.add(f"raw:{endpoint_name}", partial(_merge, endpoint_name), extracts.get(endpoint_name, []))
+
+        # TRANSFORM
+        graph.add('lookup:products', self._products_raw, ['raw:products', 'raw:carts'])
+        graph.add('transform:products', lambda raw: self._persist_processed(self._transform_products(raw)),
+                  ['lookup:products'])
+        graph.add('transform:users', lambda raw: self._persist_processed(self._transform_users(raw)),
+                  ['raw:users'])
+        graph.add('transform:carts', lambda raw, products: self._persist_processed(self._transform_carts(raw, products)),
+                  ['raw:carts', 'lookup:products'])
+
+        # DATA QUALITY: cada tarea valida una copia; sales usa las dimensiones sin filtrar
+        graph.add('validate:products', lambda data: self._validate_task(data, self.reused_data),
+                  ['transform:products'])
+        graph.add('validate:users', lambda data: self._validate_task(data, self.reused_data),
+                  ['transform:users'])
+
+        def _validate_sales(data, products, users, products_dq, users_dq):
+            upstream = itertools.chain.from_iterable(
+                results.get('error_details', []) for _, results in (products_dq, users_dq)
+            )
+            return self._validate_task(data, {**self.reused_data, **products, **users}, upstream)
+
+        graph.add('validate:sales', _validate_sales, [
+            'transform:carts', 'transform:products', 'transform:users', 'validate:products', 'validate:users',
+        ])
+
+        # LOAD: las dimensiones no se esperan entre sí; fact_sales va al final
+        for data_type, validated in (('products', 'validate:products'), ('users', 'validate:users'),
+                                     ('geography', 'validate:users'), ('dates', 'validate:sales')):
+            graph.add(f"load:{data_type}", partial(self._load_task, data_type), [validated])
+        graph.add('load:sales', partial(self._load_task, 'sales'),
+                  ['validate:sales', 'load:dates', 'load:products', 'load:users'])
+
+        try:
+            # Solo se conservan las salidas validadas; raw y transform se liberan al consumirse
+            results = graph.run(workers, keep=('validate:products', 'validate:users', 'validate:sales'))
+        finally:
+            self.stats['tasks'] = graph.timings
+            raw_data.clear()
+
+        transformed_data = self.memory.datasets('validated')
+        for task in ('validate:products', 'validate:users', 'validate:sales'):
+            validated = results[task][0]
+            if isinstance(validated, DatasetStore):
+                transformed_data.adopt(validated)
+            else:
+                transformed_data.update(validated)
+        return transformed_data
+
+    def _validate_task(self, data, reference, upstream_details=()):
+        """DQ de las salidas de una entidad: (copia filtrada, resultados)."""
+        if not data:
+            return data, {}
+        # La copia filtrada queda bajo el presupuesto de memoria
+        validated = self.memory.datasets('validated')
+        validated.update(data)
+        data = validated
+        results = self._validate_datasets(data, reference, upstream_details)
+        with self._stats_lock:
+            self.stats['records_processed'] += results['records_checked']
+        return data, results
+
+    def _load_task(self, data_type, validated, *_):
+        """Carga un dataset validado (los argumentos extra son dependencias de orden)."""
+        data, _ = validated
+        if data_type in data:
+            self._load_datasets({data_type: data[data_type]})
+
+    def _replay_phase(self, run_id):
+        """Carga los datos raw de una ejecución previa desde la landing zone."""
+        self.logger.info(f"Iniciando REPLAY de la ejecución {run_id} (sin extracción)")
+        raw_data = self.landing.read_run(run_id)
+        for endpoint_name, data in raw_data.items():
+            self.logger.info(f"Replay: {len(data)} registros de {endpoint_name}")
+        return raw_data
+
+    def _apply_checkpoint_retention(self):
+        """Borra checkpoints de ejecuciones fallidas nunca reanudadas (etl.checkpoint.retention_days)."""
+        checkpoint_cfg = (self.config.get('etl') or {}).get('checkpoint') or {}
+        try:
+            RunCheckpoint.apply_retention(
+                self.checkpoint.root, checkpoint_cfg.get('retention_days', 7), keep=self.run_id
+            )
+        except Exception as e:
+            self.logger.warning(f"No se pudo aplicar la retención de checkpoints: {e}")
+
+    def _apply_landing_retention(self):
+        try:
+            self.landing.apply_retention()
+        except Exception as e:
+            self.logger.warning(f"No se pudo aplicar la retención de la landing zone: {e}")
+
     def _extract_phase(self):
         """Fase de extracción de datos desde la API o caché."""
         self.logger.info("Iniciando fase EXTRACT")
         
         raw_data = {}
-        endpoints = self.config['api']['endpoints']
-        
-        for endpoint_name, endpoint_path in endpoints.items():
-            self.logger.info(f"Procesando datos de {endpoint_name}")
-            try:
-                # Solo usar caché si no se fuerza actualización
-                cached_data = None if self.force_refresh else self._load_from_cache(endpoint_name)
-                
-                if cached_data is not None:
-                    raw_data[endpoint_name] = cached_data
-                    self.logger.info(f"Datos de {endpoint_name} cargados desde caché")
-                else:
-                    # Si no hay caché o se fuerza actualización, extraer de la API
-                    self.logger.info(f"Extrayendo datos de {endpoint_name} desde API")
-                    data = self.extractor.fetch_endpoint(endpoint_name, endpoint_path)
-                    raw_data[endpoint_name] = data
-                    # Guardar en caché para futura referencia
-                    self._save_to_cache(endpoint_name, data)
-                
-                # Persistir raw en disco
+        sources = resolve_sources(self.config)
+        tasks = [
+            (source, endpoint_name, endpoint_path)
+            for source in sources
+            for endpoint_name, endpoint_path in source['endpoints'].items()
+        ]
+        max_workers = max(1, min(self._max_workers(), len(tasks) or 1))
+        self.logger.info(
+            f"Extrayendo {len(tasks)} endpoints de {len(sources)} orígenes con {max_workers} workers"
+        )
+
+        # Cada endpoint (API/caché + caché + raw) se procesa en su propio worker;
+        # todos comparten la sesión HTTP del extractor.
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract') as executor:
+            futures = {
+                executor.submit(self._extract_endpoint, endpoint_name, endpoint_path, source):
+                    (source['name'], endpoint_name)
+                for source, endpoint_name, endpoint_path in tasks
+            }
+            failed = None
+            for future in as_completed(futures):
+                source_name, endpoint_name = futures[future]
                 try:
-                    raw_path = os.path.join(self.raw_dir, f"{endpoint_name}.json")
-                    with open(raw_path, 'w', encoding='utf-8') as f:
-                        json.dump(raw_data[endpoint_name], f, indent=2, ensure_ascii=False)
-                    self.logger.info(f"Raw data guardada en {raw_path}")
+                    results[(source_name, endpoint_name)] = future.result()
                 except Exception as e:
-                    self.logger.warning(f"No se pudo guardar raw data {endpoint_name}: {e}")
-                
-                self._log_sample(raw_data[endpoint_name], f"raw->{endpoint_name}")
-                self.logger.info(f"Procesados {len(raw_data[endpoint_name])} registros de {endpoint_name}")
-                
-            except Exception as e:
-                error_msg = f"Error procesando {endpoint_name}: {str(e)}"
-                self.logger.error(error_msg)
-                self.stats['errors'].append(error_msg)
-                raise
-        
+                    label = endpoint_name if len(sources) == 1 else f"{source_name}/{endpoint_name}"
+                    error_msg = f"Error procesando {label}: {str(e)}"
+                    self.logger.error(error_msg)
+                    self.stats['errors'].append(error_msg)
+                    if failed is None:
+                        failed = e
+                        # No iniciar endpoints pendientes tras el primer fallo
+                        for pending in futures:
+                            pending.cancel()
+            if failed is not None:
+                raise failed
+
+        # Unir orígenes por endpoint manteniendo el orden definido en config
+        for source, endpoint_name, _ in tasks:
+            raw_data.setdefault(endpoint_name, []).extend(results[(source['name'], endpoint_name)])
         return raw_data
 
+    def _source_key(self, endpoint_name, source=None):
+        """Nombre de caché/raw/estado de un endpoint: prefijado por origen si hay varios."""
+        if not source or not source.get('tagged'):
+            return endpoint_name
+        return f"{source['name']}__{endpoint_name}"
+
+    def _fetch_with_validators(self, endpoint_name, endpoint_path, extractor=None):
+        """Extrae desde la API revalidando el caché con ETag/Last-Modified.
+
+        Si el servidor responde 304 se reutiliza el cuerpo cacheado; si no, se
+        guarda el nuevo cuerpo en caché junto con sus validadores.
+        """
+        extractor = extractor or self.extractor
+        has_cache = self.cache.exists(endpoint_name)
+        validators = extractor.load_validators(endpoint_name) if has_cache else {}
+        data, new_validators = extractor.fetch_endpoint_conditional(
+            endpoint_name, endpoint_path, validators
+        )
+        if data is None:
+            # El cuerpo cacheado sigue vigente aunque su TTL haya expirado
+            data = self._load_from_cache(endpoint_name, allow_stale=True)
+            if data is not None:
+                self.cache.refresh(endpoint_name)
+                extractor.save_validators(endpoint_name, new_validators)
+                return data
+            # Caché desaparecido entre la revalidación y la lectura
+            self.logger.warning(f"Caché de {endpoint_name} no disponible tras 304; descarga completa")
+            data, new_validators = extractor.fetch_endpoint_conditional(endpoint_name, endpoint_path)
+
+        # Guardar en caché para futura referencia; los validadores solo después
+        # de que el cuerpo esté escrito para que siempre describan el caché.
+        self._save_to_cache(endpoint_name, data, new_validators, extractor)
+        return data
+
+    def _incremental_config(self):
+        """Sección etl.incremental de la configuración."""
+        return (self.config.get('etl') or {}).get('incremental') or {}
+
+    def _incremental_entities(self):
+        """Endpoints extraídos de forma incremental (por defecto solo carts)."""
+        return self._incremental_config().get('entities', ['carts'])
+
+    def _get_watermark(self, endpoint_name):
+        """Marca (fecha, cart_id) del último LOAD; None (extracción completa) si no hay.
+
+        fact_sales no guarda la fecha exacta ni el cart_id de cada venta: una
+        marca derivada de MAX(date_key) perdería o duplicaría los carritos de
+        ese día, así que sin estado se extrae todo.
+        """
+        watermark = (self.state.get('watermarks') or {}).get(endpoint_name)
+        if watermark:
+            return watermark
+        try:
+            loaded = self.loader.count_rows('sales')
+        except Exception:
+            loaded = 0
+        if loaded:
+            self.logger.warning(
+                f"Sin marca de agua para {endpoint_name} y fact_sales tiene {loaded} filas; "
+                "extracción completa (las ventas ya cargadas pueden duplicarse)"
+            )
+        return None
+
+    def _extract_incremental(self, endpoint_name, endpoint_path, extractor=None):
+        """Extrae solo los carritos posteriores a la marca de agua."""
+        extractor = extractor or self.extractor
+        inc_cfg = self._incremental_config()
+        watermark = self._get_watermark(endpoint_name)
+        params = {}
+        if inc_cfg.get('date_filters', True):
+            params = date_filter_params(
+                watermark,
+                inc_cfg.get('start_param', 'startdate'),
+                inc_cfg.get('end_param', 'enddate')
+            )
+        data = extractor.fetch_endpoint(endpoint_name, endpoint_path, params=params or None)
+        # Filtro en cliente: los filtros de la API son por día (o no existen)
+        new_data = filter_new_carts(data, watermark)
+        self.logger.info(
+            f"Incremental {endpoint_name}: {len(new_data)} nuevos de {len(data)} recibidos (marca={watermark})"
+        )
+        self._pending_watermarks[endpoint_name] = compute_watermark(new_data, watermark)
+        return new_data
+
+    def _commit_watermarks(self):
+        """Persiste las marcas de agua pendientes de esta ejecución."""
+        if not self._pending_watermarks:
+            return
+        watermarks = self.state.get('watermarks') or {}
+        for endpoint_name, watermark in self._pending_watermarks.items():
+            if watermark:
+                watermarks[endpoint_name] = watermark
+                self.logger.info(f"Marca de agua de {endpoint_name} actualizada a {watermark}")
+        self.state.set('watermarks', watermarks)
+        self._pending_watermarks = {}
+
+    def _max_workers(self):
+        """Número de workers configurado en etl.max_workers."""
+        try:
+            return int((self.config.get('etl') or {}).get('max_workers', 1) or 1)
+        except (TypeError, ValueError):
+            return 1
+
+    def _extract_endpoint(self, endpoint_name, endpoint_path, source=None):
+        """Extrae un endpoint (caché o API) de un origen y persiste caché y raw."""
+        key = self._source_key(endpoint_name, source)
+        extractor = self.extractor.for_source(source) if source and source.get('tagged') else self.extractor
+        self.logger.info(f"Procesando datos de {key}")
+
+        def _fill():
+            # Si no hay caché vigente o se fuerza actualización, extraer de la API
+            self.logger.info(f"Extrayendo datos de {key} desde API")
+            return self._fetch_with_validators(key, endpoint_path, extractor)
+
+        if self.incremental and endpoint_name in self._incremental_entities():
+            # El delta no se cachea: el caché guarda el endpoint completo
+            data = self._extract_incremental(key, endpoint_path, extractor)
+        elif self.force_refresh:
+            with self.cache.lock(key):
+                data = _fill()
+        else:
+            # Bajo lock: si otro proceso está llenando la entrada, se espera y se
+            # reutiliza su resultado en lugar de extraer de nuevo.
+            data = self.cache.get_or_fill(key, _fill)
+
+        if source and source.get('tagged'):
+            # Etiquetar copias con su origen: el caché guarda la respuesta sin etiquetar
+            data = [dict(record, source=source['name']) for record in data]
+
+        # Persistir raw en disco (en segundo plano). `data` es una lista propia que
+        # no se modifica después: ambas escrituras comparten la referencia
+        self._persist_snapshot(self.raw_dir, key, data, "Raw data")
+        if self.landing.enabled:
+            self.writer.submit(
+                f"landing {key}", self.landing.write, self.run_id, key, data,
+                endpoint_name, source['name'] if source else None
+            )
+
+        self._log_sample(data, f"raw->{key}")
+        self.logger.info(f"Procesados {len(data)} registros de {key}")
+        return data
+
     def _transform_phase(self, raw_data):
         """Fase de transformación de datos."""
         self.logger.info("Iniciando fase TRANSFORM")
         
-        transformed_data = {}
-        
-        # Transformar productos
-        if 'products' in raw_data:
-            self.logger.info("Transformando datos de productos")
-            transformed_data['products'] = self.transformer.transform_products(
-                raw_data['products']
-            )
-            self._log_sample(transformed_data['products'], "transform->products")
-        
-        # Transformar usuarios
-        if 'users' in raw_data:
-            self.logger.info("Transformando datos de usuarios")
-            users_data = self.transformer.transform_users(raw_data['users'])
-            transformed_data['users'] = users_data['users']
-            transformed_data['geography'] = users_data['geography']
-            self._log_sample(transformed_data['users'], "transform->users")
-            self._log_sample(transformed_data['geography'], "transform->geography")
+        # Mapping con presupuesto de memoria: los datasets fríos pueden ir a disco
+        transformed_data = self.memory.datasets('transformed')
         
-        # Transformar carritos
-        if 'carts' in raw_data:
+        # Productos referenciados por carritos pero ausentes de la extracción
+        products_raw = self._products_raw(raw_data.get('products'), raw_data.get('carts'))
+        transformed_data.update(self._transform_products(products_raw))
+        transformed_data.update(self._transform_users(raw_data.get('users')))
+        transformed_data.update(self._transform_carts(raw_data.get('carts'), products_raw))
+
+        # Persistir datos procesados en disco (en segundo plano)
+        return self._persist_processed(transformed_data)
+
+    def _persist_processed(self, transformed_data):
+        # Se retienen los datasets sin leer los bajados a disco; la tarea los
+        # escribe de a uno
+        pinned = pin_datasets(transformed_data)
+        if not pinned.keys():
+            return transformed_data
+
+        def _write():
+            try:
+                for key, data in pinned.items():
+                    path = write_snapshot(data, self.processed_dir, key, self.snapshot_format)
+                    self.logger.info(f"Processed data guardada en {path}")
+            finally:
+                pinned.release()
+
+        self.writer.submit(f"Processed data {', '.join(pinned.keys())}", _write)
+        return transformed_data
+
+    def _products_raw(self, products_data, carts_data):
+        """Productos extraídos más los referenciados por carritos y ausentes (lookup)."""
+        products_raw = list(products_data or [])
+        if carts_data is not None:
+            products_raw.extend(self._lookup_missing_products(carts_data, products_raw))
+        return products_raw
+
+    def _transform_products(self, products_raw):
+        """Salidas de products (vacío si no hay datos o no cambiaron)."""
+        if not products_raw or self._skip_unchanged('products', products_raw):
+            return {}
+        self.logger.info("Transformando datos de productos")
+        transformed = {'products': self.transformer.transform_products(products_raw)}
+        self._log_sample(transformed['products'], "transform->products")
+        return transformed
+
+    def _transform_users(self, users_raw):
+        """Salidas de users: users y geography."""
+        if users_raw is None or self._skip_unchanged('users', users_raw):
+            return {}
+        self.logger.info("Transformando datos de usuarios")
+        users_data = self.transformer.transform_users(users_raw)
+        transformed = {'users': users_data['users'], 'geography': users_data['geography']}
+        self._log_sample(transformed['users'], "transform->users")
+        self._log_sample(transformed['geography'], "transform->geography")
+        return transformed
+
+    def _transform_carts(self, carts_raw, products_raw):
+        """Salidas de carts: sales y la dimensión de tiempo derivada."""
+        transformed = {}
+        carts_unchanged = carts_raw is not None and self._skip_unchanged('carts', carts_raw)
+        if carts_raw is not None and not carts_unchanged:
             self.logger.info("Transformando datos de carritos")
-            transformed_data['sales'] = self.transformer.transform_carts(
-                raw_data['carts'], raw_data.get('products', [])
-            )
-            self._log_sample(transformed_data['sales'], "transform->sales")
+            if isinstance(carts_raw, ChunkedRecords):
+                # Carritos guardados por chunks (presupuesto de memoria): un chunk raw
+                # residente a la vez, con un único índice de precios
+                index = self.transformer.price_index(products_raw)
+                transformed['sales'] = concat(
+                    self.transformer.transform_carts(chunk, products_raw, index) for chunk in carts_raw.chunks()
+                )
+            else:
+                transformed['sales'] = self.transformer.transform_carts(carts_raw, products_raw)
+            self._log_sample(transformed['sales'], "transform->sales")
         
         # Debugging de dimensión de tiempo
-        self.logger.info("Generando dimensión de tiempo")
-        dates = self.transformer.generate_date_dimension(
-            transformed_data.get('sales', [])
-        )
-        transformed_data['dates'] = dates
-        self._log_sample(transformed_data['dates'], "transform->dates")
+        if not carts_unchanged:
+            self.logger.info("Generando dimensión de tiempo")
+            transformed['dates'] = self.transformer.generate_date_dimension(
+                transformed.get('sales', [])
+            )
+            self._log_sample(transformed['dates'], "transform->dates")
+
+        if self.incremental:
+            # Sin actividad nueva no hay hechos ni fechas que validar/cargar
+            for key in ('sales', 'dates'):
+                if key in transformed and not transformed[key]:
+                    self.logger.info(f"Incremental: sin registros nuevos de {key}")
+                    del transformed[key]
+        return transformed
+
+    def _skip_config(self):
+        """Sección etl.skip_unchanged de la configuración."""
+        return (self.config.get('etl') or {}).get('skip_unchanged') or {}
+
+    def _skip_unchanged(self, endpoint_name, records):
+        """True si el contenido raw no cambió desde el último LOAD exitoso.
 
-        # Persistir datos procesados en disk
+        En ese caso se omiten transform, DQ y LOAD de la entidad y su salida
+        cargada previamente queda en self.reused_data para etapas posteriores.
+        """
+        cfg = self._skip_config()
+        entities = cfg.get('entities', ['products', 'users'])
+        # Opt-in: el hash es local y el warehouse puede haberse recreado
+        if not cfg.get('enabled', False) or endpoint_name not in entities:
+            return False
+        if self.incremental and endpoint_name in self._incremental_entities():
+            # Un delta no representa el contenido completo del endpoint
+            return False
+
+        digest = content_hash(records)
+        self._pending_hashes[endpoint_name] = digest
+        if self.force_refresh or (self.state.get('content_hashes') or {}).get(endpoint_name) != digest:
+            return False
+
+        reused = {}
+        for key in ENTITY_OUTPUTS[endpoint_name]:
+            data = read_snapshot(self._loaded_dir(), key)
+            if data is None:
+                return False
+            reused[key] = data
+        if not self._loaded_in_warehouse(reused):
+            return False
+        self.reused_data.update(reused)
+        del self._pending_hashes[endpoint_name]
+        self.stats['skipped_entities'].append(endpoint_name)
+        self.logger.info(f"{endpoint_name} sin cambios desde el último LOAD; se omite transform/DQ/LOAD")
+        return True
+
+    def _loaded_in_warehouse(self, reused):
+        """True si las tablas destino tienen al menos las filas de la salida reusada.
+
+        Cubre un warehouse recreado, restaurado o de otro entorno: el hash
+        local no alcanza para saber que las dimensiones siguen cargadas.
+        """
         try:
-            for key, value in transformed_data.items():
-                path = os.path.join(self.processed_dir, f"{key}.json")
-                with open(path, 'w', encoding='utf-8') as f:
-                    json.dump(value, f, indent=2, ensure_ascii=False, default=str)
-                self.logger.info(f"Processed data guardada en {path}")
+            for key, data in reused.items():
+                count = self.loader.count_rows(key)
+                if count < len(data):
+                    self.logger.info(f"{key}: {count} filas en el warehouse, se esperaban {len(data)}; se recarga")
+                    return False
         except Exception as e:
-            self.logger.warning(f"No se pudo guardar processed data: {e}")
-        
-        return transformed_data
+            self.logger.warning(f"No se pudo verificar {', '.join(reused)} en el warehouse; se recarga: {e}")
+            return False
+        return True
+
+    def _loaded_dir(self):
+        """Directorio con la última salida cargada de cada entidad con hash."""
+        return os.path.join(self.processed_dir, 'loaded')
+
+    def _commit_content_hashes(self, transformed_data):
+        """Guarda la salida cargada y el hash raw de cada entidad transformada."""
+        pending, self._pending_hashes = self._pending_hashes, {}
+        for endpoint_name, digest in pending.items():
+            outputs = {key: transformed_data.get(key, []) for key in ENTITY_OUTPUTS[endpoint_name]}
+
+            def _write(endpoint_name=endpoint_name, digest=digest, outputs=outputs):
+                os.makedirs(self._loaded_dir(), exist_ok=True)
+                for key, data in outputs.items():
+                    write_snapshot(data, self._loaded_dir(), key, self.snapshot_format)
+                # El hash se registra solo con la salida ya persistida
+                hashes = self.state.get('content_hashes') or {}
+                hashes[endpoint_name] = digest
+                self.state.set('content_hashes', hashes)
+
+            self.writer.submit(f"hash de contenido {endpoint_name}", _write)
+
+    def load_processed_snapshot(self, key):
+        """Lee un snapshot procesado (cualquier formato); None si no existe."""
+        self._drain_writer()
+        return read_snapshot(self.processed_dir, key)
+
+    def _lookup_missing_products(self, carts_data, products_data):
+        """Busca vía /products/{id} los productos de carritos que no se extrajeron."""
+        lookup_cfg = (self.config.get('etl') or {}).get('product_lookup') or {}
+        if not lookup_cfg.get('enabled', True):
+            return []
+
+        # Agrupar por origen: cada tienda resuelve sus ids contra su propia API.
+        # Se recorre por chunks para no retener todos los carritos a la vez.
+        missing_by_source = defaultdict(set)
+        for chunk in iter_chunks(carts_data, self._chunk_size()):
+            carts_by_source = defaultdict(list)
+            for cart in chunk:
+                carts_by_source[cart.get('source')].append(cart)
+            for source_name, carts in carts_by_source.items():
+                missing_by_source[source_name] |= self.transformer.find_missing_product_ids(carts, products_data)
+        sources = {src['name']: src for src in resolve_sources(self.config) if src['tagged']}
+
+        looked_up = []
+        for source_name, missing in missing_by_source.items():
+            if not missing:
+                continue
+            label = source_name or 'products'
+            self.logger.info(f"{len(missing)} productos referenciados por carritos de {label} no están en la extracción")
+            try:
+                found = self._product_lookup_for(sources.get(source_name)).resolve(sorted(missing, key=str))
+            except Exception as e:
+                error_msg = f"Lookup de productos ausentes falló ({label}): {e}"
+                self.logger.warning(error_msg)
+                self.stats['errors'].append(error_msg)
+                continue
+            for product in found.values():
+                if source_name is not None:
+                    product = {**product, 'source': source_name}
+                looked_up.append(product)
+        return looked_up
+
+    def _lookup_negative_ttl(self):
+        """Horas que se recuerda un id inexistente (etl.product_lookup.negative_ttl_hours)."""
+        lookup_cfg = (self.config.get('etl') or {}).get('product_lookup') or {}
+        return float(lookup_cfg.get('negative_ttl_hours', 24))
+
+    def _product_lookup_for(self, source=None):
+        """ProductLookup (con memo propio) para un origen; el default para fuente única."""
+        if source is None:
+            return self.product_lookup
+        key = self._source_key('product_lookup', source)
+        with self._lookups_lock:
+            if key not in self._source_lookups:
+                self._source_lookups[key] = ProductLookup(
+                    self.extractor.for_source(source),
+                    os.path.join(self.state_dir, f"{key}.json"),
+                    source['endpoints'].get('products', '/products'),
+                    self._lookup_negative_ttl()
+                )
+            return self._source_lookups[key]
 
     def _data_quality_phase(self, transformed_data):
         """Fase de validacion de calidad de datos."""
         self.logger.info("Iniciando fase DATA QUALITY")
 
-        validation_results = self.dq_checker.validate_full_dataset(transformed_data)
+        validation_results = self._validate_datasets(transformed_data, self.reused_data)
+
+        self.stats['records_processed'] = validation_results['records_checked']
+
+        return validation_results['is_valid']
+
+    def _validate_datasets(self, transformed_data, reference, upstream_details=()):
+        """Valida los datasets y omite en sitio los registros inválidos.
+
+        `upstream_details` son errores de dimensiones validadas aparte, cuyas
+        ventas también se omiten.
+        """
+        validation_results = self.dq_checker.validate_full_dataset(transformed_data, reference)
 
         if not validation_results['is_valid']:
             self.logger.warning("Problemas de calidad de datos detectados:")
@@ -304,21 +1178,19 @@ class ETLPipeline:
         report = self.dq_checker.generate_dq_report(validation_results)
         self.logger.info("\n" + report)
 
+        # Los detalles cuentan en el presupuesto de memoria (por chunks si son muchos)
+        dq_details = self.memory.datasets('dq')
+        dq_details['details'] = validation_results.get('error_details', [])
+        validation_results['error_details'] = dq_details['details']
         self._apply_dq_exclusions(
-            transformed_data,
-            validation_results.get('error_details', [])
+            transformed_data, itertools.chain(upstream_details, validation_results['error_details'])
         )
 
-        self.stats['records_processed'] = validation_results['records_checked']
         self.stats['errors'].extend(validation_results['errors'])
-
-        return validation_results['is_valid']
+        return validation_results
 
     def _apply_dq_exclusions(self, transformed_data, error_details):
         # Remove invalid records flagged by data quality checks before LOAD.
-        if not error_details:
-            return
-
         skipped = defaultdict(int)
         products_reasons = defaultdict(list)
         users_reasons = defaultdict(list)
@@ -326,78 +1198,86 @@ class ETLPipeline:
         sales_index_reasons = defaultdict(list)
         sales_key_reasons = defaultdict(list)
 
+        # Las claves incluyen el origen: con varias tiendas los ids se repiten
+        has_details = False
         for detail in error_details:
+            has_details = True
             dataset = detail.get('dataset')
             message = detail.get('message') or f"{dataset} validation failed"
+            source = detail.get('source')
             if dataset == 'products' and detail.get('record_id') is not None:
-                products_reasons[detail['record_id']].append(message)
+                products_reasons[(source, detail['record_id'])].append(message)
             elif dataset == 'users' and detail.get('record_id') is not None:
-                users_reasons[detail['record_id']].append(message)
+                users_reasons[(source, detail['record_id'])].append(message)
             elif dataset == 'geography' and detail.get('record_id') is not None:
-                geography_reasons[detail['record_id']].append(message)
+                geography_reasons[(source, detail['record_id'])].append(message)
             elif dataset == 'sales':
                 if detail.get('record_index') is not None:
                     sales_index_reasons[detail['record_index']].append(message)
                 cart = detail.get('cart_id')
                 prod = detail.get('product_id')
                 if cart is not None and prod is not None:
-                    sales_key_reasons[(cart, prod)].append(message)
+                    sales_key_reasons[(source, cart, prod)].append(message)
+        if not has_details:
+            return
 
         if products_reasons and 'products' in transformed_data:
-            filtered_products = []
-            for record in transformed_data['products']:
+            keep = []
+            for idx, record in enumerate(transformed_data['products']):
                 pid = record.get('product_id')
-                if pid in products_reasons:
-                    for msg in sorted(set(products_reasons[pid])):
+                if (record.get('source'), pid) in products_reasons:
+                    for msg in sorted(set(products_reasons[(record.get('source'), pid)])):
                         self.logger.warning(f"Omitiendo products product_id={pid}: {msg}")
                     skipped['products'] += 1
                     continue
-                filtered_products.append(record)
-            transformed_data['products'] = filtered_products
+                keep.append(idx)
+            transformed_data['products'] = take(transformed_data['products'], keep)
 
         if users_reasons and 'users' in transformed_data:
-            filtered_users = []
-            for record in transformed_data['users']:
+            keep = []
+            for idx, record in enumerate(transformed_data['users']):
                 uid = record.get('user_id') or record.get('id')
-                if uid in users_reasons:
-                    for msg in sorted(set(users_reasons[uid])):
+                if (record.get('source'), uid) in users_reasons:
+                    for msg in sorted(set(users_reasons[(record.get('source'), uid)])):
                         self.logger.warning(f"Omitiendo users user_id={uid}: {msg}")
                     skipped['users'] += 1
                     continue
-                filtered_users.append(record)
-            transformed_data['users'] = filtered_users
+                keep.append(idx)
+            transformed_data['users'] = take(transformed_data['users'], keep)
 
         invalid_user_ids = set(users_reasons.keys())
         invalid_geo_ids = set(geography_reasons.keys()) | invalid_user_ids
         if invalid_geo_ids and 'geography' in transformed_data:
-            filtered_geo = []
-            for record in transformed_data['geography']:
+            keep = []
+            for idx, record in enumerate(transformed_data['geography']):
                 uid = record.get('user_id')
-                if uid in invalid_geo_ids:
-                    combined = geography_reasons.get(uid, []) + users_reasons.get(uid, [])
+                geo_key = (record.get('source'), uid)
+                if geo_key in invalid_geo_ids:
+                    combined = geography_reasons.get(geo_key, []) + users_reasons.get(geo_key, [])
                     reasons = sorted(set(combined)) or ['Usuario marcado como invalido']
                     for msg in reasons:
                         self.logger.warning(f"Omitiendo geography user_id={uid}: {msg}")
                     skipped['geography'] += 1
                     continue
-                filtered_geo.append(record)
-            transformed_data['geography'] = filtered_geo
+                keep.append(idx)
+            transformed_data['geography'] = take(transformed_data['geography'], keep)
 
         invalid_product_ids = set(products_reasons.keys())
         if 'sales' in transformed_data:
             original_sales = transformed_data.get('sales', [])
-            filtered_sales = []
+            keep = []
             for idx, sale in enumerate(original_sales):
-                key = (sale.get('cart_id'), sale.get('product_id'))
+                source = sale.get('source')
+                key = (source, sale.get('cart_id'), sale.get('product_id'))
                 reasons: List[str] = []
                 reasons.extend(sales_index_reasons.get(idx, []))
-                if None not in key:
+                if None not in key[1:]:
                     reasons.extend(sales_key_reasons.get(key, []))
                 pid = sale.get('product_id')
                 uid = sale.get('user_id')
-                if pid in invalid_product_ids:
+                if (source, pid) in invalid_product_ids:
                     reasons.append(f"Producto {pid} descartado por DQ")
-                if uid in invalid_user_ids:
+                if (source, uid) in invalid_user_ids:
                     reasons.append(f"Usuario {uid} descartado por DQ")
                 if reasons:
                     for msg in sorted(set(reasons)):
@@ -406,8 +1286,8 @@ class ETLPipeline:
                         )
                     skipped['sales'] += 1
                     continue
-                filtered_sales.append(sale)
-            transformed_data['sales'] = filtered_sales
+                keep.append(idx)
+            transformed_data['sales'] = take(original_sales, keep)
 
         if skipped:
             summary = ', '.join(f"{k}={v}" for k, v in sorted(skipped.items()))
@@ -441,19 +1321,40 @@ class ETLPipeline:
     def _load_phase(self, transformed_data):
         """Fase de carga a base de datos."""
         self.logger.info("Iniciando fase LOAD")
-        
+        self._load_datasets(transformed_data, self.checkpoint)
+
+    def _load_datasets(self, transformed_data, checkpoint=None):
+        """Carga cada dataset presente respetando el orden de las constraints.
+
+        Con `checkpoint` cada tabla retoma desde sus filas ya confirmadas y
+        avanza el offset después de cada lote.
+        """
         # Cargar en orden correcto para respetar constraints
-        load_order = ['dates', 'products', 'users', 'geography', 'sales']
+        load_order = ['dates', 'categories', 'products', 'users', 'geography', 'sales']
+        # Sin copiar el mapping: cada dataset se lee (o trae de disco) al cargarlo
+        lookups = self._lookup_dimensions(transformed_data)
         
         # (no synthetic-row insertion)
 
         for data_type in load_order:
-            if data_type in transformed_data and transformed_data[data_type]:
-                self.logger.info(f"Cargando {len(transformed_data[data_type])} registros de {data_type}")
-                self._log_sample(transformed_data[data_type], f"load->{data_type}")
+            datasets = lookups if data_type in lookups else transformed_data
+            if data_type in datasets and datasets[data_type]:
+                data = datasets[data_type]
+                progress = {}
+                if checkpoint is not None:
+                    progress = {'start': checkpoint.offset(data_type),
+                                'on_batch': partial(checkpoint.advance, data_type)}
+                    if progress['start'] >= len(data):
+                        self.logger.info(f"{data_type} ya cargado por esta ejecución; se omite")
+                        continue
+                    if progress['start']:
+                        self.logger.info(f"Reanudando {data_type} desde la fila {progress['start']}")
+                self.logger.info(f"Cargando {len(data)} registros de {data_type}")
+                self._log_sample(data, f"load->{data_type}")
                 try:
-                    self.loader.load_data(data_type, transformed_data[data_type])
-                    self.stats['records_processed'] += len(transformed_data[data_type])
+                    self.loader.load_data(data_type, data, **progress)
+                    with self._stats_lock:
+                        self.stats['records_processed'] += len(data) - progress.get('start', 0)
                 except Exception as e:
                     error_msg = f"Error cargando {data_type}: {str(e)}"
                     self.logger.error(error_msg)
@@ -462,12 +1363,42 @@ class ETLPipeline:
 
     # (synthetic-record insertion removed by user request)
 
+    def _lookup_dimensions(self, transformed_data):
+        """Valores distintos de los atributos de etl.lookup_dimensions (p. ej. dim_category).
+
+        Con columnas codificadas por diccionario no se recorren las filas.
+        """
+        lookups = {}
+        for attribute in (self.config.get('etl') or {}).get('lookup_dimensions') or []:
+            if attribute not in LOOKUP_DIMENSIONS:
+                self.logger.warning(f"Dimensión lookup desconocida: {attribute}")
+                continue
+            data_type, dataset = LOOKUP_DIMENSIONS[attribute]
+            if dataset in transformed_data:
+                values = distinct_values(transformed_data[dataset], attribute)
+                lookups[data_type] = RecordBatch({attribute: values})
+        return lookups
+
     def _log_summary(self):
         """Registra resumen de la ejecución."""
         duration = self.stats['end_time'] - self.stats['start_time']
         self.logger.info(f"Pipeline ETL completado en {duration}")
         self.logger.info(f"Registros procesados: {self.stats['records_processed']}")
         self.logger.info(f"Errores encontrados: {len(self.stats['errors'])}")
+        if self.extractor.throttle.enabled:
+            self.stats['throttle'] = self.extractor.throttle.snapshot()
+        sections = (('Caché', 'cache'), ('Hedging', 'hedging'), ('Throttle', 'throttle'), ('Writer', 'writer'),
+                    ('Streaming', 'streaming'), ('Etapas', 'stages'), ('Tareas', 'tasks'), ('Memoria', 'memory'))
+        if self.stats['skipped_entities']:
+            self.logger.info(
+                f"Entidades sin cambios (transform/DQ/LOAD omitidos): {', '.join(self.stats['skipped_entities'])}"
+            )
+        for label, key in sections:
+            section = self.stats.get(key) or {}
+            if section:
+                self.logger.info(
+                    f"{label}: " + ', '.join(f"{k}={v}" for k, v in section.items())
+                )
         
         if self.stats['errors']:
             for error in self.stats['errors']:
@@ -479,7 +1410,21 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Execute ETL pipeline')
     parser.add_argument('--force-refresh', action='store_true', 
                        help='Force refresh data from API instead of using cache')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                       help='Extract only carts newer than the last loaded watermark')
+    parser.add_argument('--replay', metavar='RUN_ID',
+                       help="Transform and load a stored landing-zone run ('latest' for the newest) instead of extracting")
+    parser.add_argument('--streaming', action='store_true', default=None,
+                       help='Process etl.chunk_size records at a time through transform, DQ and load')
+    parser.add_argument('--overlap', action='store_true', default=None,
+                       help='Stream chunks with extract, transform and load running concurrently')
+    parser.add_argument('--dag', action='store_true', default=None,
+                       help='Run per-entity extract, transform, DQ and load as dependent tasks in parallel')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                       help="Resume a failed run ('latest' for the newest) from its first incomplete phase and load batch (requires etl.checkpoint.enabled)")
     args = parser.parse_args()
     
-    pipeline = ETLPipeline(force_refresh=args.force_refresh)
+    pipeline = ETLPipeline(force_refresh=args.force_refresh, incremental=args.incremental,
+                           replay=args.replay, streaming=args.streaming, overlap=args.overlap,
+                           dag=args.dag, resume=args.resume)
     pipeline.run()
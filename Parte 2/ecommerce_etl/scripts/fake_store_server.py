@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Servidor HTTP local que imita la FakeStore API para pruebas de carga de la extracción.
+
+Sirve /products, /users y /carts (y /<recurso>/<id>) con la misma forma que
+https://fakestoreapi.com, con cantidades de registros configurables y
+generados de forma determinista por id (no se materializan en memoria).
+
+Soporta:
+- paginación ?limit=&offset= y filtros ?startdate=&enddate= en /carts
+- latencia y jitter inyectados, tasa de errores 5xx y 429 con Retry-After
+- límite de requests por segundo (429 al excederlo)
+- ETag / If-None-Match (304)
+
+Usage:
+    python scripts/fake_store_server.py --port 8000 --carts 1000000 --latency-ms 50 --jitter-ms 20
+
+Luego apuntar api.base_url a http://127.0.0.1:8000.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CATEGORIES = ["men's clothing", "jewelery", "electronics", "women's clothing"]
+CITIES = ['kilcoole', 'Cullman', 'San Antonio', 'el paso', 'fresno', 'mesa', 'miami beach', 'fort wayne']
+FIRST_NAMES = ['john', 'david', 'kevin', 'don', 'derek', 'david', 'miriam', 'william', 'kate', 'jimmie']
+LAST_NAMES = ['doe', 'morrison', 'ryan', 'romer', 'powell', 'russell', 'snyder', 'hopkins', 'hale', 'kollar']
+CART_START = datetime(2020, 1, 1)
+# Bytes de registros por fragmento chunked
+WRITE_CHUNK = 64 * 1024
+
+
+class FakeStoreData:
+    """Genera registros deterministas a partir del id y la semilla."""
+
+    def __init__(self, products=20, users=10, carts=7, seed=42, cart_step_minutes=60):
+        self.counts = {'products': products, 'users': users, 'carts': carts}
+        self.seed = seed
+        self.cart_step = timedelta(minutes=cart_step_minutes)
+
+    def _rng(self, resource, record_id):
+        return random.Random(f"{self.seed}:{resource}:{record_id}")
+
+    def product(self, i):
+        rng = self._rng('products', i)
+        return {
+            'id': i,
+            'title': f"Product {i}",
+            'price': round(rng.uniform(1, 1000), 2),
+            'description': f"Description for product {i}",
+            'category': rng.choice(CATEGORIES),
+            'image': f"https://fakestoreapi.com/img/{i}.jpg",
+            'rating': {'rate': round(rng.uniform(0, 5), 1), 'count': rng.randint(0, 1000)},
+        }
+
+    def user(self, i):
+        rng = self._rng('users', i)
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        return {
+            'id': i,
+            'email': f"{first}.{last}{i}@gmail.com",
+            'username': f"{first}{i}",
+            'password': 'm38rmF$',
+            'name': {'firstname': first, 'lastname': last},
+            'address': {
+                'city': rng.choice(CITIES),
+                'street': f"{rng.randint(1, 9999)} street",
+                'number': rng.randint(1, 9999),
+                'zipcode': f"{rng.randint(10000, 99999)}-{rng.randint(1000, 9999)}",
+                'geolocation': {
+                    'lat': f"{rng.uniform(-90, 90):.4f}",
+                    'long': f"{rng.uniform(-180, 180):.4f}",
+                },
+            },
+            'phone': f"1-{rng.randint(100, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        }
+
+    def cart_date(self, i):
+        return CART_START + self.cart_step * (i - 1)
+
+    def cart(self, i):
+        rng = self._rng('carts', i)
+        n_products = max(1, self.counts['products'])
+        return {
+            'id': i,
+            'userId': rng.randint(1, max(1, self.counts['users'])),
+            'date': self.cart_date(i).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'products': [
+                {'productId': rng.randint(1, n_products), 'quantity': rng.randint(1, 10)}
+                for _ in range(rng.randint(1, 4))
+            ],
+            '__v': 0,
+        }
+
+    def record(self, resource, i):
+        return getattr(self, resource[:-1])(i)
+
+    def id_range(self, resource, query):
+        """Rango [first, last] de ids que cumple filtros, limit y offset."""
+        first, last = 1, self.counts[resource]
+        if resource == 'carts':
+            start = _parse_day(query.get('startdate'))
+            end = _parse_day(query.get('enddate'))
+            step = self.cart_step.total_seconds()
+            if start is not None:
+                offset_s = (start - CART_START).total_seconds()
+                first = max(first, int(-(-offset_s // step)) + 1)
+            if end is not None:
+                # enddate inclusivo: hasta el final del día
+                offset_s = (end + timedelta(days=1) - CART_START).total_seconds()
+                last = min(last, int(-(-offset_s // step)))
+        offset = _int(query.get('offset'), 0)
+        first += max(0, offset)
+        limit = _int(query.get('limit'), None)
+        if limit is not None:
+            last = min(last, first + max(0, limit) - 1)
+        return first, last
+
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class FaultInjector:
+    """Latencia, errores y rate limit inyectados por request."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 rate_limit_rps=0.0, retry_after=1, seed=42):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit_rps = rate_limit_rps
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def delay(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter)
+
+    def status(self):
+        """Código de estado forzado para este request (o None)."""
+        with self._lock:
+            if self.rate_limit_rps:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_count = 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit_rps:
+                    return 429
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeStoreServer/1.0'
+
+    def log_message(self, fmt, *args):  # silenciar log por request
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        time.sleep(server.faults.delay())
+
+        forced = server.faults.status()
+        if forced is not None:
+            server.count(str(forced))
+            headers = {'Retry-After': str(server.faults.retry_after)} if forced == 429 else {}
+            return self._send_json(forced, {'error': 'injected'}, headers)
+
+        parsed = urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        if not parts or parts[0] not in server.data.counts:
+            return self._send_json(404, {'error': 'not found'})
+        resource = parts[0]
+        total = server.data.counts[resource]
+
+        if len(parts) == 2:
+            record_id = _int(parts[1], None)
+            if record_id is None or not 1 <= record_id <= total:
+                # Igual que FakeStore: 200 con cuerpo vacío
+                return self._send_body(200, b'', 'application/json')
+            return self._send_json(200, server.data.record(resource, record_id))
+
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        first, last = server.data.id_range(resource, query)
+        etag = f'W/"{resource}-{total}-{server.data.seed}-{first}-{last}"'
+        if self.headers.get('If-None-Match') == etag:
+            server.count('304')
+            return self._send_body(304, b'', None, {'ETag': etag})
+        self._send_list(resource, first, last, {'ETag': etag})
+
+    def _send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self._send_body(status, body, 'application/json; charset=utf-8', headers)
+
+    def _send_list(self, resource, first, last, headers):
+        """Escribe el array en chunked encoding sin materializarlo completo."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        def write_chunk(data):
+            if data:
+                self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+        buf = [b'[']
+        size = 1
+        for i in range(first, last + 1):
+            item = json.dumps(self.server.data.record(resource, i)).encode('utf-8')
+            if i != first:
+                item = b',' + item
+            buf.append(item)
+            size += len(item)
+            if size >= WRITE_CHUNK:
+                write_chunk(b''.join(buf))
+                buf, size = [], 0
+        buf.append(b']')
+        write_chunk(b''.join(buf))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeStoreServer(ThreadingHTTPServer):
+    """Servidor FakeStore local; usable como context manager en tests/benchmarks."""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, data=None, faults=None):
+        super().__init__((host, port), _Handler)
+        self.data = data or FakeStoreData()
+        self.faults = faults or FaultInjector()
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local FakeStore API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--carts', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de requests con 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fracción de requests con 429')
+    parser.add_argument('--rate-limit-rps', type=float, default=0.0, help='Requests/s antes de responder 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    args = parser.parse_args()
+
+    server = FakeStoreServer(
+        args.host,
+        args.port,
+        data=FakeStoreData(args.products, args.users, args.carts, seed=args.seed),
+        faults=FaultInjector(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            rate_limit_rps=args.rate_limit_rps,
+            retry_after=args.retry_after,
+            seed=args.seed,
+        ),
+    )
+    print(f"FakeStore local en {server.base_url} (Ctrl+C para detener)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stats: {server.stats}")
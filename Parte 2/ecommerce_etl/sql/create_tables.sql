@@ -4,6 +4,7 @@ DROP TABLE IF EXISTS dim_date;
 DROP TABLE IF EXISTS dim_products;
 DROP TABLE IF EXISTS dim_users;
 DROP TABLE IF EXISTS dim_geography;
+DROP TABLE IF EXISTS dim_category;
 
 -- Create dimension tables
 CREATE TABLE dim_date (
@@ -19,28 +20,41 @@ CREATE TABLE dim_date (
     month_name VARCHAR(10) NOT NULL
 );
 
+-- source: tienda de origen (api.sources); '' con un único origen.
+-- Las claves naturales son (source, id) porque los ids se repiten entre tiendas.
 CREATE TABLE dim_products (
-    product_id INTEGER PRIMARY KEY,
+    source VARCHAR(100) NOT NULL DEFAULT '',
+    product_id INTEGER NOT NULL,
     title VARCHAR(255) NOT NULL,
     price DECIMAL(10,2) NOT NULL,
     description TEXT,
     category VARCHAR(100),
     image_url TEXT,
     rating_rate DECIMAL(3,2),
-    rating_count INTEGER
+    rating_count INTEGER,
+    PRIMARY KEY (source, product_id)
+);
+
+-- Lookup de categorías (opcional, etl.lookup_dimensions: [category])
+CREATE TABLE dim_category (
+    category_key SERIAL PRIMARY KEY,
+    category VARCHAR(100) NOT NULL UNIQUE
 );
 
 CREATE TABLE dim_users (
-    user_id INTEGER PRIMARY KEY,
+    source VARCHAR(100) NOT NULL DEFAULT '',
+    user_id INTEGER NOT NULL,
     email VARCHAR(255) NOT NULL,
     username VARCHAR(100) NOT NULL,
     first_name VARCHAR(100),
     last_name VARCHAR(100),
-    phone VARCHAR(50)
+    phone VARCHAR(50),
+    PRIMARY KEY (source, user_id)
 );
 
 CREATE TABLE dim_geography (
     geography_id SERIAL PRIMARY KEY,
+    source VARCHAR(100) NOT NULL DEFAULT '',
     city VARCHAR(100),
     street VARCHAR(255),
     number INTEGER,
@@ -51,9 +65,12 @@ CREATE TABLE dim_geography (
 
 CREATE TABLE fact_sales (
     sale_id SERIAL PRIMARY KEY,
+    source VARCHAR(100) NOT NULL DEFAULT '',
     date_key INTEGER REFERENCES dim_date(date_key),
-    product_id INTEGER REFERENCES dim_products(product_id),
-    user_id INTEGER REFERENCES dim_users(user_id),
+    product_id INTEGER,
+    user_id INTEGER,
     quantity INTEGER NOT NULL,
-    total_amount DECIMAL(10,2) NOT NULL
+    total_amount DECIMAL(10,2) NOT NULL,
+    FOREIGN KEY (source, product_id) REFERENCES dim_products(source, product_id),
+    FOREIGN KEY (source, user_id) REFERENCES dim_users(source, user_id)
 );
\ No newline at end of file
@@ -2,6 +2,7 @@
 -- Materialized view: per-product performance (revenue, buyers, avg rating)
 CREATE MATERIALIZED VIEW IF NOT EXISTS mv_product_performance AS
 SELECT
+    p.source,
     p.product_id,
     p.title,
     p.category,
@@ -10,12 +11,13 @@ SELECT
     COUNT(DISTINCT f.user_id) AS unique_buyers,
     AVG(p.rating_rate) AS avg_rating
 FROM dim_products p
-JOIN fact_sales f ON p.product_id = f.product_id
-GROUP BY p.product_id, p.title, p.category;
+JOIN fact_sales f ON p.source = f.source AND p.product_id = f.product_id
+GROUP BY p.source, p.product_id, p.title, p.category;
 
 -- Standard non-materialized view for quick ad-hoc queries (keeps data always up-to-date)
 CREATE OR REPLACE VIEW vw_product_sales AS
 SELECT
+    p.source,
     p.product_id,
     p.title,
     p.category,
@@ -24,17 +26,17 @@ SELECT
     COUNT(DISTINCT f.user_id) AS unique_buyers,
     AVG(p.rating_rate) AS avg_rating
 FROM dim_products p
-JOIN fact_sales f ON p.product_id = f.product_id
-GROUP BY p.product_id, p.title, p.category;
+JOIN fact_sales f ON p.source = f.source AND p.product_id = f.product_id
+GROUP BY p.source, p.product_id, p.title, p.category;
 
 -- Helpful indexes to accelerate aggregations and joins
-CREATE INDEX IF NOT EXISTS idx_fact_sales_product_id ON fact_sales(product_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_product_id ON fact_sales(source, product_id);
 CREATE INDEX IF NOT EXISTS idx_fact_sales_date_key ON fact_sales(date_key);
-CREATE INDEX IF NOT EXISTS idx_fact_sales_user_id ON fact_sales(user_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_user_id ON fact_sales(source, user_id);
 CREATE INDEX IF NOT EXISTS idx_dim_products_category ON dim_products(category);
 
 -- Index on materialized view to allow CONCURRENT refresh (if desired) and to speed up ordering by revenue
-CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_product_performance_product_id ON mv_product_performance(product_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_product_performance_product_id ON mv_product_performance(source, product_id);
 CREATE INDEX IF NOT EXISTS idx_mv_product_performance_revenue ON mv_product_performance(revenue);
 
 -- Notes:
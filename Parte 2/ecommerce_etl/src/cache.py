@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+# cache.py - caché de la fase EXTRACT (TTL, escritura atómica, compresión, lock y LRU)
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+from src.extract import iter_json_array, STREAM_CHUNK_SIZE
+from src.utils import batched, is_cache_valid
+
+try:
+    import zstandard as zstd  # type: ignore
+except ImportError:
+    zstd = None
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None
+
+# Extensión de archivo por compresión soportada
+SUFFIXES = {
+    'zstd': '.json.zst',
+    'gzip': '.json.gz',
+    'none': '.json',
+}
+
+
+def resolve_compression(name: Optional[str], logger: Optional[logging.Logger] = None) -> str:
+    """Normaliza la compresión: 'auto' usa zstd si está instalado, si no gzip."""
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        return 'zstd' if zstd is not None else 'gzip'
+    if name == 'zstd' and zstd is None:
+        (logger or logging.getLogger(__name__)).warning("zstandard no está instalado; se usará gzip")
+        return 'gzip'
+    if name not in SUFFIXES:
+        raise ValueError(f"Compresión desconocida: {name}")
+    return name
+
+
+def open_text(path: str) -> io.TextIOBase:
+    """Abre un archivo JSON (zstd, gzip o plano según su extensión) como texto."""
+    if path.endswith('.zst'):
+        if zstd is None:
+            raise RuntimeError(f"zstandard es necesario para leer {path}")
+        raw = open(path, 'rb')
+        reader = zstd.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def dump_json(raw: BinaryIO, data: Any, compression: str) -> None:
+    """Serializa `data` como JSON en un archivo binario abierto, comprimido."""
+    if compression == 'zstd':
+        writer = zstd.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+        with io.TextIOWrapper(writer, encoding='utf-8') as f:
+            json.dump(data, f)
+    elif compression == 'gzip':
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as gz:
+            with io.TextIOWrapper(gz, encoding='utf-8') as f:
+                json.dump(data, f)
+    else:
+        with io.TextIOWrapper(raw, encoding='utf-8') as f:
+            json.dump(data, f)
+
+
+class ExtractCache:
+    """Caché en disco de respuestas de la API, compartible entre procesos.
+
+    - TTL por entrada (cache.ttl_hours.<clave>, por defecto cache.max_age_hours)
+    - escritura a archivo temporal + rename atómico
+    - compresión zstd (si está instalado) o gzip
+    - lock de archivo por entrada para que procesos concurrentes hagan un único fill
+    - desalojo LRU por tamaño total (cache.max_size_mb)
+    """
+
+    def __init__(self, cache_dir: str, config: Dict[str, Any]):
+        self.cache_dir = cache_dir
+        self.logger = logging.getLogger(__name__)
+        cfg = config.get('cache') or {}
+        self.enabled = bool(cfg.get('enabled', True))
+        self.max_age_hours = float(cfg.get('max_age_hours', 24))
+        self.ttl_overrides = cfg.get('ttl_hours') or {}
+        self.max_size_bytes = int(float(cfg.get('max_size_mb', 512)) * 1024 * 1024)
+        self.lock_timeout = float(cfg.get('lock_timeout_seconds', 300))
+        self.compression = resolve_compression(cfg.get('compression', 'auto'), self.logger)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'shared_fills': 0,
+            'writes': 0,
+            'evictions': 0,
+        }
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    # ------------------------------------------------------------------ paths
+    def path_for(self, key: str) -> str:
+        """Ruta donde se escribe la entrada con la compresión actual."""
+        return os.path.join(self.cache_dir, f"{key}{SUFFIXES[self.compression]}")
+
+    def find_path(self, key: str) -> Optional[str]:
+        """Ruta existente de la entrada, con cualquier compresión (o None)."""
+        preferred = self.path_for(key)
+        if os.path.exists(preferred):
+            return preferred
+        for suffix in SUFFIXES.values():
+            path = os.path.join(self.cache_dir, f"{key}{suffix}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def ttl_hours(self, key: str) -> float:
+        """TTL de una entrada: override por clave o cache.max_age_hours."""
+        try:
+            return float(self.ttl_overrides.get(key, self.max_age_hours))
+        except (TypeError, ValueError):
+            return self.max_age_hours
+
+    def exists(self, key: str) -> bool:
+        return self.enabled and self.find_path(key) is not None
+
+    def is_fresh(self, key: str) -> bool:
+        path = self.find_path(key)
+        return path is not None and is_cache_valid(path, self.ttl_hours(key))
+
+    # ---------------------------------------------------------------- reading
+    def _touch(self, path: str) -> None:
+        """Actualiza el último acceso (LRU) sin alterar mtime (TTL)."""
+        try:
+            st = os.stat(path)
+            os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+
+    def _lookup(self, key: str, allow_stale: bool, count: bool = True) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self.find_path(key)
+        if path is None:
+            if count:
+                self._count('misses')
+            return None
+        if not allow_stale and not is_cache_valid(path, self.ttl_hours(key)):
+            self.logger.info(f"Caché de {key} expirado (TTL {self.ttl_hours(key)}h)")
+            if count:
+                self._count('stale')
+                self._count('misses')
+            return None
+        if count:
+            self._count('hits')
+        self._touch(path)
+        return path
+
+    def get(self, key: str, allow_stale: bool = False, count: bool = True) -> Optional[Any]:
+        """Retorna el contenido cacheado si existe y está vigente."""
+        path = self._lookup(key, allow_stale, count)
+        if path is None:
+            return None
+        try:
+            with open_text(path) as f:
+                return json.load(f)
+        except (OSError, ValueError, EOFError) as e:
+            self.logger.warning(f"Entrada de caché {key} corrupta, se descarta: {e}")
+            self.invalidate(key)
+            return None
+
+    def iter_records(self, key: str, batch_size: Optional[int] = None,
+                     allow_stale: bool = False) -> Optional[Iterator[Any]]:
+        """Lee una entrada en streaming (registros o lotes); None si no hay entrada."""
+        path = self._lookup(key, allow_stale)
+        if path is None:
+            return None
+
+        def _records():
+            with open_text(path) as f:
+                def _chunks():
+                    while True:
+                        chunk = f.read(STREAM_CHUNK_SIZE)
+                        if not chunk:
+                            return
+                        yield chunk
+                yield from iter_json_array(_chunks())
+
+        return batched(_records(), batch_size) if batch_size else _records()
+
+    # ---------------------------------------------------------------- writing
+    def put(self, key: str, data: Any) -> Optional[str]:
+        """Escribe la entrada de forma atómica (temporal + rename) y aplica LRU."""
+        if not self.enabled:
+            return None
+        path = self.path_for(key)
+        tmp_path = os.path.join(
+            self.cache_dir, f".{key}.tmp.{os.getpid()}.{threading.get_ident()}"
+        )
+        try:
+            with open(tmp_path, 'wb') as raw:
+                dump_json(raw, data, self.compression)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # Eliminar variantes con otra compresión para que no se sirvan obsoletas
+        for suffix in SUFFIXES.values():
+            other = os.path.join(self.cache_dir, f"{key}{suffix}")
+            if other != path and os.path.exists(other):
+                os.remove(other)
+
+        self._count('writes')
+        self.evict()
+        return path
+
+    def refresh(self, key: str) -> None:
+        """Marca una entrada como recién validada (reinicia su TTL)."""
+        path = self.find_path(key)
+        if path is not None:
+            os.utime(path, None)
+
+    def invalidate(self, key: str) -> None:
+        """Elimina una entrada y su sidecar de metadatos."""
+        for suffix in list(SUFFIXES.values()) + ['.meta.json']:
+            path = os.path.join(self.cache_dir, f"{key}{suffix}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ---------------------------------------------------------------- locking
+    @contextmanager
+    def lock(self, key: str):
+        """Lock exclusivo entre procesos (y threads) para una entrada."""
+        if not self.enabled or fcntl is None:
+            yield
+            return
+        lock_path = os.path.join(self.cache_dir, f"{key}.lock")
+        with open(lock_path, 'a') as fh:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timeout esperando lock de caché para {key}")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def get_or_fill(self, key: str, fill: Callable[[], Any]) -> Any:
+        """Retorna la entrada vigente o ejecuta `fill` bajo lock.
+
+        Si otro proceso llenó la entrada mientras se esperaba el lock, se usa
+        ese resultado en lugar de volver a extraer. `fill` es responsable de
+        escribir la entrada (put).
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self.lock(key):
+            data = self.get(key, count=False)
+            if data is not None:
+                self._count('shared_fills')
+                return data
+            return fill()
+
+    # --------------------------------------------------------------- eviction
+    def _entries(self) -> List[Dict[str, Any]]:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('.') or name.endswith('.meta.json'):
+                continue
+            for suffix in SUFFIXES.values():
+                if name.endswith(suffix):
+                    path = os.path.join(self.cache_dir, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        break
+                    entries.append({
+                        'key': name[:-len(suffix)],
+                        'path': path,
+                        'size': st.st_size,
+                        'atime': st.st_atime,
+                    })
+                    break
+        return entries
+
+    def evict(self) -> int:
+        """Desaloja las entradas menos usadas hasta quedar bajo cache.max_size_mb."""
+        entries = self._entries()
+        total = sum(e['size'] for e in entries)
+        if total <= self.max_size_bytes:
+            return 0
+        evicted = 0
+        for entry in sorted(entries, key=lambda e: e['atime']):
+            if total <= self.max_size_bytes:
+                break
+            self.logger.info(f"Desalojando {entry['key']} del caché ({entry['size']} bytes)")
+            self.invalidate(entry['key'])
+            total -= entry['size']
+            evicted += 1
+        self._count('evictions', evicted)
+        return evicted
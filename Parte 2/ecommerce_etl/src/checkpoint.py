@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# checkpoint.py - checkpoints por ejecución para reanudar un pipeline fallido
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.snapshot import read_snapshot, resolve_format, write_snapshot
+from src.spill import PinnedDatasets, pin_datasets
+from src.state import StateStore
+
+# Fases del flujo batch, en orden de ejecución
+PHASES = ('extract', 'transform', 'data_quality', 'tests', 'load')
+
+
+class RunCheckpoint:
+    """Progreso de una ejecución en <root>/<run_id>/ para reanudarla con --resume.
+
+    checkpoint.json registra las fases completadas, el contexto necesario
+    para terminar (marcas de agua, hashes pendientes) y, por tabla, las
+    filas ya confirmadas en LOAD. La salida de la última fase con datos se
+    guarda como snapshot en <fase>/; las anteriores se borran porque la
+    reanudación parte siempre de la más reciente.
+
+    Con `writer` (BackgroundWriter) las fases se persisten en segundo plano,
+    en orden: una fase figura como completada recién cuando su salida está
+    escrita. Antes de LOAD hay que esperar al writer (los offsets de carga
+    suponen que las fases previas ya constan).
+    """
+
+    def __init__(self, root: str, run_id: str, fmt: str = 'arrow', enabled: bool = True,
+                 writer: Any = None):
+        self.root = root
+        self.run_id = run_id
+        self.enabled = enabled
+        self.writer = writer
+        self.format = resolve_format(fmt)
+        self.directory = os.path.join(root, run_id)
+        self.logger = logging.getLogger(__name__)
+        self._store: Optional[StateStore] = None
+
+    @classmethod
+    def resume(cls, root: str, run_id: str, fmt: str = 'arrow') -> 'RunCheckpoint':
+        """Abre el checkpoint de una ejecución previa ('latest' para la más reciente)."""
+        if run_id == 'latest':
+            runs = sorted(os.listdir(root)) if os.path.isdir(root) else []
+            if not runs:
+                raise ValueError(f"No hay checkpoints en {root}")
+            run_id = runs[-1]
+        checkpoint = cls(root, run_id, fmt)
+        if not os.path.exists(os.path.join(checkpoint.directory, 'checkpoint.json')):
+            raise ValueError(f"No existe checkpoint para la ejecución {run_id}")
+        return checkpoint
+
+    @property
+    def store(self) -> StateStore:
+        # El directorio se crea con la primera escritura, no al instanciar
+        if self._store is None:
+            self._store = StateStore(os.path.join(self.directory, 'checkpoint.json'))
+        return self._store
+
+    def _get(self, key: str) -> Any:
+        if not self.enabled or not self.exists():
+            return None
+        return self.store.get(key)
+
+    # ----------------------------------------------------------------- fases
+    def done(self, phase: str) -> bool:
+        return phase in (self._get('phases') or [])
+
+    def next_phase(self) -> Optional[str]:
+        """Primera fase sin completar (None si terminaron todas)."""
+        phases = self._get('phases') or []
+        return next((phase for phase in PHASES if phase not in phases), None)
+
+    def complete(self, phase: str, outputs: Optional[Dict[str, Any]] = None,
+                 fmt: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> None:
+        """Marca una fase como completada, persistiendo antes su salida y contexto."""
+        if not self.enabled:
+            return
+        # Datasets retenidos ahora (el llamador puede reemplazarlos después); los
+        # que están en disco se leen de a uno recién al escribirlos
+        pinned = pin_datasets(outputs) if outputs is not None else None
+        if self.writer is not None:
+            self.writer.submit(f"checkpoint {phase}", self._commit, phase, pinned, fmt, context)
+        else:
+            self._commit(phase, pinned, fmt, context)
+
+    def _commit(self, phase: str, pinned: Optional[PinnedDatasets], fmt: Optional[str],
+                context: Optional[Dict[str, Any]]) -> None:
+        if pinned is not None:
+            directory = os.path.join(self.directory, phase)
+            os.makedirs(directory, exist_ok=True)
+            try:
+                for key, data in pinned.items():
+                    # JSON compacto: el checkpoint no se lee a mano
+                    write_snapshot(data, directory, key, fmt or self.format, indent=None)
+            finally:
+                pinned.release()
+            previous = self.store.get('outputs')
+            self.store.set('outputs', {'phase': phase, 'keys': pinned.keys()})
+            if previous and previous['phase'] != phase:
+                shutil.rmtree(os.path.join(self.directory, previous['phase']), ignore_errors=True)
+        if context is not None:
+            self.store.set('context', context)
+        self.store.set('phases', (self.store.get('phases') or []) + [phase])
+        self.logger.info(f"Checkpoint {self.run_id}: fase {phase} completada")
+
+    def outputs(self, phase: str) -> Dict[str, Any]:
+        """Salida persistida de una fase completada (registros por dataset)."""
+        return dict(self.iter_outputs(phase))
+
+    def iter_outputs(self, phase: str) -> Iterator[Tuple[str, Any]]:
+        """Como `outputs`, pero lee cada dataset recién al pedirlo."""
+        saved = self._get('outputs') or {}
+        if saved.get('phase') != phase:
+            raise ValueError(f"El checkpoint {self.run_id} no guarda la salida de {phase}")
+        directory = os.path.join(self.directory, phase)
+        for key in saved['keys']:
+            yield key, read_snapshot(directory, key)
+
+    def context(self) -> Dict[str, Any]:
+        return self._get('context') or {}
+
+    # ------------------------------------------------------------------ LOAD
+    def offset(self, data_type: str) -> int:
+        """Filas de `data_type` ya confirmadas en la base por esta ejecución."""
+        return int((self._get('offsets') or {}).get(data_type, 0))
+
+    def advance(self, data_type: str, rows: int) -> None:
+        """Registra el offset confirmado tras el commit de un lote."""
+        if not self.enabled:
+            return
+        offsets = self.store.get('offsets') or {}
+        offsets[data_type] = rows
+        self.store.set('offsets', offsets)
+
+    def clear(self) -> None:
+        """Elimina el checkpoint (la ejecución terminó bien)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.directory)
+
+    @staticmethod
+    def apply_retention(root: str, retention_days: Optional[float], keep: Optional[str] = None) -> int:
+        """Elimina checkpoints de ejecuciones no reanudadas más viejos que la retención."""
+        if retention_days is None or not os.path.isdir(root):
+            return 0
+        cutoff = time.time() - float(retention_days) * 86400
+        expired = 0
+        for run_id in os.listdir(root):
+            path = os.path.join(root, run_id)
+            if run_id == keep or not os.path.isdir(path):
+                continue
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            expired += 1
+        if expired:
+            logging.getLogger(__name__).info(f"Checkpoints: {expired} ejecuciones eliminadas por retención")
+        return expired
@@ -2,7 +2,7 @@
 
 # data_quality.py - módulo generado automáticamente
 import logging
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class DataQualityChecker:
@@ -49,6 +49,7 @@ class DataQualityChecker:
 
         errors.extend(errs)
         details.extend(dets)
+        self._tag_sources(data, details)
 
         return {
             'is_valid': len(errors) == 0,
@@ -57,6 +58,14 @@ class DataQualityChecker:
             'details': details
         }
 
+    @staticmethod
+    def _tag_sources(data: List[Dict], details: List[Dict[str, Any]]) -> None:
+        """Agrega el origen (multi-tienda) a cada detalle que apunta a un registro."""
+        for det in details:
+            idx = det.get('record_index')
+            if idx is not None and 'source' not in det and 'source' in data[idx]:
+                det['source'] = data[idx]['source']
+
     def _validate_products(self, products: List[Dict]) -> Tuple[List[str], List[Dict[str, Any]]]:
         """Validaciones puntuales para products."""
         errors: List[str] = []
@@ -148,7 +157,9 @@ class DataQualityChecker:
             pid = p.get('product_id') or p.get('id')
             if pid is None:
                 continue
-            if pid in seen:
+            # Con varios orígenes el id solo es único dentro de cada tienda
+            key = (p.get('source'), pid)
+            if key in seen:
                 msg = f"products: Duplicado product_id {pid}"
                 errors.append(msg)
                 details.append({
@@ -156,11 +167,11 @@ class DataQualityChecker:
                     'record_id': pid,
                     'record_index': idx,
                     'issue': 'duplicate',
-                    'duplicate_of': seen[pid],
+                    'duplicate_of': seen[key],
                     'message': msg
                 })
             else:
-                seen[pid] = idx
+                seen[key] = idx
 
         return errors, details
 
@@ -223,11 +234,11 @@ class DataQualityChecker:
                     'message': msg
                 })
 
-        seen: Dict[Tuple[Any, Any], int] = {}
+        seen: Dict[Tuple[Any, Any, Any], int] = {}
         for idx, s in enumerate(sales):
-            key = (s.get('cart_id'), s.get('product_id'))
+            key = (s.get('source'), s.get('cart_id'), s.get('product_id'))
             if key in seen:
-                msg = f"sales: Duplicado cart_id/product_id {key}"
+                msg = f"sales: Duplicado cart_id/product_id {key[1:]}"
                 errors.append(msg)
                 details.append({
                     'dataset': 'sales',
@@ -275,7 +286,8 @@ class DataQualityChecker:
         seen: Dict[Any, int] = {}
         for idx, user in enumerate(users):
             uid = user.get('user_id') or user.get('id')
-            if uid in seen and uid is not None:
+            key = (user.get('source'), uid)
+            if key in seen and uid is not None:
                 msg = f"users: Duplicado user_id {uid}"
                 errors.append(msg)
                 details.append({
@@ -283,11 +295,11 @@ class DataQualityChecker:
                     'record_index': idx,
                     'record_id': uid,
                     'issue': 'duplicate',
-                    'duplicate_of': seen[uid],
+                    'duplicate_of': seen[key],
                     'message': msg
                 })
             else:
-                seen[uid] = idx
+                seen[key] = idx
 
         return errors, details
 
@@ -333,20 +345,22 @@ class DataQualityChecker:
         errors: List[str] = []
         details: List[Dict[str, Any]] = []
 
+        # Claves (origen, id): con varias tiendas la referencia es por tienda
         valid_product_ids = {
-            p.get('product_id') or p.get('id') for p in products
+            (p.get('source'), p.get('product_id') or p.get('id')) for p in products
             if p.get('product_id') is not None or p.get('id') is not None
         }
         valid_user_ids = {
-            u.get('user_id') or u.get('id') for u in users
+            (u.get('source'), u.get('user_id') or u.get('id')) for u in users
             if u.get('user_id') is not None or u.get('id') is not None
         }
 
         for idx, sale in enumerate(sales):
             pid = sale.get('product_id')
             uid = sale.get('user_id')
+            source = sale.get('source')
 
-            if pid is not None and pid not in valid_product_ids:
+            if pid is not None and (source, pid) not in valid_product_ids:
                 msg = f"Producto {pid} no existe"
                 errors.append(msg)
                 details.append({
@@ -358,7 +372,7 @@ class DataQualityChecker:
                     'message': msg
                 })
 
-            if uid is not None and uid not in valid_user_ids:
+            if uid is not None and (source, uid) not in valid_user_ids:
                 msg = f"Usuario {uid} no existe"
                 errors.append(msg)
                 details.append({
@@ -371,10 +385,17 @@ class DataQualityChecker:
                     'message': msg
                 })
 
+        self._tag_sources(sales, details)
         self.logger.info(f"[DQ] referential: inconsistencias encontradas = {len(errors)}")
         return errors, details
 
-    def validate_full_dataset(self, transformed_data: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    def validate_full_dataset(self, transformed_data: Dict[str, List[Dict]],
+                              reference: Optional[Dict[str, List[Dict]]] = None) -> Dict[str, Any]:
+        """Valida cada dataset y la integridad referencial de sales.
+
+        `reference` aporta dimensiones ya cargadas (sin cambios en esta ejecución)
+        que solo se usan para la integridad referencial, sin revalidarlas.
+        """
         self.logger.info(
             "[DQ] Iniciando validaciones de calidad de datos (completitud, rangos, duplicados, integridad referencial)"
         )
@@ -388,12 +409,17 @@ class DataQualityChecker:
             details.extend(res.get('details', []))
             records += res['records_checked']
 
-        if {'sales', 'products', 'users'}.issubset(transformed_data.keys()):
+        # Solo las dimensiones que usa la integridad referencial (sin materializar el resto)
+        datasets = dict(reference or {})
+        for dataset in ('products', 'users'):
+            if dataset in transformed_data:
+                datasets[dataset] = transformed_data[dataset]
+        if 'sales' in transformed_data and {'products', 'users'}.issubset(datasets.keys()):
             self.logger.info("[DQ] Ejecutando validacion de integridad referencial entre sales y dimensiones")
             ref_errors, ref_details = self._validate_referential_integrity(
                 transformed_data['sales'],
-                transformed_data['products'],
-                transformed_data['users']
+                datasets['products'],
+                datasets['users']
             )
             errors.extend(ref_errors)
             details.extend(ref_details)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# dates.py - servicio de fechas: parseo memoizado, date_key aritmético y calendario
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+# Entradas máximas del memo de parseo antes de vaciarlo
+PARSE_CACHE_SIZE = 200_000
+
+
+def date_key(value: date) -> int:
+    """Clave YYYYMMDD calculada con aritmética entera (sin strftime)."""
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+class DateService:
+    """Centraliza el trabajo con fechas del TRANSFORM.
+
+    - `now`: timestamp único de la ejecución (created_at/loaded_at)
+    - `parse`: parseo de fechas de carritos memoizado por string raw
+    - `calendar_row`: filas de dim_date memoizadas por día (se calculan al pedirlas)
+    """
+
+    def __init__(self, now: Optional[datetime] = None):
+        self.logger = logging.getLogger(__name__)
+        self.now = now or datetime.now()
+        self._parsed: Dict[Any, datetime] = {}
+        self._days: Dict[Any, Optional[date]] = {}
+        self._calendar: Dict[date, Dict[str, Any]] = {}
+        # Nombres de día/mes calculados una vez (respetan el locale como strftime)
+        monday = date(2024, 1, 1)
+        self._day_names = [(monday + timedelta(days=i)).strftime('%A') for i in range(7)]
+        self._month_names = [date(2024, m, 1).strftime('%B') for m in range(1, 13)]
+
+    def start_run(self, now: Optional[datetime] = None) -> None:
+        """Fija el timestamp de una nueva ejecución."""
+        self.now = now or datetime.now()
+
+    def _remember(self, cache: Dict, key: Any, value: Any) -> Any:
+        if len(cache) >= PARSE_CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+        return value
+
+    def parse(self, date_string: Any) -> datetime:
+        """Fecha de un carrito: ISO con 'T' (Z = UTC) o YYYY-MM-DD; si es inválida, `now`."""
+        try:
+            return self._parsed[date_string]
+        except (KeyError, TypeError):
+            pass
+        try:
+            # Formato: "2020-02-03T00:00:00.000Z"
+            if 'T' in date_string:
+                parsed = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+            else:
+                parsed = datetime.strptime(date_string, '%Y-%m-%d')
+        except (ValueError, TypeError):
+            self.logger.warning(f"Fecha inválida: {date_string}, usando fecha actual")
+            return self.now
+        return self._remember(self._parsed, date_string, parsed)
+
+    def to_date(self, raw: Any) -> Optional[date]:
+        """Normaliza date, datetime o str (ISO / YYYY-MM-DD) a date; None si no se puede."""
+        if isinstance(raw, datetime):
+            return raw.date()
+        if isinstance(raw, date):
+            return raw
+        if not isinstance(raw, str):
+            return None
+        try:
+            return self._days[raw]
+        except KeyError:
+            pass
+        try:
+            day = datetime.fromisoformat(raw).date()
+        except ValueError:
+            try:
+                day = datetime.strptime(raw, '%Y-%m-%d').date()
+            except ValueError:
+                day = None
+        return self._remember(self._days, raw, day)
+
+    def calendar_row(self, day: date) -> Dict[str, Any]:
+        """Fila de dim_date del día (copia de la fila memoizada)."""
+        row = self._calendar.get(day)
+        if row is None:
+            row = self._calendar[day] = {
+                'date_key': date_key(day),
+                'date': day,
+                'day': day.day,
+                'month': day.month,
+                'year': day.year,
+                'quarter': (day.month - 1) // 3 + 1,
+                'iso_week': day.isocalendar()[1],
+                'day_of_week': day.weekday(),
+                'day_name': self._day_names[day.weekday()],
+                'month_name': self._month_names[day.month - 1],
+            }
+        return dict(row)
@@ -3,46 +3,327 @@
 # extract.py - módulo generado automáticamente
 import requests
 import logging
-from typing import Dict, List, Any
+import codecs
+import copy
+import json
+import re
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import os
+from urllib.parse import urlparse
+
+from src.hedging import HedgingPolicy
+from src.throttle import AdaptiveThrottle
+from src.utils import batched
+
+# Tamaño de lectura para parseo incremental (bytes/caracteres por fragmento)
+STREAM_CHUNK_SIZE = 64 * 1024
+# Fin de un escalar JSON dentro de un array
+_SCALAR_END = re.compile(r'[\s,\]]')
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """Parsea incrementalmente un array JSON a partir de fragmentos de texto.
+
+    Solo mantiene en memoria el fragmento pendiente y el elemento en curso.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+    # 'start': antes de '['; 'first': tras '['; 'value': tras ','; 'sep': tras un elemento
+    state = 'start'
+
+    def _more():
+        nonlocal buf, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos >= len(buf):
+            if eof or not _more():
+                if state == 'start':
+                    return
+                raise ValueError("JSON incompleto: array sin cerrar")
+            continue
+
+        char = buf[pos]
+        if state == 'start':
+            if char != '[':
+                raise ValueError(f"Se esperaba un array JSON, encontrado {char!r}")
+            state = 'first'
+            pos += 1
+            continue
+        if state == 'sep':
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Se esperaba ',' o ']' en el array JSON, encontrado {char!r}")
+            state = 'value'
+            pos += 1
+            continue
+        if char == ']' and state == 'first':
+            return
+        if char in ',]':
+            raise ValueError(f"Elemento vacío en el array JSON (encontrado {char!r})")
+
+        if char not in '{["':
+            # Un escalar (número, true/false/null) que llega al final del buffer
+            # puede seguir en el próximo fragmento: leer más antes de decodificarlo.
+            if _SCALAR_END.search(buf, pos) is None and not eof and _more():
+                continue
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof or not _more():
+                raise
+            continue
+        pos = end
+        state = 'sep'
+        yield value
+
+
+def _decode_chunks(byte_chunks: Iterable[bytes], encoding: Optional[str] = None) -> Iterator[str]:
+    """Decodifica fragmentos de bytes a texto respetando caracteres multibyte."""
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')()
+    for chunk in byte_chunks:
+        if chunk:
+            yield decoder.decode(chunk)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_json_file(path: str, batch_size: Optional[int] = None,
+                   chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """Lee un archivo con un array JSON (p. ej. caché) registro a registro o en lotes."""
+    def _read_chunks():
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    records = iter_json_array(_read_chunks())
+    if batch_size:
+        yield from batched(records, batch_size)
+    else:
+        yield from records
+
+
+def resolve_sources(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Orígenes de datos configurados (api.sources) o el api.base_url único.
+
+    Cada origen tiene name, base_url, endpoints y `tagged`, que indica si sus
+    registros deben llevar el campo `source` (solo con api.sources).
+    """
+    api = config['api']
+    sources = api.get('sources')
+    if not sources:
+        return [{
+            'name': 'default',
+            'base_url': api['base_url'],
+            'endpoints': api.get('endpoints', {}),
+            'tagged': False,
+        }]
+    resolved = []
+    for src in sources:
+        if 'name' not in src or 'base_url' not in src:
+            raise ValueError("Cada origen en api.sources requiere 'name' y 'base_url'")
+        resolved.append({
+            'name': src['name'],
+            'base_url': src['base_url'].rstrip('/'),
+            'endpoints': src.get('endpoints') or api.get('endpoints', {}),
+            'tagged': True,
+        })
+    return resolved
+
+
+def _close_response(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
 
 class APIDataExtractor:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], pool_size: int = 10, cache_dir: Optional[str] = None):
         self.config = config
         self.logger = logging.getLogger(__name__)
-        self.base_url = config['api']['base_url']
+        self.sources = resolve_sources(config)
+        self.base_url = config['api'].get('base_url') or self.sources[0]['base_url']
+        # Directorio del caché de extracción; los validadores HTTP (ETag /
+        # Last-Modified) se guardan junto a cada cache/<endpoint>.json
+        self.cache_dir = cache_dir
+        # Tamaño del pool de conexiones: debe cubrir los workers concurrentes
+        # que comparten esta sesión.
+        self.pool_size = max(1, int(pool_size))
+        # Rate limiter + control de concurrencia AIMD opcional (api.rate_limit)
+        self.throttle = AdaptiveThrottle(config, max_concurrency=self.pool_size)
         self.session = self._create_session()
+        # Requests "hedged" opcionales (api.hedging) para recortar la latencia de cola
+        self.hedging = HedgingPolicy(config)
+        self._hedge_executor = None
+        self._hedge_executor_lock = threading.Lock()
+        # Requests por id en curso, para coalescer pedidos concurrentes del mismo recurso
+        self._inflight: Dict[Any, Future] = {}
+        self._inflight_lock = threading.Lock()
     
     def _create_session(self) -> requests.Session:
-        """Crea sesión con política de reintentos."""
+        """Crea sesión con política de reintentos y pool de conexiones compartido."""
         session = requests.Session()
         retry_config = self.config['api']['retry']
         
+        status_forcelist = list(retry_config['status_forcelist'])
+        if self.throttle.enabled:
+            # 429/503 los maneja el throttle (Retry-After + backoff AIMD), no el
+            # Retry del adapter, para que el control de concurrencia los vea.
+            status_forcelist = [s for s in status_forcelist if s not in (429, 503)]
+
         retry_strategy = Retry(
             total=retry_config['max_retries'],
             backoff_factor=retry_config['backoff_factor'],
-            status_forcelist=retry_config['status_forcelist'],
+            status_forcelist=status_forcelist,
+            # Con throttle, urllib3 no debe reintentar por su cuenta al ver Retry-After
+            respect_retry_after_header=not self.throttle.enabled,
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Un pool por host (todos los orígenes comparten la sesión); con
+        # api.max_connections_per_host el límite por host es estricto.
+        hosts = {urlparse(src['base_url']).netloc for src in self.sources}
+        per_host = self.config['api'].get('max_connections_per_host')
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=max(len(hosts), 1),
+            pool_maxsize=int(per_host or self.pool_size),
+            pool_block=bool(per_host),
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
         return session
     
-    def fetch_endpoint(self, endpoint_name: str, endpoint_path: str) -> List[Dict]:
+    def _get(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        """GET sobre la sesión compartida con el timeout configurado."""
+        kwargs.setdefault('timeout', int(os.getenv('API_TIMEOUT', 30)))
+        if self.throttle.enabled:
+            return self._throttled_get(endpoint_name, url, **kwargs)
+        return self._send(endpoint_name, url, **kwargs)
+
+    def _send(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        # Las respuestas en streaming no se duplican: el cuerpo se consume después
+        if self.hedging.enabled and not kwargs.get('stream'):
+            return self._hedged_get(endpoint_name, url, **kwargs)
+        return self.session.get(url, **kwargs)
+
+    def _throttled_get(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        """GET bajo rate limit y límite AIMD; ante 429/503 respeta Retry-After y reintenta."""
+        attempt = 0
+        while True:
+            with self.throttle.slot():
+                start = time.monotonic()
+                try:
+                    response = self._send(endpoint_name, url, **kwargs)
+                except requests.exceptions.RequestException:
+                    self.throttle.on_error()
+                    raise
+                latency = time.monotonic() - start
+
+            if response.status_code not in (429, 503):
+                self.throttle.on_success(latency)
+                return response
+
+            delay = self.throttle.on_throttled(response.headers.get('Retry-After'))
+            if attempt >= self.throttle.max_retries:
+                # Agotados los reintentos: el caller decide (raise_for_status)
+                return response
+            attempt += 1
+            self.throttle.record_retry()
+            self.logger.warning(
+                f"{endpoint_name}: HTTP {response.status_code}, reintento {attempt}/{self.throttle.max_retries} "
+                f"en {delay:.1f}s (concurrencia={self.throttle.controller.limit}, "
+                f"tasa={self.throttle.bucket.rate:.2f}/s)"
+            )
+            response.close()
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size * 2, thread_name_prefix='hedge'
+                )
+            return self._hedge_executor
+
+    def _timed_get(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        start = time.monotonic()
+        response = self.session.get(url, **kwargs)
+        self.hedging.record(endpoint_name, time.monotonic() - start)
+        return response
+
+    def _hedge_get(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        # El duplicado también consume la tasa del rate limit
+        if self.throttle.enabled:
+            self.throttle.token()
+        return self._timed_get(endpoint_name, url, **kwargs)
+
+    def _hedged_get(self, endpoint_name: str, url: str, **kwargs) -> requests.Response:
+        """GET que lanza un duplicado si el original supera el percentil de latencia.
+
+        Se retorna la primera respuesta que llegue; las demás se cierran al terminar.
+        """
+        self.hedging.register_request()
+        delay = self.hedging.hedge_delay(endpoint_name)
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._timed_get, endpoint_name, url, **kwargs)
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.hedging.try_acquire_hedge():
+            return primary.result()
+
+        self.logger.info(f"{endpoint_name}: sin respuesta en {delay * 1000:.0f} ms, lanzando request hedged")
+        hedge = executor.submit(self._hedge_get, endpoint_name, url, **kwargs)
+        pending = {primary, hedge}
+        winner = error = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif winner is None:
+                    winner = future
+                else:
+                    # Ambas terminaron a la vez: la que no se retorna se cierra
+                    future.result().close()
+        # Cerrar las perdedoras cuando terminen
+        for loser in pending:
+            loser.add_done_callback(_close_response)
+        if winner is None:
+            raise error
+        if winner is hedge:
+            self.hedging.record_win()
+        return winner.result()
+
+    def fetch_endpoint(self, endpoint_name: str, endpoint_path: str,
+                       params: Optional[Dict[str, Any]] = None) -> List[Dict]:
         """Extrae datos de un endpoint específico con manejo de errores."""
         url = f"{self.base_url}{endpoint_path}"
-        self.logger.info(f"Extrayendo datos de: {url}")
+        self.logger.info(f"Extrayendo datos de: {url}" + (f" params={params}" if params else ""))
         
         try:
-            response = self.session.get(
-                url, 
-                timeout=int(os.getenv('API_TIMEOUT', 30))
-            )
+            response = self._get(endpoint_name, url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -56,6 +337,250 @@ class APIDataExtractor:
             self.logger.error(f"Error parseando JSON de {endpoint_name}: {str(e)}")
             raise
     
+    def for_source(self, source: Dict[str, Any]) -> 'APIDataExtractor':
+        """Vista del extractor para otro origen.
+
+        Comparte sesión (pool de conexiones), throttle, hedging y coalescing;
+        solo cambia la base URL.
+        """
+        view = copy.copy(self)
+        view.base_url = source['base_url']
+        return view
+
+    def close(self) -> None:
+        """Espera requests hedged pendientes y cierra la sesión HTTP."""
+        with self._hedge_executor_lock:
+            if self._hedge_executor is not None:
+                self._hedge_executor.shutdown(wait=True)
+                self._hedge_executor = None
+        self.session.close()
+
+    def _validators_path(self, endpoint_name: str) -> Optional[str]:
+        """Ruta del sidecar de validadores HTTP para un endpoint."""
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{endpoint_name}.meta.json")
+
+    def load_validators(self, endpoint_name: str) -> Dict[str, str]:
+        """Lee ETag/Last-Modified guardados para un endpoint (vacío si no hay)."""
+        path = self._validators_path(endpoint_name)
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return {k: v for k, v in meta.items() if k in ('etag', 'last_modified') and v}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Validadores de {endpoint_name} ilegibles, se ignoran: {e}")
+            return {}
+
+    def save_validators(self, endpoint_name: str, validators: Dict[str, str]) -> None:
+        """Guarda ETag/Last-Modified del último cuerpo cacheado (escritura atómica)."""
+        path = self._validators_path(endpoint_name)
+        if not path:
+            return
+        if not validators:
+            # Sin validadores no se puede revalidar: eliminar sidecar obsoleto
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(validators, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _response_validators(response: requests.Response) -> Dict[str, str]:
+        """Extrae ETag/Last-Modified de una respuesta."""
+        validators = {}
+        if response.headers.get('ETag'):
+            validators['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            validators['last_modified'] = response.headers['Last-Modified']
+        return validators
+
+    def fetch_endpoint_conditional(self, endpoint_name: str, endpoint_path: str,
+                                   validators: Optional[Dict[str, str]] = None
+                                   ) -> Tuple[Optional[List[Dict]], Dict[str, str]]:
+        """GET condicional con If-None-Match / If-Modified-Since.
+
+        Retorna (data, validators). data es None cuando el servidor responde
+        304 Not Modified: el cuerpo cacheado sigue vigente.
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        url = f"{self.base_url}{endpoint_path}"
+        self.logger.info(f"Extrayendo datos de: {url} (condicional={bool(headers)})")
+        try:
+            response = self._get(endpoint_name, url, headers=headers or None)
+            if response.status_code == 304:
+                self.logger.info(f"{endpoint_name}: 304 Not Modified, se reutiliza el caché")
+                # Un 304 puede traer validadores actualizados
+                return None, {**validators, **self._response_validators(response)}
+            response.raise_for_status()
+            data = response.json()
+            self.logger.info(f"Extraídos {len(data)} registros de {endpoint_name}")
+            return data, self._response_validators(response)
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Error API para {endpoint_name}: {str(e)}")
+            raise
+        except ValueError as e:
+            self.logger.error(f"Error parseando JSON de {endpoint_name}: {str(e)}")
+            raise
+
+    def _pagination_config(self) -> Dict[str, Any]:
+        """Parámetros de paginación (api.pagination) con valores por defecto."""
+        cfg = self.config['api'].get('pagination') or {}
+        return {
+            'enabled': bool(cfg.get('enabled', False)),
+            'page_size': int(cfg.get('page_size', 100)),
+            'limit_param': cfg.get('limit_param', 'limit'),
+            'offset_param': cfg.get('offset_param', 'offset'),
+        }
+
+    def _stream_records(self, endpoint_name: str, url: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """Hace un GET en streaming y parsea el array JSON de forma incremental."""
+        try:
+            response = self._get(endpoint_name, url, params=params, stream=True)
+            try:
+                response.raise_for_status()
+                chunks = _decode_chunks(
+                    response.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                    response.encoding
+                )
+                yield from iter_json_array(chunks)
+            finally:
+                response.close()
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Error API para {endpoint_name}: {str(e)}")
+            raise
+        except ValueError as e:
+            self.logger.error(f"Error parseando JSON de {endpoint_name}: {str(e)}")
+            raise
+
+    def stream_endpoint(self, endpoint_name: str, endpoint_path: str,
+                        batch_size: Optional[int] = None,
+                        paginate: Optional[bool] = None) -> Iterator[Any]:
+        """Extrae un endpoint como generador de registros (o de lotes de batch_size).
+
+        Con paginación (api.pagination.enabled o paginate=True) recorre el endpoint
+        con parámetros limit/offset hasta recibir una página incompleta; la memoria
+        queda acotada por el tamaño de página/lote y no por el tamaño del endpoint.
+        """
+        pagination = self._pagination_config()
+        if paginate is None:
+            paginate = pagination['enabled']
+        url = f"{self.base_url}{endpoint_path}"
+        self.logger.info(f"Extrayendo datos en streaming de: {url} (paginado={paginate})")
+
+        if paginate:
+            records = self._iter_pages(endpoint_name, url, pagination)
+        else:
+            records = self._stream_records(endpoint_name, url)
+
+        if batch_size:
+            yield from batched(records, batch_size)
+        else:
+            yield from records
+
+    def _iter_pages(self, endpoint_name: str, url: str, pagination: Dict[str, Any]) -> Iterator[Dict]:
+        """Recorre un endpoint paginado estilo ?limit=&offset=."""
+        page_size = pagination['page_size']
+        offset = 0
+        # Primera página (acotada por page_size) para detectar un offset ignorado
+        first_page: List[Dict] = []
+        total = 0
+        while True:
+            params = {pagination['limit_param']: page_size, pagination['offset_param']: offset}
+            count = 0
+            ignored = False
+            for record in self._stream_records(endpoint_name, url, params=params):
+                if offset == 0:
+                    first_page.append(record)
+                elif count == 0 and first_page and record == first_page[0]:
+                    # La API ignora el offset y devuelve siempre la primera página
+                    ignored = True
+                    break
+                count += 1
+                yield record
+            if ignored:
+                self.logger.warning(
+                    f"{endpoint_name}: la API ignora '{pagination['offset_param']}'; se extrae sin paginar"
+                )
+                yield from self._rest_unpaginated(endpoint_name, url, first_page)
+                return
+            total += count
+            if count < page_size:
+                break
+            offset += count
+        self.logger.info(f"Extraídos {total} registros de {endpoint_name} (paginado)")
+
+    def _rest_unpaginated(self, endpoint_name: str, url: str, seen: List[Dict]) -> Iterator[Dict]:
+        """Resto del endpoint con un único GET sin paginar, omitiendo `seen` (ya emitidos).
+
+        Si la respuesta no empieza con esos mismos registros no se puede
+        continuar sin duplicar o perder datos: se aborta la extracción.
+        """
+        records = self._stream_records(endpoint_name, url)
+        for expected in seen:
+            if next(records, None) != expected:
+                raise RuntimeError(
+                    f"{endpoint_name}: la API ignora el offset y la respuesta sin paginar "
+                    f"no coincide con la primera página; extracción abortada"
+                )
+        yield from records
+
+    def fetch_product(self, product_id: Any, endpoint_path: str = '/products') -> Optional[Dict]:
+        """Extrae un producto por id (None si no existe).
+
+        Pedidos concurrentes del mismo id comparten un único request.
+        """
+        key = (self.base_url, endpoint_path, product_id)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            url = f"{self.base_url}{endpoint_path}/{product_id}"
+            response = self._get('products', url)
+            if response.status_code == 404:
+                result = None
+            else:
+                response.raise_for_status()
+                # FakeStore responde 200 con cuerpo vacío para ids inexistentes
+                result = response.json() if response.text.strip() else None
+            future.set_result(result)
+            return result
+        except Exception as e:
+            self.logger.error(f"Error API para producto {product_id}: {str(e)}")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def fetch_products_by_id(self, product_ids: Iterable[Any],
+                             endpoint_path: str = '/products') -> Dict[Any, Optional[Dict]]:
+        """Extrae concurrentemente varios productos por id; retorna {id: producto|None}."""
+        unique_ids = list(dict.fromkeys(product_ids))
+        if not unique_ids:
+            return {}
+        self.logger.info(f"Buscando {len(unique_ids)} productos por id en {endpoint_path}/<id>")
+        workers = max(1, min(self.pool_size, len(unique_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lookup') as executor:
+            results = executor.map(lambda pid: self.fetch_product(pid, endpoint_path), unique_ids)
+            return dict(zip(unique_ids, results))
+
     def fetch_all_data(self) -> Dict[str, List[Dict]]:
         """Extrae datos de todos los endpoints."""
         endpoints = self.config['api']['endpoints']
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# hedging.py - política de requests "hedged" para reducir la latencia de cola
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+
+
+class LatencyHistogram:
+    """Ventana deslizante de latencias recientes (segundos) de un endpoint."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Percentil (nearest-rank) de las muestras, o None si no hay."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(1, math.ceil(pct / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+
+class HedgingPolicy:
+    """Decide cuándo lanzar un request duplicado (api.hedging).
+
+    El retardo es el percentil configurado de la latencia observada del
+    endpoint, acotado a [min_delay_ms, max_delay_ms]. Los duplicados se
+    limitan a max_extra_ratio de los requests (más budget_burst iniciales).
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        cfg = (config.get('api') or {}).get('hedging') or {}
+        self.enabled = bool(cfg.get('enabled', False))
+        self.percentile = float(cfg.get('percentile', 95))
+        self.min_samples = int(cfg.get('min_samples', 10))
+        self.min_delay = float(cfg.get('min_delay_ms', 50)) / 1000.0
+        self.max_delay = float(cfg.get('max_delay_ms', 10000)) / 1000.0
+        self.max_extra_ratio = float(cfg.get('max_extra_ratio', 0.1))
+        self.budget_burst = int(cfg.get('budget_burst', 1))
+        self.window = int(cfg.get('window', 200))
+
+        self._histograms = defaultdict(lambda: LatencyHistogram(self.window))
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'budget_denied': 0,
+        }
+
+    def histogram(self, endpoint_name: str) -> LatencyHistogram:
+        with self._lock:
+            return self._histograms[endpoint_name]
+
+    def record(self, endpoint_name: str, seconds: float) -> None:
+        self.histogram(endpoint_name).record(seconds)
+
+    def hedge_delay(self, endpoint_name: str) -> Optional[float]:
+        """Segundos a esperar antes del duplicado (None si aún no hay datos)."""
+        hist = self.histogram(endpoint_name)
+        if len(hist) < self.min_samples:
+            return None
+        value = hist.percentile(self.percentile)
+        if value is None:
+            return None
+        return min(max(value, self.min_delay), self.max_delay)
+
+    def register_request(self) -> None:
+        with self._lock:
+            self.stats['requests'] += 1
+
+    def try_acquire_hedge(self) -> bool:
+        """Consume presupuesto para un duplicado si queda disponible."""
+        with self._lock:
+            budget = self.max_extra_ratio * self.stats['requests'] + self.budget_burst
+            if self.stats['hedges'] + 1 > budget:
+                self.stats['budget_denied'] += 1
+                return False
+            self.stats['hedges'] += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.stats['hedge_wins'] += 1
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# incremental.py - high-water mark para extracción incremental de carritos
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _parse_cart_date(value: Any) -> Optional[datetime]:
+    """Fecha de carrito como datetime con zona (UTC si no trae)."""
+    if not value:
+        return None
+    try:
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _cart_key(date_value: Any, cart_id: Any) -> Optional[Tuple[datetime, int]]:
+    parsed = _parse_cart_date(date_value)
+    if parsed is None:
+        return None
+    try:
+        cid = int(cart_id) if cart_id is not None else -1
+    except (TypeError, ValueError):
+        cid = -1
+    return parsed, cid
+
+
+def compute_watermark(carts: List[Dict], previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Máximo (fecha, cart_id) entre `carts` y la marca previa."""
+    best = _cart_key(previous.get('date'), previous.get('cart_id')) if previous else None
+    for cart in carts:
+        key = _cart_key(cart.get('date'), cart.get('id'))
+        if key is not None and (best is None or key > best):
+            best = key
+    if best is None:
+        return None
+    return {'date': best[0].isoformat(), 'cart_id': best[1]}
+
+
+def filter_new_carts(carts: List[Dict], watermark: Optional[Dict[str, Any]]) -> List[Dict]:
+    """Filtra en cliente los carritos posteriores a la marca (fecha, cart_id).
+
+    Los carritos sin fecha parseable se conservan para que DQ/transform los
+    reporten en lugar de descartarlos silenciosamente.
+    """
+    if not watermark:
+        return list(carts)
+    mark = _cart_key(watermark.get('date'), watermark.get('cart_id'))
+    if mark is None:
+        return list(carts)
+    new_carts = []
+    for cart in carts:
+        key = _cart_key(cart.get('date'), cart.get('id'))
+        if key is None or key > mark:
+            new_carts.append(cart)
+    return new_carts
+
+
+def date_filter_params(watermark: Optional[Dict[str, Any]], start_param: str = 'startdate',
+                       end_param: str = 'enddate') -> Dict[str, str]:
+    """Parámetros startdate/enddate (YYYY-MM-DD) para pedir solo el delta a la API."""
+    mark = _parse_cart_date(watermark.get('date')) if watermark else None
+    if mark is None:
+        return {}
+    return {
+        start_param: mark.date().isoformat(),
+        end_param: datetime.now(timezone.utc).date().isoformat(),
+    }
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# landing.py - zona de aterrizaje raw particionada por fecha, con manifest y retención
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from src.cache import SUFFIXES, dump_json, open_text, resolve_compression
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None
+
+
+def new_run_id(now: Optional[datetime] = None) -> str:
+    """Id de ejecución ordenable por fecha: YYYYMMDDTHHMMSS-xxxxxx."""
+    now = now or datetime.now()
+    return f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class LandingZone:
+    """Histórico de extracciones raw en endpoint=<clave>/dt=YYYY-MM-DD/run=<id>/.
+
+    Cada archivo se escribe comprimido y de forma atómica; manifest.json
+    registra por ejecución los endpoints, su ruta, registros, bytes y sha256.
+    Las particiones con dt anterior a etl.landing.retention_days se eliminan.
+    """
+
+    def __init__(self, root: str, config: Dict[str, Any]):
+        cfg = (config.get('etl') or {}).get('landing') or {}
+        self.root = root
+        self.logger = logging.getLogger(__name__)
+        self.enabled = bool(cfg.get('enabled', True))
+        self.retention_days = cfg.get('retention_days', 30)
+        self.compression = resolve_compression(cfg.get('compression', 'auto'), self.logger)
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # --------------------------------------------------------------- manifest
+    @contextmanager
+    def _manifest_lock(self):
+        """Lock exclusivo del manifest entre threads y entre procesos (varias ejecuciones)."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.manifest_path}.lock", 'a') as fh:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {'runs': {}}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Manifest de landing ilegible, se reinicia: {e}")
+            return {'runs': {}}
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def runs(self) -> Dict[str, Dict[str, Any]]:
+        with self._manifest_lock():
+            return self._read_manifest()['runs']
+
+    def latest_run(self) -> Optional[str]:
+        runs = self.runs()
+        return max(runs) if runs else None
+
+    # ---------------------------------------------------------------- writing
+    def partition_dir(self, key: str, run_id: str, dt: date) -> str:
+        return os.path.join(self.root, f"endpoint={key}", f"dt={dt.isoformat()}", f"run={run_id}")
+
+    def write(self, run_id: str, key: str, records: List[Dict], endpoint: Optional[str] = None,
+              source: Optional[str] = None, dt: Optional[date] = None) -> Optional[str]:
+        """Escribe los registros raw de un endpoint para una ejecución y los registra."""
+        if not self.enabled:
+            return None
+        dt = dt or datetime.now().date()
+        directory = self.partition_dir(key, run_id, dt)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-0000{SUFFIXES[self.compression]}")
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        try:
+            with open(tmp_path, 'wb') as raw:
+                dump_json(raw, records, self.compression)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+        with self._manifest_lock():
+            manifest = self._read_manifest()
+            run = manifest['runs'].setdefault(run_id, {'dt': dt.isoformat(), 'endpoints': {}})
+            run['endpoints'][key] = {
+                'endpoint': endpoint or key,
+                'source': source,
+                'path': os.path.relpath(path, self.root),
+                'records': len(records),
+                'bytes': os.path.getsize(path),
+                'sha256': digest.hexdigest(),
+                'written_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._write_manifest(manifest)
+        return path
+
+    # ---------------------------------------------------------------- reading
+    def read_run(self, run_id: str) -> Dict[str, List[Dict]]:
+        """Registros raw de una ejecución, unidos por endpoint (como _extract_phase)."""
+        runs = self.runs()
+        if run_id == 'latest':
+            run_id = self.latest_run()
+        if run_id not in runs:
+            raise KeyError(f"Ejecución {run_id} no encontrada en {self.manifest_path}")
+
+        raw_data: Dict[str, List[Dict]] = {}
+        for key, entry in runs[run_id]['endpoints'].items():
+            with open_text(os.path.join(self.root, entry['path'])) as f:
+                records = json.load(f)
+            raw_data.setdefault(entry.get('endpoint') or key, []).extend(records)
+        return raw_data
+
+    # -------------------------------------------------------------- retention
+    def apply_retention(self, today: Optional[date] = None) -> int:
+        """Elimina las ejecuciones con dt fuera de la retención; retorna cuántas."""
+        if not self.enabled or self.retention_days is None:
+            return 0
+        cutoff = (today or datetime.now().date()) - timedelta(days=int(self.retention_days))
+        with self._manifest_lock():
+            manifest = self._read_manifest()
+            expired = [
+                run_id for run_id, run in manifest['runs'].items()
+                if date.fromisoformat(run['dt']) < cutoff
+            ]
+            for run_id in expired:
+                for entry in manifest['runs'].pop(run_id)['endpoints'].values():
+                    shutil.rmtree(os.path.dirname(os.path.join(self.root, entry['path'])),
+                                  ignore_errors=True)
+            if expired:
+                self._write_manifest(manifest)
+            self._remove_empty_partitions()
+        if expired:
+            self.logger.info(f"Landing: {len(expired)} ejecuciones eliminadas por retención")
+        return len(expired)
+
+    def _remove_empty_partitions(self) -> None:
+        for current, _, _ in os.walk(self.root, topdown=False):
+            if current != self.root and not os.listdir(current):
+                try:
+                    os.rmdir(current)
+                except OSError:
+                    pass
@@ -7,6 +7,8 @@ import psycopg2.extras
 from contextlib import contextmanager
 import os
 
+from src.records import RecordBatch
+
 class DataLoader:
     def __init__(self, config):
         """Inicializa el cargador de datos."""
@@ -25,6 +27,7 @@ class DataLoader:
         # Table mapping (logical type -> base physical table name)
         self.table_mapping = {
             'dates': 'dim_date',
+            'categories': 'dim_category',
             'products': 'dim_products',
             'users': 'dim_users',
             'geography': 'dim_geography',
@@ -98,9 +101,13 @@ class DataLoader:
             if conn:
                 conn.close()
 
-    def load_data(self, data_type, data):
-        """Carga datos en la tabla correspondiente."""
-        if not data:
+    def load_data(self, data_type, data, start=0, on_batch=None):
+        """Carga datos en la tabla correspondiente.
+
+        `start` omite las filas ya confirmadas (reanudación) y `on_batch`
+        recibe el offset confirmado después del commit de cada lote.
+        """
+        if not data or start >= len(data):
             return
             
         table_base = self.table_mapping.get(data_type)
@@ -113,16 +120,29 @@ class DataLoader:
                 with conn.cursor() as cursor:
                     resolved_table = self._resolve_table_name(cursor, table_base)
 
-            self.logger.info(f"Cargando {len(data)} registros en {resolved_table}")
+            self.logger.info(f"Cargando {len(data) - start} registros en {resolved_table}")
 
             batch_size = self.config['etl']['batch_size']
-            for i in range(0, len(data), batch_size):
+            for i in range(start, len(data), batch_size):
                 batch = data[i:i + batch_size]
                 self._insert_batch(resolved_table, batch)
+                if on_batch is not None:
+                    on_batch(i + len(batch))
         except Exception as e:
             self.logger.error(f"Error cargando lote: {str(e)}")
             raise
 
+    def count_rows(self, data_type):
+        """Retorna la cantidad de filas cargadas en la tabla de `data_type`."""
+        table_base = self.table_mapping.get(data_type)
+        if not table_base:
+            raise ValueError(f"Unknown data type: {data_type}")
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                resolved_table = self._resolve_table_name(cursor, table_base)
+                cursor.execute(f"SELECT COUNT(*) FROM {resolved_table}")
+                return cursor.fetchone()[0]
+
     def _insert_batch(self, resolved_table_name, batch):
         """Inserta un lote de registros en la tabla especificada."""
         if not batch:
@@ -130,11 +150,12 @@ class DataLoader:
 
         # Column mappings for each table
         table_columns = {
-            'dim_products': ['product_id', 'title', 'price', 'description', 'category', 'image_url', 'rating_rate', 'rating_count'],
+            'dim_products': ['source', 'product_id', 'title', 'price', 'description', 'category', 'image_url', 'rating_rate', 'rating_count'],
+            'dim_category': ['category'],
             'dim_date': ['date_key', 'date', 'day', 'month', 'year', 'quarter', 'iso_week', 'day_of_week', 'day_name', 'month_name'],
-            'dim_users': ['user_id', 'email', 'username', 'first_name', 'last_name', 'phone'],
-            'dim_geography': ['geography_id', 'city', 'street', 'number', 'zipcode', 'lat', 'long'],
-            'fact_sales': ['sale_id', 'date_key', 'product_id', 'user_id', 'quantity', 'total_amount']
+            'dim_users': ['source', 'user_id', 'email', 'username', 'first_name', 'last_name', 'phone'],
+            'dim_geography': ['geography_id', 'source', 'city', 'street', 'number', 'zipcode', 'lat', 'long'],
+            'fact_sales': ['sale_id', 'source', 'date_key', 'product_id', 'user_id', 'quantity', 'total_amount']
         }
 
         # Get valid columns for this table
@@ -144,38 +165,50 @@ class DataLoader:
         if not valid_columns:
             raise ValueError(f"No column mapping defined for table {resolved_table_name}")
 
-        # Filter data to only include valid columns
-        filtered_batch = []
-        for record in batch:
-            filtered_record = {k: v for k, v in record.items() if k in valid_columns}
-            filtered_batch.append(filtered_record)
+        if isinstance(batch, RecordBatch):
+            # Lote columnar: se eligen las columnas y las tuplas salen de zip
+            columns = [c for c in batch.names if c in valid_columns]
+            filtered_batch = None
+        else:
+            # Filter data to only include valid columns
+            filtered_batch = []
+            for record in batch:
+                filtered_record = {k: v for k, v in record.items() if k in valid_columns}
+                filtered_batch.append(filtered_record)
 
-        # Get columns from filtered record
-        columns = list(filtered_batch[0].keys())
+            # Get columns from filtered record
+            columns = list(filtered_batch[0].keys())
 
         # Build query
         placeholders = ','.join(['%s'] * len(columns))
         column_names = ','.join(columns)
 
-        # Map known table base names to their primary key column so we can
+        # Map known table base names to their primary key columns so we can
         # perform a safe upsert (do nothing on conflict) instead of raising
         # a UniqueViolation when the same natural key is inserted again.
+        # Dimensions are keyed by (source, id): stores may reuse ids.
         conflict_columns = {
-            'dim_products': 'product_id',
-            'dim_date': 'date_key',
-            'dim_users': 'user_id',
-            'dim_geography': 'geography_id',
-            'fact_sales': 'sale_id'
+            'dim_products': ('source', 'product_id'),
+            'dim_category': ('category',),
+            'dim_date': ('date_key',),
+            'dim_users': ('source', 'user_id'),
+            'dim_geography': ('geography_id',),
+            'fact_sales': ('sale_id',)
         }
 
-        conflict_col = conflict_columns.get(base_name)
+        # 'source' has a column default ('' with a single store), so it may be absent
+        conflict_cols = conflict_columns.get(base_name)
+        if conflict_cols and all(c in columns or c == 'source' for c in conflict_cols):
+            conflict_target = ', '.join(conflict_cols)
+        else:
+            conflict_target = None
 
         # Special-case: for dim_products we want to update product metadata on
         # conflict to keep product information fresh. For other tables we
         # silently ignore duplicates (DO NOTHING).
-        if base_name == 'dim_products' and 'product_id' in columns:
+        if base_name == 'dim_products' and conflict_target:
             # Build SET clause excluding the PK
-            update_columns = [c for c in columns if c != 'product_id']
+            update_columns = [c for c in columns if c not in conflict_cols]
             if update_columns:
                 set_clause = ', '.join([f"{c}=EXCLUDED.{c}" for c in update_columns])
             else:
@@ -185,19 +218,19 @@ class DataLoader:
                 query = f"""
                         INSERT INTO {resolved_table_name} ({column_names})
                         VALUES ({placeholders})
-                        ON CONFLICT (product_id) DO UPDATE SET {set_clause}
+                        ON CONFLICT ({conflict_target}) DO UPDATE SET {set_clause}
                 """
             else:
                 query = f"""
                         INSERT INTO {resolved_table_name} ({column_names})
                         VALUES ({placeholders})
-                        ON CONFLICT (product_id) DO NOTHING
+                        ON CONFLICT ({conflict_target}) DO NOTHING
                 """
-        elif conflict_col and conflict_col in columns:
+        elif conflict_target:
             query = f"""
                     INSERT INTO {resolved_table_name} ({column_names})
                     VALUES ({placeholders})
-                    ON CONFLICT ({conflict_col}) DO NOTHING
+                    ON CONFLICT ({conflict_target}) DO NOTHING
             """
         else:
             query = f"""
@@ -206,7 +239,10 @@ class DataLoader:
             """
 
         # Convert records to tuples
-        data_tuples = [tuple(record[col] for col in columns) for record in filtered_batch]
+        if filtered_batch is None:
+            data_tuples = list(batch.rows(columns))
+        else:
+            data_tuples = [tuple(record[col] for col in columns) for record in filtered_batch]
 
         # Execute batch insert
         with self._get_connection() as conn:
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# lookup.py - búsqueda memoizada de productos ausentes en la extracción
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class ProductLookup:
+    """Resuelve productos por id vía API con memo persistente entre ejecuciones.
+
+    Los productos encontrados quedan memoizados; los ids inexistentes también,
+    pero solo por `negative_ttl_hours` (el producto puede publicarse después).
+    """
+
+    def __init__(self, extractor, store_path: str, endpoint_path: str = '/products',
+                 negative_ttl_hours: float = 24.0):
+        self.extractor = extractor
+        self.store_path = store_path
+        self.endpoint_path = endpoint_path
+        self.negative_ttl_seconds = float(negative_ttl_hours) * 3600
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # {'products': {id: producto}, 'missing': {id: epoch de la consulta}}
+        self._memo: Optional[Dict[str, Dict[str, Any]]] = None
+        self.stats = {'memo_hits': 0, 'fetched': 0, 'not_found': 0}
+
+    @staticmethod
+    def _key(product_id: Any) -> str:
+        # JSON solo admite claves string
+        return str(product_id)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._memo is None:
+            self._memo = {'products': {}, 'missing': {}}
+            if os.path.exists(self.store_path):
+                try:
+                    with open(self.store_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"Memo de productos ilegible, se reconstruye: {e}")
+                else:
+                    if set(data) == {'products', 'missing'}:
+                        self._memo = data
+                    else:
+                        # Formato anterior {id: producto|None}: los None se vuelven a consultar
+                        self._memo['products'] = {k: v for k, v in data.items() if v is not None}
+        return self._memo
+
+    def _known(self, key: str, now: float) -> bool:
+        """True si el id está memoizado (encontrado o inexistente dentro del TTL)."""
+        if key in self._memo['products']:
+            return True
+        checked_at = self._memo['missing'].get(key)
+        return checked_at is not None and now - checked_at < self.negative_ttl_seconds
+
+    def _persist(self) -> None:
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        tmp_path = f"{self.store_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._memo, f, ensure_ascii=False)
+        os.replace(tmp_path, self.store_path)
+
+    def resolve(self, product_ids: Iterable[Any]) -> Dict[Any, Dict]:
+        """Retorna {id: producto raw} para los ids encontrados (memo o API)."""
+        with self._lock:
+            memo = self._load()
+            now = time.time()
+            ids = list(dict.fromkeys(product_ids))
+            missing = [pid for pid in ids if not self._known(self._key(pid), now)]
+            self.stats['memo_hits'] += len(ids) - len(missing)
+
+            if missing:
+                fetched = self.extractor.fetch_products_by_id(missing, self.endpoint_path)
+                for pid, product in fetched.items():
+                    key = self._key(pid)
+                    self.stats['fetched'] += 1
+                    if product is None:
+                        memo['missing'][key] = now
+                        self.stats['not_found'] += 1
+                    else:
+                        memo['products'][key] = product
+                        memo['missing'].pop(key, None)
+                self._persist()
+
+            found = {}
+            for pid in ids:
+                product = memo['products'].get(self._key(pid))
+                if product is not None:
+                    found[pid] = product
+            self.logger.info(
+                f"Lookup de productos: {len(found)}/{len(ids)} resueltos "
+                f"({len(ids) - len(missing)} desde memo, {len(missing)} vía API)"
+            )
+            return found
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# price_index.py - índice denso de precios por (origen, id), opcionalmente en memoria compartida
+from array import array
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+# Ids por encima de max(DENSE_MIN_SPAN, DENSE_FACTOR * productos) usan el índice por dict
+DENSE_MIN_SPAN = 1024
+DENSE_FACTOR = 8
+
+
+def _as_id(value: Any) -> Optional[int]:
+    """Id entero no negativo utilizable como posición del array (None si no lo es)."""
+    if type(value) is int and value >= 0:
+        return value
+    return None
+
+
+class PriceIndex:
+    """Precios de productos en un array denso indexado por id, con bitmap de validez.
+
+    Cada origen (tienda) ocupa un segmento de `span` posiciones:
+    posición = slot(origen) * span + id. La búsqueda es un acceso O(1) al
+    array sin dicts por producto. Si los ids no son enteros pequeños (o el
+    rango es muy disperso) se usa un dict {(origen, id): precio}.
+
+    `share` copia los arrays a un bloque de multiprocessing.shared_memory y
+    retorna un handle liviano; los workers lo abren con `attach` sin copiar.
+    """
+
+    __slots__ = ('sources', 'span', 'prices', 'valid', 'mapping', '_shm')
+
+    def __init__(self, sources: Dict[Any, int], span: int, prices: Any = None, valid: Any = None,
+                 mapping: Optional[Dict] = None, shm: Optional[shared_memory.SharedMemory] = None):
+        self.sources = sources
+        self.span = span
+        self.prices = prices
+        self.valid = valid
+        self.mapping = mapping
+        self._shm = shm
+
+    @classmethod
+    def build(cls, products_data: List[Dict]) -> 'PriceIndex':
+        """Construye el índice; ante ids repetidos gana el último (como el dict original)."""
+        entries = []
+        dense = True
+        max_id = -1
+        for p in products_data:
+            try:
+                price = float(p.get('price', 0))
+            except (TypeError, ValueError):
+                price = None
+            product_id = p.get('id') or p.get('product_id')
+            entries.append((p.get('source'), product_id, price))
+            position = _as_id(product_id)
+            if position is None:
+                dense = False
+            elif position > max_id:
+                max_id = position
+
+        span = max_id + 1
+        if not dense or span > max(DENSE_MIN_SPAN, DENSE_FACTOR * len(entries)):
+            return cls({}, 0, mapping={(source, pid): price for source, pid, price in entries})
+
+        sources: Dict[Any, int] = {}
+        for source, _, _ in entries:
+            sources.setdefault(source, len(sources))
+        size = max(1, len(sources) * span)
+        prices = array('d', bytes(8 * size))
+        valid = bytearray((size + 7) // 8)
+        for source, pid, price in entries:
+            position = sources[source] * span + pid
+            if price is None:
+                valid[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+                continue
+            prices[position] = price
+            valid[position >> 3] |= 1 << (position & 7)
+        return cls(sources, span, prices, valid)
+
+    def price(self, source: Any, product_id: Any) -> Optional[float]:
+        """Precio del producto en su origen, o None si no está en el índice."""
+        if self.mapping is not None:
+            return self.mapping.get((source, product_id))
+        slot = self.sources.get(source)
+        if slot is None or type(product_id) is not int or not 0 <= product_id < self.span:
+            return None
+        position = slot * self.span + product_id
+        if self.valid[position >> 3] >> (position & 7) & 1:
+            return self.prices[position]
+        return None
+
+    def __contains__(self, key: Any) -> bool:
+        return self.price(*key) is not None
+
+    # ---------------------------------------------------------- shared memory
+    def share(self) -> Dict[str, Any]:
+        """Copia el índice a memoria compartida y retorna el handle para `attach`."""
+        if self.mapping is not None:
+            return {'mapping': self.mapping}
+        if self._shm is None:
+            price_bytes = self.prices.itemsize * len(self.prices)
+            shm = shared_memory.SharedMemory(create=True, size=price_bytes + len(self.valid))
+            shm.buf[:price_bytes] = self.prices.tobytes()
+            shm.buf[price_bytes:price_bytes + len(self.valid)] = self.valid
+            self._shm = shm
+        return {
+            'name': self._shm.name, 'sources': self.sources, 'span': self.span,
+            'size': len(self.prices), 'valid_bytes': len(self.valid),
+        }
+
+    @classmethod
+    def attach(cls, handle: Dict[str, Any]) -> 'PriceIndex':
+        """Abre un índice compartido sin copiar los arrays."""
+        if 'mapping' in handle:
+            return cls({}, 0, mapping=handle['mapping'])
+        shm = shared_memory.SharedMemory(name=handle['name'])
+        price_bytes = 8 * handle['size']
+        prices = shm.buf[:price_bytes].cast('d')
+        valid = shm.buf[price_bytes:price_bytes + handle['valid_bytes']]
+        return cls(handle['sources'], handle['span'], prices, valid, shm=shm)
+
+    def close(self, unlink: bool = False) -> None:
+        """Libera la memoria compartida (unlink solo desde el proceso que la creó)."""
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        if isinstance(self.prices, memoryview):
+            self.prices.release()
+            self.valid.release()
+            self.prices = self.valid = None
+        shm.close()
+        if unlink:
+            shm.unlink()
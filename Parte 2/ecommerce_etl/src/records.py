@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# records.py - lotes columnar de registros entre fases (transform -> DQ -> load)
+from array import array
+from collections.abc import Mapping
+from collections.abc import Sequence as SequenceABC
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Typecode de los códigos de columnas codificadas por diccionario
+CODE_TYPE = 'i'
+
+
+class DictColumn(SequenceABC):
+    """Columna codificada por diccionario: códigos enteros y valores distintos.
+
+    Cada fila guarda solo su código (4 bytes); el string se materializa al
+    leerla (iteración, RowView, LOAD), no al transformar.
+    """
+
+    __slots__ = ('codes', 'dictionary')
+
+    def __init__(self, codes: Iterable[int], dictionary: Sequence[Any]):
+        self.codes = codes if isinstance(codes, array) else array(CODE_TYPE, codes)
+        self.dictionary = list(dictionary)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DictColumn(self.codes[index], self.dictionary)
+        return self.dictionary[self.codes[index]]
+
+    def __iter__(self) -> Iterator[Any]:
+        return map(self.dictionary.__getitem__, self.codes)
+
+    def take(self, indices: Sequence[int]) -> 'DictColumn':
+        codes = self.codes
+        return DictColumn(array(CODE_TYPE, [codes[i] for i in indices]), self.dictionary)
+
+    def distinct(self) -> List[Any]:
+        """Valores distintos usados por alguna fila, en orden de código."""
+        used = set(self.codes)
+        return [value for code, value in enumerate(self.dictionary) if code in used]
+
+    @classmethod
+    def concat(cls, columns: Sequence['DictColumn']) -> 'DictColumn':
+        """Une columnas re-mapeando sus diccionarios a uno común."""
+        encoder = DictEncoder()
+        codes = array(CODE_TYPE)
+        for column in columns:
+            remap = [encoder.encode(value) for value in column.dictionary]
+            codes.extend(remap[code] for code in column.codes)
+        return cls(codes, encoder.dictionary)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (DictColumn, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"DictColumn({len(self.codes)} filas, {len(self.dictionary)} valores)"
+
+
+class DictEncoder:
+    """Interna valores y les asigna códigos enteros para una DictColumn.
+
+    `normalize` se aplica una vez por valor raw distinto (no por fila);
+    None se codifica tal cual, sin normalizar.
+    """
+
+    __slots__ = ('normalize', 'dictionary', '_codes', '_raw')
+
+    def __init__(self, normalize: Optional[Callable[[Any], Any]] = None):
+        self.normalize = normalize
+        self.dictionary: List[Any] = []
+        self._codes: Dict[Any, int] = {}
+        self._raw: Dict[Any, int] = {}
+
+    def encode(self, raw: Any) -> int:
+        try:
+            return self._raw[raw]
+        except KeyError:
+            pass
+        value = self.normalize(raw) if self.normalize is not None and raw is not None else raw
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self._raw[raw] = code
+        return code
+
+
+def _column(values: Iterable[Any], typecode: Optional[str]) -> Sequence:
+    """Columna compacta (array tipado) si todos los valores encajan; si no, lista."""
+    if isinstance(values, DictColumn):
+        return values
+    values = values if isinstance(values, (list, array)) else list(values)
+    if typecode:
+        if isinstance(values, array) and values.typecode == typecode:
+            return values
+        try:
+            return array(typecode, values)
+        except (TypeError, OverflowError):
+            pass
+    return values if isinstance(values, list) else list(values)
+
+
+class RowView(Mapping):
+    """Vista de solo lectura de una fila de un RecordBatch, con acceso tipo dict."""
+
+    __slots__ = ('_data', '_index')
+
+    def __init__(self, data: Dict[str, Sequence], index: int):
+        self._data = data
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key][self._index]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class RecordBatch:
+    """Registros en columnas: un nombre por columna y una secuencia por columna.
+
+    Las columnas numéricas sin nulos se guardan en array tipados ('q', 'd'),
+    por lo que una venta ocupa unos pocos bytes por campo en lugar de un dict.
+    Se comporta como una secuencia de filas tipo dict (RowView), de modo que
+    el código que recorre List[Dict] sigue funcionando sin copiar.
+    """
+
+    __slots__ = ('_data', '_length', 'types')
+
+    def __init__(self, columns: Dict[str, Iterable[Any]], types: Optional[Dict[str, str]] = None):
+        self.types = dict(types or {})
+        self._data: Dict[str, Sequence] = {
+            name: _column(values, self.types.get(name)) for name, values in columns.items()
+        }
+        lengths = {len(values) for values in self._data.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columnas de distinto largo: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+
+    # ----------------------------------------------------------- construcción
+    @classmethod
+    def from_rows(cls, names: Sequence[str], rows: Iterable[Sequence[Any]],
+                  types: Optional[Dict[str, str]] = None,
+                  dictionaries: Optional[Dict[str, Sequence[Any]]] = None) -> 'RecordBatch':
+        """Lote desde tuplas; en las columnas de `dictionaries` las tuplas traen códigos."""
+        rows = list(rows)
+        columns = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+        for name, dictionary in (dictionaries or {}).items():
+            columns[name] = DictColumn(columns[name], dictionary)
+        return cls(columns, types)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping], names: Optional[Sequence[str]] = None,
+                     types: Optional[Dict[str, str]] = None) -> 'RecordBatch':
+        records = list(records)
+        if names is None:
+            names = list(dict.fromkeys(chain.from_iterable(records)))
+        return cls({name: [r.get(name) for r in records] for name in names}, types)
+
+    @classmethod
+    def concat(cls, batches: Iterable['RecordBatch']) -> 'RecordBatch':
+        batches = [b for b in batches if b is not None]
+        if not batches:
+            return cls({})
+        names = list(dict.fromkeys(chain.from_iterable(b.names for b in batches)))
+        types = {}
+        for batch in batches:
+            types.update(batch.types)
+        columns: Dict[str, Any] = {}
+        for name in names:
+            parts = [b._data.get(name) for b in batches]
+            if all(isinstance(part, DictColumn) for part in parts):
+                columns[name] = DictColumn.concat(parts)
+                continue
+            values: List[Any] = []
+            for batch in batches:
+                values.extend(batch._data[name] if name in batch._data else [None] * len(batch))
+            columns[name] = values
+        return cls(columns, types)
+
+    # ---------------------------------------------------------------- acceso
+    @property
+    def names(self) -> List[str]:
+        return list(self._data)
+
+    def column(self, name: str) -> Sequence:
+        return self._data[name]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[RowView]:
+        data = self._data
+        return (RowView(data, i) for i in range(self._length))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordBatch({name: values[index] for name, values in self._data.items()}, self.types)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('RecordBatch index out of range')
+        return RowView(self._data, index)
+
+    def take(self, indices: Sequence[int]) -> 'RecordBatch':
+        """Nuevo lote con las filas indicadas, en ese orden."""
+        return RecordBatch({
+            name: values.take(indices) if isinstance(values, DictColumn) else [values[i] for i in indices]
+            for name, values in self._data.items()
+        }, self.types)
+
+    def rows(self, names: Optional[Sequence[str]] = None) -> Iterator[tuple]:
+        """Tuplas de valores por fila (p. ej. para execute_batch)."""
+        return zip(*(self._data[name] for name in (names or self.names)))
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        return {name: list(values) for name, values in self._data.items()}
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        names = self.names
+        return [dict(zip(names, row)) for row in self.rows(names)]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RecordBatch):
+            return self.to_pydict() == other.to_pydict()
+        if isinstance(other, list):
+            return len(other) == self._length and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"RecordBatch({self._length} filas, columnas={self.names})"
+
+
+def distinct_values(data: Any, name: str) -> List[Any]:
+    """Valores distintos (no nulos) de una columna, sin recorrer filas si está codificada."""
+    if isinstance(data, RecordBatch):
+        if name not in data.names:
+            return []
+        column = data.column(name)
+        values = column.distinct() if isinstance(column, DictColumn) else dict.fromkeys(column)
+    else:
+        values = dict.fromkeys(record.get(name) for record in data)
+    return [value for value in values if value is not None]
+
+
+def take(data: Any, indices: Sequence[int]) -> Any:
+    """Selecciona filas por índice de un RecordBatch o de una lista de dicts."""
+    if isinstance(data, RecordBatch):
+        return data.take(indices)
+    return [data[i] for i in indices]
+
+
+def concat(chunks: Iterable[Any]) -> Any:
+    """Une resultados por chunk (RecordBatch o listas) preservando el orden."""
+    chunks = list(chunks)
+    if chunks and all(isinstance(c, RecordBatch) for c in chunks):
+        return RecordBatch.concat(chunks)
+    return [record for chunk in chunks for record in chunk]
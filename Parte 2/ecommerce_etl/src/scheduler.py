@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# scheduler.py - grafo de tareas con dependencias ejecutado en un pool de threads
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+class TaskGraph:
+    """DAG pequeño de tareas: cada una corre cuando terminaron sus dependencias.
+
+    `fn` recibe los resultados de sus dependencias en el orden declarado y su
+    retorno queda en `results[name]`. Las tareas listas se ejecutan en
+    paralelo; ante el primer error no se lanzan nuevas, se esperan las que
+    están corriendo y se relanza ese error.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._tasks: Dict[str, Callable[..., Any]] = {}
+        self._deps: Dict[str, List[str]] = {}
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = ()) -> str:
+        if name in self._tasks:
+            raise ValueError(f"Tarea duplicada: {name}")
+        self._tasks[name] = fn
+        self._deps[name] = list(deps)
+        return name
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        """Dependientes por tarea; valida dependencias desconocidas y ciclos."""
+        dependents: Dict[str, List[str]] = {name: [] for name in self._tasks}
+        for name, deps in self._deps.items():
+            for dep in deps:
+                if dep not in self._tasks:
+                    raise ValueError(f"Tarea {name} depende de {dep}, que no existe")
+                dependents[dep].append(name)
+
+        pending = {name: len(deps) for name, deps in self._deps.items()}
+        ready = [name for name, count in pending.items() if count == 0]
+        visited = 0
+        while ready:
+            visited += 1
+            for child in dependents[ready.pop()]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        if visited != len(self._tasks):
+            cycle = sorted(name for name, count in pending.items() if count > 0)
+            raise ValueError(f"Ciclo de dependencias entre: {', '.join(cycle)}")
+        return dependents
+
+    def _call(self, name: str) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._tasks[name](*(self.results[dep] for dep in self._deps[name]))
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def run(self, max_workers: int = 1, keep: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Ejecuta el grafo completo y retorna los resultados por tarea.
+
+        Con `keep`, el resultado de cualquier otra tarea se libera en cuanto
+        terminan todas las que dependen de ella.
+        """
+        dependents = self._dependents()
+        pending = {name: len(deps) for name, deps in self._deps.items()}
+        consumers = {name: len(children) for name, children in dependents.items()}
+        keep = None if keep is None else set(keep)
+        failed = None
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='task') as executor:
+            running = {
+                executor.submit(self._call, name): name for name, count in pending.items() if count == 0
+            }
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Tarea {name} falló: {e}")
+                        if failed is None:
+                            failed = e
+                        continue
+                    if failed is not None:
+                        continue
+                    for dep in self._deps[name]:
+                        consumers[dep] -= 1
+                        if keep is not None and consumers[dep] == 0 and dep not in keep:
+                            self.results.pop(dep, None)
+                    for child in dependents[name]:
+                        pending[child] -= 1
+                        if pending[child] == 0:
+                            running[executor.submit(self._call, child)] = child
+        if failed is not None:
+            raise failed
+        return self.results
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# snapshot.py - persistencia de snapshots raw/processed en JSON, Parquet o Arrow IPC
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None
+    pq = None
+
+from src.records import DictColumn, RecordBatch
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'json': '.json',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+
+def _column_types() -> Dict[str, Dict[str, Any]]:
+    """Tipos de columna de las entidades procesadas (el resto se infiere)."""
+    return {
+        'products': {
+            'product_id': pa.int64(), 'price': pa.float64(),
+            'rating_rate': pa.float64(), 'rating_count': pa.int64(),
+        },
+        'users': {'user_id': pa.int64(), 'created_at': pa.timestamp('us')},
+        'geography': {
+            'user_id': pa.int64(), 'lat': pa.float64(), 'lng': pa.float64(),
+            'created_at': pa.timestamp('us'),
+        },
+        'sales': {
+            'cart_id': pa.int64(), 'user_id': pa.int64(), 'product_id': pa.int64(),
+            'date_key': pa.int32(), 'quantity': pa.int64(), 'unit_price': pa.float64(),
+            'total_amount': pa.float64(), 'loaded_at': pa.timestamp('us'),
+        },
+        'dates': {
+            'date_key': pa.int32(), 'date': pa.date32(), 'day': pa.int8(), 'month': pa.int8(),
+            'year': pa.int16(), 'quarter': pa.int8(), 'iso_week': pa.int8(), 'day_of_week': pa.int8(),
+        },
+    }
+
+
+def resolve_format(fmt: Optional[str]) -> str:
+    """Normaliza el formato; sin pyarrow los formatos columnares caen a JSON."""
+    fmt = (fmt or 'json').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de snapshot desconocido: {fmt}")
+    if fmt != 'json' and pa is None:
+        logger.warning(f"pyarrow no está instalado; snapshots en JSON en lugar de {fmt}")
+        return 'json'
+    return fmt
+
+
+def snapshot_path(directory: str, name: str, fmt: str) -> str:
+    return os.path.join(directory, f"{name}{FORMATS[fmt]}")
+
+
+def _dictionary_array(column: DictColumn) -> 'pa.DictionaryArray':
+    """DictColumn como columna dictionary de Arrow (índices + valores distintos)."""
+    dictionary = column.dictionary
+    if None not in dictionary:
+        return pa.DictionaryArray.from_arrays(pa.array(column.codes, pa.int32()), pa.array(dictionary))
+    # Parquet no admite nulos dentro del diccionario: el nulo va en los índices
+    null_code = dictionary.index(None)
+    remap = [code - (code > null_code) for code in range(len(dictionary))]
+    indices = pa.array([None if code == null_code else remap[code] for code in column.codes], pa.int32())
+    return pa.DictionaryArray.from_arrays(indices, pa.array(dictionary[:null_code] + dictionary[null_code + 1:]))
+
+
+def to_arrow_table(records: Any, name: Optional[str] = None) -> 'pa.Table':
+    """Construye una tabla Arrow con tipos explícitos para las columnas conocidas."""
+    if isinstance(records, RecordBatch):
+        table = pa.Table.from_pydict({
+            name: _dictionary_array(column) if isinstance(column, DictColumn) else list(column)
+            for name, column in ((n, records.column(n)) for n in records.names)
+        })
+    else:
+        table = pa.Table.from_pylist(list(records))
+    known = _column_types().get(name or '', {})
+    if not known:
+        return table
+    schema = pa.schema([
+        pa.field(field.name, known.get(field.name, field.type)) for field in table.schema
+    ])
+    return table.cast(schema)
+
+
+def write_snapshot(records: Any, directory: str, name: str, fmt: str = 'json',
+                   indent: Optional[int] = 2) -> str:
+    """Escribe un snapshot (lista de registros) de forma atómica y retorna su ruta.
+
+    Parquet/Arrow guardan columnas tipadas (timestamps reales, enteros, floats).
+    Si los registros no se pueden tipar (tipos mezclados), se usa JSON.
+    Con `indent=None` el JSON sale compacto vía json.dumps (encoder en C,
+    ~3x más rápido que json.dump) para archivos internos que nadie lee a mano.
+    """
+    fmt = resolve_format(fmt)
+    if fmt != 'json':
+        try:
+            table = to_arrow_table(records, name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError) as e:
+            logger.warning(f"Snapshot {name} no convertible a {fmt} ({e}); se guarda en JSON")
+            fmt = 'json'
+
+    path = snapshot_path(directory, name, fmt)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        if fmt == 'parquet':
+            pq.write_table(table, tmp_path, compression='zstd')
+        elif fmt == 'arrow':
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            if isinstance(records, RecordBatch):
+                records = records.to_dicts()
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if indent is None and hasattr(records, 'chunks'):
+                    # Por chunks (ChunkedRecords): no se arma la lista completa
+                    f.write('[')
+                    first = True
+                    for chunk in records.chunks():
+                        if chunk:
+                            f.write(('' if first else ',') + json.dumps(chunk, ensure_ascii=False, default=str)[1:-1])
+                            first = False
+                    f.write(']')
+                elif indent is None:
+                    f.write(json.dumps(list(records), ensure_ascii=False, default=str))
+                else:
+                    json.dump(records, f, indent=indent, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Evitar que un snapshot anterior en otro formato se lea como vigente
+    for other_fmt in FORMATS:
+        other = snapshot_path(directory, name, other_fmt)
+        if other != path and os.path.exists(other):
+            os.remove(other)
+    return path
+
+
+def find_snapshot(directory: str, name: str) -> Optional[str]:
+    for fmt in FORMATS:
+        path = snapshot_path(directory, name, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_snapshot_table(path: str) -> 'pa.Table':
+    """Lee un snapshot columnar como tabla Arrow (Arrow IPC vía memory map)."""
+    if path.endswith(FORMATS['parquet']):
+        return pq.read_table(path)
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def table_to_batch(table: 'pa.Table', types: Optional[Dict[str, str]] = None) -> RecordBatch:
+    """Tabla Arrow como RecordBatch; las columnas dictionary vuelven a ser DictColumn."""
+    columns: Dict[str, Any] = {}
+    for name, column in zip(table.column_names, table.columns):
+        column = column.combine_chunks()
+        if pa.types.is_dictionary(column.type):
+            dictionary = column.dictionary.to_pylist()
+            indices = column.indices
+            if indices.null_count:
+                # El nulo viaja en los índices: vuelve al diccionario como un valor más
+                indices = indices.fill_null(len(dictionary))
+                dictionary.append(None)
+            columns[name] = DictColumn(indices.to_pylist(), dictionary)
+        else:
+            columns[name] = column.to_pylist()
+    return RecordBatch(columns, types)
+
+
+def read_snapshot(directory: str, name: str) -> Optional[List[Dict]]:
+    """Lee un snapshot en cualquier formato como lista de registros (None si no existe)."""
+    path = find_snapshot(directory, name)
+    if path is None:
+        return None
+    if path.endswith(FORMATS['json']):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if pa is None:
+        raise RuntimeError(f"pyarrow es necesario para leer {path}")
+    return read_snapshot_table(path).to_pylist()
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+
+# spill.py - presupuesto de memoria para datasets intermedios, con spill a disco
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import partial
+from collections.abc import MutableMapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.records import DictColumn, RecordBatch
+from src.snapshot import FORMATS, read_snapshot_table, resolve_format, table_to_batch, write_snapshot
+from src.utils import batched
+
+# Filas muestreadas para estimar el tamaño de columnas de objetos o listas de dicts
+SAMPLE_ROWS = 32
+MB = 1024 * 1024
+
+
+def _deep_size(value: Any) -> int:
+    """Tamaño aproximado de un valor raw (dicts/listas anidados incluidos)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(v) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(v) for v in value)
+    return size
+
+
+def _sampled_size(values: Any) -> int:
+    """Tamaño de una secuencia de objetos extrapolado desde una muestra uniforme."""
+    count = len(values)
+    if not count:
+        return 0
+    step = max(1, count // SAMPLE_ROWS)
+    sample = [values[i] for i in range(0, count, step)][:SAMPLE_ROWS]
+    return 8 * count + sum(_deep_size(v) for v in sample) * count // len(sample)
+
+
+def estimate_size(data: Any) -> int:
+    """Bytes aproximados de un dataset (RecordBatch o lista de registros).
+
+    Los arrays tipados se cuentan exacto; las columnas de objetos y las
+    listas de dicts por muestreo, sin recorrer todas las filas.
+    """
+    if isinstance(data, RecordBatch):
+        total = 0
+        for name in data.names:
+            column = data.column(name)
+            if isinstance(column, array):
+                total += column.itemsize * len(column)
+            elif isinstance(column, DictColumn):
+                total += column.codes.itemsize * len(column.codes) + _sampled_size(column.dictionary)
+            else:
+                total += _sampled_size(column)
+        return total
+    try:
+        return _sampled_size(data)
+    except TypeError:
+        return sys.getsizeof(data)
+
+
+class _Entry:
+    __slots__ = ('data', 'size', 'path', 'types', 'pins', 'dropped')
+
+    def __init__(self, data: Any, size: int):
+        self.data = data
+        self.size = size
+        self.path: Optional[str] = None
+        self.types: Optional[Dict[str, str]] = None
+        # Escrituras pendientes que la retienen (su archivo de spill no se borra)
+        self.pins = 0
+        self.dropped = False
+
+
+def iter_chunks(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Chunks de una lista de registros; los de un ChunkedRecords sin releerlos."""
+    if isinstance(records, ChunkedRecords):
+        return records.chunks()
+    return batched(records, size)
+
+
+class MemoryBudget:
+    """Contabiliza los datasets intermedios vivos y baja a disco los fríos.
+
+    Si el total residente supera `budget_bytes`, se escribe a disco el
+    dataset más grande entre los fríos (todos menos el que se está usando)
+    hasta volver al presupuesto: RecordBatch en Arrow IPC (columnas tipadas,
+    diccionarios incluidos) y listas de registros en JSON compacto. Un
+    dataset bajado se vuelve a leer recién cuando alguien lo accede. Sin
+    presupuesto solo se contabiliza (stats de memoria).
+
+    Con presupuesto, las listas de más de `chunk_rows` registros se guardan
+    por chunks (ChunkedRecords): cada chunk se baja a disco por separado y
+    recorrerlas deja residente solo el chunk en curso.
+    """
+
+    def __init__(self, directory: str, budget_bytes: Optional[int] = None, fmt: str = 'arrow',
+                 chunk_rows: Optional[int] = None):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.chunk_rows = chunk_rows
+        self.format = resolve_format(fmt)
+        self.logger = logging.getLogger(__name__)
+        # Orden de uso: el primero es el menos reciente
+        self._entries: 'OrderedDict[Tuple[str, str], _Entry]' = OrderedDict()
+        self._resident = 0
+        self._lock = threading.RLock()
+        self._namespaces = itertools.count()
+        # Nombres de spill únicos: una entrada retenida no comparte archivo con su reemplazo
+        self._files = itertools.count()
+        self.stats = {
+            'budget_mb': round(budget_bytes / MB, 1) if budget_bytes else None,
+            'peak_mb': 0.0, 'spilled': 0, 'spilled_mb': 0.0, 'paged_in': 0,
+        }
+
+    def datasets(self, name: str) -> 'DatasetStore':
+        """Nuevo mapping de datasets bajo este presupuesto."""
+        return DatasetStore(self, f"{name}-{next(self._namespaces)}")
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident
+
+    # --------------------------------------------------------------- entradas
+    def put(self, key: Tuple[str, str], data: Any) -> None:
+        with self._lock:
+            self.drop(key)
+            entry = self._entries[key] = _Entry(data, estimate_size(data))
+            self._resident += entry.size
+            self.stats['peak_mb'] = max(self.stats['peak_mb'], round(self._resident / MB, 1))
+            self._enforce(key)
+
+    def get(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            if entry.data is None:
+                entry.data = self._read(entry)
+                self._resident += entry.size
+                self.stats['paged_in'] += 1
+                self.stats['peak_mb'] = max(self.stats['peak_mb'], round(self._resident / MB, 1))
+                self._enforce(key)
+            return entry.data
+
+    def chunked(self, data: Any) -> bool:
+        """True si `data` debe guardarse por chunks (lista grande con presupuesto)."""
+        return bool(self.budget_bytes and self.chunk_rows) and type(data) is list and len(data) > self.chunk_rows
+
+    def put_chunks(self, namespace: str, name: str, records: List[Any], owner: Any = None) -> 'ChunkedRecords':
+        """Guarda `records` como chunks de `chunk_rows` y retorna la vista que los recorre."""
+        keys, offsets = [], [0]
+        for i, start in enumerate(range(0, len(records), self.chunk_rows)):
+            chunk = records[start:start + self.chunk_rows]
+            key = (namespace, f"{name}#{i}")
+            self.put(key, chunk)
+            keys.append(key)
+            offsets.append(offsets[-1] + len(chunk))
+        return ChunkedRecords(self, keys, offsets, owner)
+
+    def rename(self, old: Tuple[str, str], new: Tuple[str, str]) -> None:
+        """Mueve una entrada a otra clave sin leerla de disco."""
+        with self._lock:
+            self.drop(new)
+            self._entries[new] = self._entries.pop(old)
+
+    def pin(self, key: Tuple[str, str]) -> _Entry:
+        """Retiene una entrada para leerla después aunque su clave se reemplace."""
+        with self._lock:
+            entry = self._entries[key]
+            entry.pins += 1
+            return entry
+
+    def read_pinned(self, entry: _Entry) -> Any:
+        """Datos de una entrada retenida; si está en disco se leen sin volver a residir."""
+        with self._lock:
+            data = entry.data
+        return data if data is not None else self._read(entry)
+
+    def unpin(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.pins -= 1
+            if entry.pins == 0 and entry.dropped:
+                entry.data = None
+                self._remove_file(entry)
+
+    def resident(self, key: Tuple[str, str]) -> bool:
+        with self._lock:
+            return self._entries[key].data is not None
+
+    def drop(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            if entry.data is not None:
+                self._resident -= entry.size
+            if entry.pins:
+                # Una escritura pendiente todavía la lee: se borra al soltarla
+                entry.dropped = True
+                return
+            self._remove_file(entry)
+
+    @staticmethod
+    def _remove_file(entry: _Entry) -> None:
+        if entry.path and os.path.exists(entry.path):
+            os.remove(entry.path)
+
+    def drop_namespace(self, namespace: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == namespace]:
+                self.drop(key)
+
+    def close(self) -> None:
+        """Libera todo y borra los archivos de spill."""
+        with self._lock:
+            self._entries.clear()
+            self._resident = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ------------------------------------------------------------------ spill
+    def _enforce(self, hot: Tuple[str, str]) -> None:
+        if not self.budget_bytes:
+            return
+        while self._resident > self.budget_bytes:
+            cold = [(entry.size, key) for key, entry in self._entries.items()
+                    if key != hot and entry.data is not None]
+            if not cold:
+                return
+            self._spill(max(cold)[1])
+
+    def _spill(self, key: Tuple[str, str]) -> None:
+        entry = self._entries[key]
+        if entry.path is None:
+            # Un dataset leído de disco y no reemplazado no se reescribe
+            directory = os.path.join(self.directory, key[0])
+            os.makedirs(directory, exist_ok=True)
+            if isinstance(entry.data, RecordBatch):
+                entry.types = entry.data.types
+                fmt = self.format
+            else:
+                fmt = 'json'
+            entry.path = write_snapshot(entry.data, directory, f"{key[1]}.{next(self._files)}", fmt, indent=None)
+            self.stats['spilled'] += 1
+            self.stats['spilled_mb'] = round(self.stats['spilled_mb'] + entry.size / MB, 1)
+            self.logger.info(f"Spill de {key[1]} a disco (~{entry.size / MB:.1f} MB)")
+        entry.data = None
+        self._resident -= entry.size
+
+    def _read(self, entry: _Entry) -> Any:
+        if entry.path.endswith(FORMATS['json']):
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if entry.types is not None:
+                return RecordBatch.from_records(records, types=entry.types)
+            return records
+        return table_to_batch(read_snapshot_table(entry.path), entry.types)
+
+
+class ChunkedRecords(Sequence):
+    """Lista de registros guardada por chunks bajo un MemoryBudget.
+
+    Se comporta como una lista de solo lectura; recorrerla (o `chunks()`)
+    trae a memoria un chunk por vez, así los ya recorridos pueden volver a
+    disco mientras se procesa el resto.
+    """
+
+    def __init__(self, budget: MemoryBudget, keys: List[Tuple[str, str]], offsets: List[int],
+                 owner: Any = None):
+        self._budget = budget
+        self._keys = keys
+        self._offsets = offsets
+        # El DatasetStore dueño de los chunks vive mientras viva la vista
+        self._owner = owner
+
+    def _chunk(self, i: int) -> List[Any]:
+        return self._budget.get(self._keys[i])
+
+    def chunks(self) -> Iterator[List[Any]]:
+        for i in range(len(self._keys)):
+            yield self._chunk(i)
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        i = bisect_right(self._offsets, index) - 1
+        return self._chunk(i)[index - self._offsets[i]]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, ChunkedRecords)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"ChunkedRecords({len(self)} registros en {len(self._keys)} chunks)"
+
+
+class _PinnedChunks(ChunkedRecords):
+    """ChunkedRecords sobre entradas retenidas (ver PinnedDatasets)."""
+
+    def __init__(self, budget: MemoryBudget, entries: List[_Entry], offsets: List[int]):
+        super().__init__(budget, [None] * len(entries), offsets)
+        self._entries = entries
+
+    def _chunk(self, i: int) -> List[Any]:
+        return self._budget.read_pinned(self._entries[i])
+
+
+class PinnedDatasets:
+    """Datasets tomados en un momento dado para escribirlos después, uno por vez.
+
+    De un DatasetStore se retienen las entradas, no los datos: los que están
+    en disco se leen recién al recorrer `items()` y no vuelven al presupuesto.
+    Hay que llamar a `release()` al terminar.
+    """
+
+    def __init__(self, loaders: List[Tuple[str, Callable[[], Any]]],
+                 release: Callable[[], None] = lambda: None):
+        self._loaders = loaders
+        self._release = release
+
+    def keys(self) -> List[str]:
+        return [name for name, _ in self._loaders]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for name, load in self._loaders:
+            yield name, load()
+
+    def release(self) -> None:
+        self._release()
+
+
+def pin_datasets(datasets: Any) -> PinnedDatasets:
+    """PinnedDatasets de un DatasetStore o de un dict común (por referencia)."""
+    if isinstance(datasets, DatasetStore):
+        return datasets.pin()
+    return PinnedDatasets([(name, (lambda data=data: data)) for name, data in datasets.items()])
+
+
+class DatasetStore(MutableMapping):
+    """Mapping nombre -> dataset cuyo contenido puede vivir en disco.
+
+    Se usa como el dict de datasets de cada fase: leer una clave trae el
+    dataset de vuelta a memoria si estaba bajado; `in`, `len` y `clear` no
+    leen nada de disco.
+    """
+
+    def __init__(self, budget: MemoryBudget, namespace: str):
+        self._budget = budget
+        self._namespace = namespace
+        self._keys: Dict[str, None] = {}
+        self._chunked: Dict[str, ChunkedRecords] = {}
+        # Si el mapping se descarta sin clear(), sus entradas salen del presupuesto
+        weakref.finalize(self, budget.drop_namespace, namespace)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self._chunked:
+            return self._chunked[key]
+        return self._budget.get((self._namespace, key))
+
+    def __setitem__(self, key: str, data: Any) -> None:
+        self._release(key)
+        self._keys[key] = None
+        if self._budget.chunked(data):
+            self._chunked[key] = self._budget.put_chunks(self._namespace, key, data, owner=self)
+        else:
+            self._budget.put((self._namespace, key), data)
+
+    def __delitem__(self, key: str) -> None:
+        del self._keys[key]
+        self._release(key)
+
+    def _release(self, key: str) -> None:
+        view = self._chunked.pop(key, None)
+        for chunk_key in (view._keys if view is not None else [(self._namespace, key)]):
+            self._budget.drop(chunk_key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self) -> None:
+        """Libera todos los datasets sin leer los que están en disco."""
+        self._keys.clear()
+        self._chunked.clear()
+        self._budget.drop_namespace(self._namespace)
+
+    def adopt(self, other: 'DatasetStore') -> None:
+        """Mueve los datasets de `other` a este mapping sin leerlos de disco."""
+        for key in list(other._keys):
+            self._release(key)
+            self._keys[key] = None
+            view = other._chunked.pop(key, None)
+            if view is None:
+                self._budget.rename((other._namespace, key), (self._namespace, key))
+                continue
+            for i, chunk_key in enumerate(view._keys):
+                view._keys[i] = (self._namespace, chunk_key[1])
+                self._budget.rename(chunk_key, view._keys[i])
+            view._owner = self
+            self._chunked[key] = view
+        other._keys.clear()
+
+    def __repr__(self) -> str:
+        return f"DatasetStore({list(self._keys)})"
+
+    def pin(self) -> PinnedDatasets:
+        """Retiene los datasets actuales sin leerlos de disco (ver PinnedDatasets)."""
+        budget = self._budget
+        loaders, pinned = [], []
+        for name in self._keys:
+            view = self._chunked.get(name)
+            if view is None:
+                entry = budget.pin((self._namespace, name))
+                pinned.append(entry)
+                loaders.append((name, partial(budget.read_pinned, entry)))
+            else:
+                entries = [budget.pin(key) for key in view._keys]
+                pinned.extend(entries)
+                loaders.append((name, partial(_PinnedChunks, budget, entries, view._offsets)))
+
+        def release():
+            for entry in pinned:
+                budget.unpin(entry)
+
+        return PinnedDatasets(loaders, release)
+
+    def in_memory(self, key: str) -> bool:
+        """True si el dataset está residente (no bajado a disco)."""
+        if key in self._chunked:
+            return all(self._budget.resident(k) for k in self._chunked[key]._keys)
+        return self._budget.resident((self._namespace, key))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# stages.py - etapas solapadas conectadas por colas acotadas (productor/consumidor)
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Intervalo con que las esperas revisan si otra etapa falló
+POLL_SECONDS = 0.1
+
+_CLOSED = object()
+
+
+class StageAborted(Exception):
+    """Otra etapa falló; la actual se detiene sin procesar más."""
+
+
+class Channel:
+    """Cola acotada entre dos etapas.
+
+    `put` bloquea mientras la cola está llena (backpressure hacia el
+    productor) y la iteración termina cuando el productor llama a `close`.
+    Ambas esperas se cortan con StageAborted si el runner se cancela.
+    """
+
+    def __init__(self, name: str, maxsize: int, abort: threading.Event):
+        self.name = name
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._abort = abort
+        self.stats = {'items': 0, 'max_depth': 0, 'blocked_put_seconds': 0.0}
+
+    def put(self, item: Any) -> None:
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise StageAborted(self.name)
+            try:
+                self._queue.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        self.stats['blocked_put_seconds'] += time.perf_counter() - start
+        if item is not _CLOSED:
+            self.stats['items'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+
+    def close(self) -> None:
+        self.put(_CLOSED)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            if self._abort.is_set():
+                raise StageAborted(self.name)
+            try:
+                item = self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _CLOSED:
+                return
+            yield item
+
+
+class StageRunner:
+    """Lanza etapas en threads, conecta sus colas y propaga el primer error.
+
+    Si una etapa falla se cancelan las demás (sus put/get lanzan
+    StageAborted) y `join` relanza el error original.
+    """
+
+    def __init__(self, queue_size: int = 4):
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(__name__)
+        self.abort = threading.Event()
+        self.channels: Dict[str, Channel] = {}
+        self.busy_seconds: Dict[str, float] = {}
+        self._threads: List[threading.Thread] = []
+        self._errors: List[BaseException] = []
+        self._lock = threading.Lock()
+
+    def channel(self, name: str, maxsize: Optional[int] = None) -> Channel:
+        channel = Channel(name, maxsize or self.queue_size, self.abort)
+        self.channels[name] = channel
+        return channel
+
+    def add_busy(self, stage: str, seconds: float) -> None:
+        """Suma tiempo de trabajo (sin esperas de cola) a una etapa."""
+        with self._lock:
+            self.busy_seconds[stage] = self.busy_seconds.get(stage, 0.0) + seconds
+
+    def _fail(self, name: str, error: BaseException) -> None:
+        with self._lock:
+            if not isinstance(error, StageAborted):
+                self._errors.append(error)
+                self.logger.error(f"Etapa {name} falló: {error}")
+        self.abort.set()
+
+    def spawn(self, name: str, fn: Callable[..., Any], *args: Any) -> None:
+        def _target():
+            try:
+                fn(*args)
+            except BaseException as e:
+                self._fail(name, e)
+
+        thread = threading.Thread(target=_target, name=f"stage-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def run_here(self, name: str, fn: Callable[..., Any], *args: Any) -> None:
+        """Ejecuta una etapa en el thread actual (p. ej. LOAD) y espera a las demás."""
+        try:
+            fn(*args)
+        except BaseException as e:
+            self._fail(name, e)
+        self.join()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {f"{k}_busy_s": round(v, 3) for k, v in self.busy_seconds.items()}
+        for name, channel in self.channels.items():
+            stats[f"{name}_blocked_s"] = round(channel.stats['blocked_put_seconds'], 3)
+            stats[f"{name}_max_depth"] = channel.stats['max_depth']
+        return stats
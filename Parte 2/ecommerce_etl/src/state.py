@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# state.py - estado persistente del pipeline entre ejecuciones
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict
+
+
+class StateStore:
+    """Archivo JSON clave/valor con escritura atómica (temporal + rename)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def _read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Estado ilegible en {self.path}, se ignora: {e}")
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._read().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            state = self._read()
+            state[key] = value
+            tmp_path = f"{self.path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
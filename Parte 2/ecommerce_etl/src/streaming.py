@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# streaming.py - estado entre chunks del modo streaming (memoria acotada)
+from typing import Any, Dict, List, Set, Tuple
+
+from src.records import take
+
+
+# Páginas de 64K ids; una página pasa a bitmap (8 KB) al superar DENSE_AT ids
+PAGE_BITS = 16
+PAGE_MASK = (1 << PAGE_BITS) - 1
+DENSE_AT = 256
+
+
+class IdSet:
+    """Conjunto de ids enteros en un bitmap disperso por páginas.
+
+    Cada página cubre 64K ids consecutivos y empieza como un set chico; al
+    volverse densa pasa a un bitmap de 8 KB. Un millón de carritos con ids
+    correlativos ocupa ~128 KB en lugar de decenas de MB de un set, y un id
+    aislado muy grande (10**12) cuesta lo mismo que en un set, no un bitmap
+    hasta ese id. Los ids no enteros caen a un set normal.
+    """
+
+    __slots__ = ('_pages', '_other', '_count')
+
+    def __init__(self):
+        self._pages: Dict[int, Any] = {}
+        self._other: Set[Any] = set()
+        self._count = 0
+
+    def add(self, value: Any) -> bool:
+        """Agrega `value`; retorna False si ya estaba."""
+        if type(value) is not int:
+            if value in self._other:
+                return False
+            self._other.add(value)
+            self._count += 1
+            return True
+        page_no, offset = value >> PAGE_BITS, value & PAGE_MASK
+        page = self._pages.get(page_no)
+        if page is None:
+            self._pages[page_no] = {offset}
+        elif isinstance(page, set):
+            if offset in page:
+                return False
+            page.add(offset)
+            if len(page) >= DENSE_AT:
+                bits = bytearray(1 << (PAGE_BITS - 3))
+                for o in page:
+                    bits[o >> 3] |= 1 << (o & 7)
+                self._pages[page_no] = bits
+        else:
+            byte, bit = offset >> 3, 1 << (offset & 7)
+            if page[byte] & bit:
+                return False
+            page[byte] |= bit
+        self._count += 1
+        return True
+
+    def __contains__(self, value: Any) -> bool:
+        if type(value) is not int:
+            return value in self._other
+        page = self._pages.get(value >> PAGE_BITS)
+        if page is None:
+            return False
+        offset = value & PAGE_MASK
+        if isinstance(page, set):
+            return offset in page
+        return bool(page[offset >> 3] & (1 << (offset & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class StreamState:
+    """Estructuras pequeñas que cruzan chunks en el modo streaming.
+
+    - precios por (origen, id) para el índice de transform_carts
+    - claves de productos/usuarios validados (integridad referencial)
+    - carritos ya vistos por origen (duplicados entre chunks)
+    - date_keys ya enviadas a dim_date
+    Ninguna crece con el detalle de las ventas.
+    """
+
+    def __init__(self):
+        self._prices: Dict[Tuple[Any, Any], Any] = {}
+        self._price_index: Any = None
+        self.product_keys: Dict[Tuple[Any, Any], None] = {}
+        self.user_keys: Dict[Tuple[Any, Any], None] = {}
+        self._carts: Dict[Any, IdSet] = {}
+        self.date_keys: Set[int] = set()
+
+    # -------------------------------------------------------------- productos
+    def add_products(self, products: List[Dict]) -> None:
+        """Registra precios raw de productos (gana el último, como en modo batch)."""
+        for p in products:
+            # Misma clave que PriceIndex.build y find_missing_product_ids
+            product_id = p.get('id') or p.get('product_id')
+            if product_id is not None:
+                self._prices[(p.get('source'), product_id)] = p.get('price', 0)
+        self._price_index = None
+
+    def product_refs(self) -> List[Dict]:
+        """Productos conocidos con la forma mínima que usan find_missing/price_index."""
+        return [{'source': source, 'id': pid, 'price': price}
+                for (source, pid), price in self._prices.items()]
+
+    def price_index(self, transformer: Any) -> Any:
+        """Índice de precios del backend (PriceIndex o DataFrame), reconstruido si hubo productos nuevos."""
+        if self._price_index is None:
+            self._price_index = transformer.price_index(self.product_refs())
+        return self._price_index
+
+    # ---------------------------------------------------------- referencias
+    def reference(self) -> Dict[str, List[Dict]]:
+        """Dimensiones ya validadas, para la integridad referencial de sales."""
+        return {
+            'products': [{'source': s, 'product_id': i} for s, i in self.product_keys],
+            'users': [{'source': s, 'user_id': i} for s, i in self.user_keys],
+        }
+
+    def remember(self, data: Dict[str, Any]) -> None:
+        """Registra las claves de un chunk validado (se carga a continuación, en orden)."""
+        for record in data.get('products', []):
+            self.product_keys[(record.get('source'), record.get('product_id'))] = None
+        for record in data.get('users', []):
+            self.user_keys[(record.get('source'), record.get('user_id'))] = None
+        if 'dates' in data and len(data['dates']):
+            self.date_keys.update(data['dates'].column('date_key'))
+
+    # --------------------------------------------------------------- ventas
+    def new_carts(self, carts: List[Dict]) -> Tuple[List[Dict], int]:
+        """Carritos no vistos en chunks anteriores (y cuántos se descartaron)."""
+        fresh = []
+        for cart in carts:
+            seen = self._carts.setdefault(cart.get('source'), IdSet())
+            if cart.get('id') is None or seen.add(cart['id']):
+                fresh.append(cart)
+        return fresh, len(carts) - len(fresh)
+
+    def new_dates(self, dates: Any) -> Any:
+        """Filas de dim_date cuyo date_key no vino en un chunk anterior."""
+        keys = dates.column('date_key') if len(dates) else []
+        return take(dates, [i for i, key in enumerate(keys) if key not in self.date_keys])
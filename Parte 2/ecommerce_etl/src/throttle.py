@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+# throttle.py - rate limiter (token bucket) y control de concurrencia AIMD para la API
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Segundos indicados por un header Retry-After (delta o fecha HTTP)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class TokenBucket:
+    """Token bucket compartido entre threads, con pausa global (Retry-After)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Bloquea hasta obtener un token; retorna los segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    sleep_for = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return waited
+                    sleep_for = (1.0 - self._tokens) / self.rate if self.rate > 0 else 0.1
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def pause(self, seconds: float) -> None:
+        """Suspende la emisión de tokens durante `seconds` (p. ej. Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class AIMDController:
+    """Límite de requests en vuelo con incremento aditivo y decremento multiplicativo.
+
+    Sube el límite en 1 tras una ventana de respuestas sanas (latencia dentro
+    de latency_factor veces la mejor observada) y lo reduce al recibir
+    429/503 o errores.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 decrease_factor: float = 0.5, latency_factor: float = 2.0):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(max(int(initial), self.min_limit), self.max_limit)
+        self.decrease_factor = float(decrease_factor)
+        self.latency_factor = float(latency_factor)
+        self.in_flight = 0
+        self._healthy = 0
+        self._best_latency: Optional[float] = None
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._cond:
+            if self._best_latency is None or latency < self._best_latency:
+                self._best_latency = latency
+            if latency > self._best_latency * self.latency_factor:
+                # Latencia degradada: mantener el límite actual
+                self._healthy = 0
+                return
+            self._healthy += 1
+            if self._healthy >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._healthy = 0
+                self._cond.notify_all()
+
+    def on_congestion(self) -> None:
+        with self._cond:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            self._healthy = 0
+
+
+class AdaptiveThrottle:
+    """Combina TokenBucket y AIMDController según api.rate_limit."""
+
+    def __init__(self, config: Dict[str, Any], max_concurrency: int):
+        cfg = (config.get('api') or {}).get('rate_limit') or {}
+        self.enabled = bool(cfg.get('enabled', False))
+        self.max_rate = float(cfg.get('rate_per_second', 10))
+        self.min_rate = float(cfg.get('min_rate_per_second', 0.5))
+        self.rate_step = float(cfg.get('rate_increase_step', 0.5))
+        self.max_retries = int(cfg.get('max_throttle_retries', 5))
+        self.max_retry_after = float(cfg.get('max_retry_after_seconds', 60))
+        self.default_backoff = float(cfg.get('default_backoff_seconds', 1))
+        decrease = float(cfg.get('decrease_factor', 0.5))
+
+        self.bucket = TokenBucket(self.max_rate, cfg.get('burst', self.max_rate))
+        self.controller = AIMDController(
+            initial=cfg.get('initial_concurrency', 2),
+            min_limit=cfg.get('min_concurrency', 1),
+            max_limit=cfg.get('max_concurrency', max_concurrency),
+            decrease_factor=decrease,
+            latency_factor=cfg.get('latency_factor', 2.0),
+        )
+        self.decrease_factor = decrease
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'errors': 0,
+            'retries': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    @contextmanager
+    def slot(self):
+        """Espera un token y un lugar en vuelo antes de emitir un request."""
+        waited = self.bucket.acquire()
+        with self.controller.slot():
+            self._count('requests')
+            if waited:
+                self._count('wait_seconds', waited)
+            yield
+
+    def token(self) -> None:
+        """Espera solo un token de tasa (requests hedged: el original ya ocupa el lugar en vuelo)."""
+        waited = self.bucket.acquire()
+        self._count('requests')
+        if waited:
+            self._count('wait_seconds', waited)
+
+    def on_success(self, latency: float) -> None:
+        self.controller.on_success(latency)
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.rate_step))
+
+    def on_throttled(self, retry_after: Optional[str]) -> float:
+        """Registra un 429/503: reduce concurrencia y tasa y pausa según Retry-After."""
+        self._count('throttled')
+        self.controller.on_congestion()
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease_factor))
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.default_backoff
+        delay = min(delay, self.max_retry_after)
+        self.bucket.pause(delay)
+        return delay
+
+    def record_retry(self) -> None:
+        self._count('retries')
+
+    def on_error(self) -> None:
+        self._count('errors')
+        self.controller.on_congestion()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['concurrency_limit'] = self.controller.limit
+        stats['rate_per_second'] = round(self.bucket.rate, 3)
+        return stats
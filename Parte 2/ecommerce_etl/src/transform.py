@@ -3,42 +3,117 @@
 # transform.py - módulo generado automáticamente
 import pandas as pd
 import logging
-from typing import Dict, List, Any, Tuple
-from datetime import datetime, date
+from typing import Dict, List, Any, Set, Tuple
+from datetime import datetime
+
+from src.dates import DateService, date_key
+from src.price_index import PriceIndex
+from src.records import DictEncoder, RecordBatch
+
+# Columnas (en orden) y tipos compactos de cada salida del TRANSFORM
+PRODUCT_COLUMNS = ['product_id', 'title', 'category', 'price', 'description',
+                   'image_url', 'rating_rate', 'rating_count']
+PRODUCT_TYPES = {'product_id': 'q', 'price': 'd', 'rating_count': 'q'}
+USER_COLUMNS = ['user_id', 'name_first', 'name_last', 'email', 'username', 'phone', 'created_at']
+USER_TYPES = {'user_id': 'q'}
+GEOGRAPHY_COLUMNS = ['user_id', 'city', 'street', 'zipcode', 'lat', 'lng', 'created_at']
+GEOGRAPHY_TYPES = {'user_id': 'q', 'lat': 'd', 'lng': 'd'}
+SALES_COLUMNS = ['cart_id', 'user_id', 'product_id', 'date', 'date_key',
+                 'quantity', 'unit_price', 'total_amount', 'loaded_at']
+SALES_TYPES = {'cart_id': 'q', 'user_id': 'q', 'product_id': 'q', 'date_key': 'q',
+               'quantity': 'q', 'unit_price': 'd', 'total_amount': 'd'}
+DATE_TYPES = {'date_key': 'q', 'day': 'q', 'month': 'q', 'year': 'q',
+              'quarter': 'q', 'iso_week': 'q', 'day_of_week': 'q'}
+
+
+def normalize_category(value: Any) -> str:
+    # keep title as-is, category lowercased (no capitalizing)
+    return value.lower()
+
+
+def normalize_city(value: Any) -> str:
+    return value.strip().title()
+
+
+def normalize_zipcode(value: Any) -> str:
+    return value.strip()
+
+
+def _has_source(records: List[Dict]) -> bool:
+    """True si los registros raw traen etiqueta de origen (multi-tienda)."""
+    return any('source' in r for r in records)
+
+
+def _with_source(columns: List[str], has_source: bool) -> List[str]:
+    return columns + ['source'] if has_source else columns
+
+
+def create_transformer(config: Dict[str, Any], parallel: bool = True) -> 'DataTransformer':
+    """Instancia el backend configurado en etl.transform_backend (python o pandas).
+
+    Con etl.max_workers > 1 (y `parallel`) lo envuelve en un ShardedTransformer
+    que reparte entradas grandes entre procesos.
+    """
+    etl = config.get('etl') or {}
+    backend = (etl.get('transform_backend') or 'python').lower()
+    if backend == 'pandas':
+        from src.transform_pandas import PandasDataTransformer
+        transformer = PandasDataTransformer(config)
+    elif backend == 'python':
+        transformer = DataTransformer(config)
+    else:
+        raise ValueError(f"Backend de transformación desconocido: {backend}")
+
+    if parallel and int(etl.get('max_workers', 1) or 1) > 1:
+        from src.transform_parallel import ShardedTransformer
+        return ShardedTransformer(transformer, config)
+    return transformer
+
 
 class DataTransformer:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # Parseo memoizado, timestamp único de ejecución y calendario
+        self.dates = DateService()
     
-    def transform_products(self, products):
+    def transform_products(self, products) -> RecordBatch:
         """Normaliza y aplana productos."""
         self.logger.info("[TRANSFORM] products: normalizando categorias y aplanando rating")
-        transformed = []
+        has_source = _has_source(products)
+        # Categorías codificadas por diccionario: se normaliza cada valor distinto una vez
+        categories = DictEncoder(normalize_category)
+        rows = []
         for p in products:
             prod_id = p.get('id') or p.get('product_id')
-            # keep title as-is, category lowercased (no capitalizing)
-            category = p.get('category')
-            if category is not None:
-                category = category.lower()
-            transformed.append({
-                'product_id': prod_id,
-                'title': p.get('title'),
-                'category': category,
-                'price': float(p.get('price')) if p.get('price') is not None else None,
-                'description': p.get('description'),
-                'image_url': p.get('image') or p.get('image_url'),
-                'rating_rate': (p.get('rating') or {}).get('rate') if isinstance(p.get('rating'), dict) else p.get('rating_rate'),
-                'rating_count': (p.get('rating') or {}).get('count') if isinstance(p.get('rating'), dict) else p.get('rating_count')
-            })
+            rating = p.get('rating')
+            row = (
+                prod_id,
+                p.get('title'),
+                categories.encode(p.get('category')),
+                float(p.get('price')) if p.get('price') is not None else None,
+                p.get('description'),
+                p.get('image') or p.get('image_url'),
+                (rating or {}).get('rate') if isinstance(rating, dict) else p.get('rating_rate'),
+                (rating or {}).get('count') if isinstance(rating, dict) else p.get('rating_count'),
+            )
+            rows.append(row + (p.get('source'),) if has_source else row)
+        transformed = RecordBatch.from_rows(
+            _with_source(PRODUCT_COLUMNS, has_source), rows, PRODUCT_TYPES,
+            dictionaries={'category': categories.dictionary},
+        )
         self.logger.info(f"[TRANSFORM] products: {len(transformed)} registros transformados (categorias normalizadas, rating aplanado)")
         return transformed
 
-    def transform_users(self, users_data: List[Dict]) -> Dict[str, List[Dict]]:
+    def transform_users(self, users_data: List[Dict]) -> Dict[str, RecordBatch]:
         """Transforma datos de usuarios separando en users y geography."""
         self.logger.info("[TRANSFORM] users: aplanando address/geolocation y normalizando nombres/emails")
-        users_transformed = []
-        geography_transformed = []
+        has_source = _has_source(users_data)
+        now = self.dates.now
+        cities = DictEncoder(normalize_city)
+        zipcodes = DictEncoder(normalize_zipcode)
+        users_rows = []
+        geography_rows = []
         
         for user in users_data:
             try:
@@ -46,35 +121,39 @@ class DataTransformer:
                 name = user.get('name', {})
                 address = user.get('address', {})
                 geolocation = address.get('geolocation', {})
+                source = (user.get('source'),) if has_source else ()
                 
                 # Transformar usuario
-                user_transformed = {
-                    'user_id': user['id'],
-                    'name_first': name.get('firstname', '').strip().title(),
-                    'name_last': name.get('lastname', '').strip().title(),
-                    'email': user.get('email', '').strip().lower(),
-                    'username': user.get('username', '').strip(),
-                    'phone': user.get('phone', ''),
-                    'created_at': datetime.now()
-                }
-                users_transformed.append(user_transformed)
+                users_rows.append((
+                    user['id'],
+                    name.get('firstname', '').strip().title(),
+                    name.get('lastname', '').strip().title(),
+                    user.get('email', '').strip().lower(),
+                    user.get('username', '').strip(),
+                    user.get('phone', ''),
+                    now,
+                ) + source)
                 
                 # Transformar geografía
-                geo_transformed = {
-                    'user_id': user['id'],
-                    'city': address.get('city', '').strip().title(),
-                    'street': address.get('street', '').strip(),
-                    'zipcode': address.get('zipcode', '').strip(),
-                    'lat': float(geolocation.get('lat', 0)),
-                    'lng': float(geolocation.get('long', 0)),
-                    'created_at': datetime.now()
-                }
-                geography_transformed.append(geo_transformed)
+                geography_rows.append((
+                    user['id'],
+                    cities.encode(address.get('city', '')),
+                    address.get('street', '').strip(),
+                    zipcodes.encode(address.get('zipcode', '')),
+                    float(geolocation.get('lat', 0)),
+                    float(geolocation.get('long', 0)),
+                    now,
+                ) + source)
                 
             except (KeyError, ValueError, TypeError) as e:
                 self.logger.error(f"Error transformando usuario {user.get('id', 'unknown')}: {str(e)}")
                 continue
         
+        users_transformed = RecordBatch.from_rows(_with_source(USER_COLUMNS, has_source), users_rows, USER_TYPES)
+        geography_transformed = RecordBatch.from_rows(
+            _with_source(GEOGRAPHY_COLUMNS, has_source), geography_rows, GEOGRAPHY_TYPES,
+            dictionaries={'city': cities.dictionary, 'zipcode': zipcodes.dictionary},
+        )
         self.logger.info(f"Transformados {len(users_transformed)} usuarios y {len(geography_transformed)} registros geográficos")
         
         return {
@@ -82,19 +161,47 @@ class DataTransformer:
             'geography': geography_transformed
         }
     
-    def transform_carts(self, carts_data: List[Dict], products_data: List[Dict]) -> List[Dict]:
-        """Transforma datos de carritos en hechos de ventas."""
+    def find_missing_product_ids(self, carts_data: List[Dict], products_data: List[Dict]) -> Set[Any]:
+        """Ids de producto referenciados por carritos y ausentes en products_data."""
+        known = {(p.get('source'), p.get('id') or p.get('product_id')) for p in products_data}
+        missing = set()
+        for cart in carts_data:
+            source = cart.get('source')
+            for product_item in cart.get('products', []) or []:
+                product_id = product_item.get('productId')
+                if product_id is not None and (source, product_id) not in known:
+                    missing.add(product_id)
+        return missing
+
+    def price_index(self, products_data: List[Dict]) -> PriceIndex:
+        """Índice de precios por (origen, id) para transform_carts.
+
+        Con varios orígenes los ids solo son únicos dentro de cada tienda.
+        """
+        return PriceIndex.build(products_data)
+
+    def transform_carts(self, carts_data: List[Dict], products_data: List[Dict],
+                        price_index: Any = None) -> RecordBatch:
+        """Transforma datos de carritos en hechos de ventas.
+
+        `price_index` permite reutilizar un price_index(products_data) ya construido.
+        """
         self.logger.info("[TRANSFORM] carts->sales: aplanando items y calculando metricas derivadas (total_amount)")
-        sales_transformed = []
+        has_source = _has_source(carts_data)
+        now = self.dates.now
+        rows = []
         
-        # Crear mapeo de productos para búsqueda rápida
-        products_map = {p['id']: p for p in products_data}
+        # Índice denso de precios: acceso O(1) por (origen, id)
+        index = price_index if price_index is not None else self.price_index(products_data)
+        lookup_price = index.price
         
         for cart in carts_data:
             try:
-                cart_date = self._parse_date(cart.get('date', ''))
+                cart_date = self.dates.parse(cart.get('date', ''))
+                cart_key = date_key(cart_date) if cart_date else None
                 user_id = cart.get('userId')
                 cart_id = cart.get('id')
+                source = cart.get('source')
                 
                 products = cart.get('products', [])
                 
@@ -102,99 +209,52 @@ class DataTransformer:
                     product_id = product_item.get('productId')
                     quantity = product_item.get('quantity', 0)
                     
-                    # Buscar información del producto
-                    product_info = products_map.get(product_id)
-                    if not product_info:
+                    # Buscar precio del producto
+                    unit_price = lookup_price(source, product_id)
+                    if unit_price is None:
                         self.logger.warning(f"Producto {product_id} no encontrado para carrito {cart_id}")
                         continue
                     
-                    unit_price = float(product_info.get('price', 0))
                     total_amount = quantity * unit_price
                     
-                    sale_record = {
-                        'cart_id': cart_id,
-                        'user_id': user_id,
-                        'product_id': product_id,
-                        'date': cart_date,
-                        'date_key': int(cart_date.strftime('%Y%m%d')) if cart_date else None,
-                        'quantity': quantity,
-                        'unit_price': unit_price,
-                        'total_amount': total_amount,
-                        'loaded_at': datetime.now()
-                    }
-                    
                     # Validar datos
                     if quantity <= 0 or unit_price < 0:
                         self.logger.warning(f"Datos inválidos en carrito {cart_id}, producto {product_id}")
                         continue
                     
-                    sales_transformed.append(sale_record)
+                    row = (cart_id, user_id, product_id, cart_date, cart_key,
+                           quantity, unit_price, total_amount, now)
+                    rows.append(row + (source,) if has_source else row)
                     
             except (KeyError, ValueError, TypeError) as e:
                 self.logger.error(f"Error transformando carrito {cart.get('id', 'unknown')}: {str(e)}")
                 continue
         
+        sales_transformed = RecordBatch.from_rows(_with_source(SALES_COLUMNS, has_source), rows, SALES_TYPES)
         self.logger.info(f"[TRANSFORM] sales: {len(sales_transformed)} registros de ventas transformados (incluye total_amount)")
         return sales_transformed
     
     def _parse_date(self, date_string: str) -> datetime:
         """Convierte string de fecha a objeto datetime."""
-        try:
-            # Formato: "2020-02-03T00:00:00.000Z"
-            if 'T' in date_string:
-                return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-            else:
-                return datetime.strptime(date_string, '%Y-%m-%d')
-        except (ValueError, TypeError):
-            self.logger.warning(f"Fecha inválida: {date_string}, usando fecha actual")
-            return datetime.now()
+        return self.dates.parse(date_string)
     
     def generate_date_dimension(self, sales_data):
         """Genera dimensión de tiempo a partir de las ventas.
         Acepta sales_data con 'date' como str ISO (YYYY-MM-DD), date o datetime.
         """
-        dates = []
-        seen = set()
-
-        for sale in sales_data:
-            raw = sale.get('date')
+        days = set()
+        if isinstance(sales_data, RecordBatch):
+            raw_dates = sales_data.column('date') if 'date' in sales_data.names else []
+        else:
+            raw_dates = (sale.get('date') for sale in sales_data)
+        for raw in raw_dates:
             if raw is None:
                 continue
+            # Normalizar a objeto date (memoizado); se ignoran las no parseables
+            day = self.dates.to_date(raw)
+            if day is not None:
+                days.add(day)
 
-            # Normalizar a objeto date
-            dt_obj = None
-            if isinstance(raw, date) and not isinstance(raw, datetime):
-                dt_obj = raw
-            elif isinstance(raw, datetime):
-                dt_obj = raw.date()
-            elif isinstance(raw, str):
-                # intentar parse ISO / YYYY-MM-DD
-                try:
-                    dt_obj = datetime.fromisoformat(raw).date()
-                except Exception:
-                    try:
-                        dt_obj = datetime.strptime(raw, '%Y-%m-%d').date()
-                    except Exception:
-                        # ignorar si no se puede parsear
-                        continue
-            else:
-                continue
-
-            if dt_obj in seen:
-                continue
-            seen.add(dt_obj)
-
-            dates.append({
-                'date_key': int(dt_obj.strftime('%Y%m%d')),
-                'date': dt_obj,
-                'day': dt_obj.day,
-                'month': dt_obj.month,
-                'year': dt_obj.year,
-                'quarter': (dt_obj.month - 1) // 3 + 1,
-                'iso_week': int(dt_obj.strftime('%V')) if hasattr(dt_obj, 'strftime') else None,
-                'day_of_week': dt_obj.weekday(),
-                'day_name': dt_obj.strftime('%A'),
-                'month_name': dt_obj.strftime('%B')
-            })
-
-        return sorted(dates, key=lambda x: x['date_key'])
+        return RecordBatch.from_records(
+            [self.dates.calendar_row(day) for day in sorted(days)], types=DATE_TYPES
+        )
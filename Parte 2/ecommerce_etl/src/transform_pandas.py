@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+# transform_pandas.py - backend vectorizado (pandas) de DataTransformer
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.dates import date_key
+from src.records import CODE_TYPE, DictColumn, DictEncoder, RecordBatch
+from src.transform import (
+    GEOGRAPHY_COLUMNS, GEOGRAPHY_TYPES, PRODUCT_COLUMNS, PRODUCT_TYPES,
+    SALES_COLUMNS, SALES_TYPES, USER_COLUMNS, USER_TYPES, DataTransformer,
+    normalize_category, normalize_city, normalize_zipcode,
+)
+
+# dtype numpy equivalente a cada typecode de array
+_NUMPY_TYPES = {'q': np.int64, 'd': np.float64}
+# Tipos de origen que se convierten sin pérdida (p. ej. float -> 'q' no)
+_NUMPY_KINDS = {'q': 'iu', 'd': 'iuf'}
+
+
+def _col(df: pd.DataFrame, name: str, default: Any = np.nan) -> pd.Series:
+    """Columna de `df` o una serie constante si el campo no vino en el JSON."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def _first(df: pd.DataFrame, *names: str) -> pd.Series:
+    """Primer valor no vacío entre varias columnas (equivalente a `a or b`)."""
+    result = _col(df, names[0]).astype(object)
+    for name in names[1:]:
+        result = result.where(result.notna() & (result != '') & (result != 0), _col(df, name))
+    return result
+
+
+def _text(series: pd.Series) -> pd.Series:
+    """Serie de texto con '' para valores ausentes (como dict.get(k, ''))."""
+    return series.astype(object).where(series.notna(), '').astype(str)
+
+
+def _nullable_int(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, errors='coerce').astype('Int64')
+
+
+def _encode(series: pd.Series, normalize: Callable[[Any], Any]) -> DictColumn:
+    """DictColumn de una serie raw: factorize y `normalize` solo sobre los valores distintos."""
+    codes, uniques = pd.factorize(series)
+    encoder = DictEncoder(normalize)
+    remap = [encoder.encode(value) for value in uniques.tolist()]
+    if (codes < 0).any():
+        # El código -1 de factorize (nulo) toma el último lugar del mapeo
+        remap.append(encoder.encode(None))
+    remap = np.array(remap, dtype=np.int32)
+    column = array(CODE_TYPE)
+    column.frombytes(remap[codes].astype(np.dtype(CODE_TYPE)).tobytes())
+    return DictColumn(column, encoder.dictionary)
+
+
+def _to_batch(df: pd.DataFrame, columns: Iterable[str], types: Dict[str, str],
+              optional: Iterable[str] = ('source',),
+              encode: Optional[Dict[str, Callable[[Any], Any]]] = None) -> RecordBatch:
+    """Convierte a RecordBatch con tipos nativos de Python y None para nulos.
+
+    Las columnas tipadas sin nulos pasan de numpy a array sin recorrer filas;
+    las de `encode` (valores raw) se codifican por diccionario con su normalizador.
+    Las columnas de `optional` solo se incluyen si el DataFrame las trae.
+    """
+    encode = encode or {}
+    names = list(columns) + [c for c in optional if c in df.columns]
+    data: Dict[str, Any] = {}
+    for name in names:
+        series = df[name]
+        if name in encode:
+            data[name] = _encode(series, encode[name])
+            continue
+        typecode = types.get(name)
+        if typecode and series.dtype.kind in _NUMPY_KINDS[typecode] and not series.isna().any():
+            try:
+                values = series.to_numpy(dtype=_NUMPY_TYPES[typecode])
+            except (TypeError, ValueError):
+                pass
+            else:
+                column = array(typecode)
+                column.frombytes(values.tobytes())
+                data[name] = column
+                continue
+        if series.isna().any():
+            series = series.astype(object).where(series.notna(), None)
+        data[name] = series.tolist()
+    return RecordBatch(data, types)
+
+
+class PandasDataTransformer(DataTransformer):
+    """DataTransformer con transformaciones vectorizadas sobre DataFrames.
+
+    Produce las mismas columnas y tipos que el backend por registro;
+    se selecciona con etl.transform_backend: pandas.
+    """
+
+    def transform_products(self, products):
+        """Normaliza y aplana productos (json_normalize)."""
+        self.logger.info("[TRANSFORM] products (pandas): normalizando categorias y aplanando rating")
+        if not products:
+            return RecordBatch.from_rows(PRODUCT_COLUMNS, [], PRODUCT_TYPES)
+        df = pd.json_normalize(products, max_level=1)
+        out = pd.DataFrame({
+            'product_id': _nullable_int(_first(df, 'id', 'product_id')),
+            'title': _col(df, 'title'),
+            'category': _col(df, 'category'),
+            'price': pd.to_numeric(_col(df, 'price'), errors='coerce').astype(float),
+            'description': _col(df, 'description'),
+            'image_url': _first(df, 'image', 'image_url'),
+            'rating_rate': pd.to_numeric(
+                _col(df, 'rating.rate').where(_col(df, 'rating.rate').notna(), _col(df, 'rating_rate')),
+                errors='coerce'
+            ),
+            'rating_count': _nullable_int(
+                _col(df, 'rating.count').where(_col(df, 'rating.count').notna(), _col(df, 'rating_count'))
+            ),
+        })
+        if 'source' in df.columns:
+            out['source'] = df['source']
+        transformed = _to_batch(out, PRODUCT_COLUMNS, PRODUCT_TYPES,
+                                encode={'category': normalize_category})
+        self.logger.info(f"[TRANSFORM] products: {len(transformed)} registros transformados (categorias normalizadas, rating aplanado)")
+        return transformed
+
+    def transform_users(self, users_data: List[Dict]) -> Dict[str, RecordBatch]:
+        """Separa users y geography con operaciones de texto vectorizadas."""
+        self.logger.info("[TRANSFORM] users (pandas): aplanando address/geolocation y normalizando nombres/emails")
+        if not users_data:
+            return {'users': RecordBatch.from_rows(USER_COLUMNS, [], USER_TYPES),
+                    'geography': RecordBatch.from_rows(GEOGRAPHY_COLUMNS, [], GEOGRAPHY_TYPES)}
+        df = pd.json_normalize(users_data)
+        if 'id' not in df.columns:
+            df['id'] = np.nan
+        missing_id = df['id'].isna()
+        if missing_id.any():
+            self.logger.error(f"Usuarios sin id omitidos: {int(missing_id.sum())}")
+            df = df[~missing_id]
+        now = self.dates.now
+
+        users = pd.DataFrame({
+            'user_id': _nullable_int(df['id']),
+            'name_first': _text(_col(df, 'name.firstname')).str.strip().str.title(),
+            'name_last': _text(_col(df, 'name.lastname')).str.strip().str.title(),
+            'email': _text(_col(df, 'email')).str.strip().str.lower(),
+            'username': _text(_col(df, 'username')).str.strip(),
+            'phone': _col(df, 'phone', '').astype(object).where(_col(df, 'phone', '').notna(), ''),
+            'created_at': pd.Series([now] * len(df), index=df.index, dtype=object),
+        })
+
+        lat = pd.to_numeric(_col(df, 'address.geolocation.lat', 0).fillna(0), errors='coerce')
+        lng = pd.to_numeric(_col(df, 'address.geolocation.long', 0).fillna(0), errors='coerce')
+        geography = pd.DataFrame({
+            'user_id': users['user_id'],
+            'city': _text(_col(df, 'address.city')),
+            'street': _text(_col(df, 'address.street')).str.strip(),
+            'zipcode': _text(_col(df, 'address.zipcode')),
+            'lat': lat.astype(float),
+            'lng': lng.astype(float),
+            'created_at': users['created_at'],
+        })
+        if 'source' in df.columns:
+            users['source'] = df['source']
+            geography['source'] = df['source']
+        invalid_geo = lat.isna() | lng.isna()
+        if invalid_geo.any():
+            self.logger.error(f"Geolocalización inválida, registros geográficos omitidos: {int(invalid_geo.sum())}")
+            geography = geography[~invalid_geo]
+
+        users_transformed = _to_batch(users, USER_COLUMNS, USER_TYPES)
+        geography_transformed = _to_batch(geography, GEOGRAPHY_COLUMNS, GEOGRAPHY_TYPES,
+                                          encode={'city': normalize_city, 'zipcode': normalize_zipcode})
+        self.logger.info(f"Transformados {len(users_transformed)} usuarios y {len(geography_transformed)} registros geográficos")
+        return {'users': users_transformed, 'geography': geography_transformed}
+
+    def _parse_dates(self, raw: pd.Series):
+        """Fechas de carritos con DateService.parse sobre cada valor distinto.
+
+        Mismo resultado que el backend por registro (offsets sin convertir a
+        UTC, inválidas -> `now`). Retorna (fechas como datetime, date_key YYYYMMDD).
+        """
+        codes, uniques = pd.factorize(raw.astype(object))
+        values = [self.dates.parse(value) for value in uniques.tolist()]
+        if (codes < 0).any():
+            # El código -1 de factorize (nulo) toma el último lugar
+            values.append(self.dates.parse(None))
+        parsed = np.empty(len(values), dtype=object)
+        parsed[:] = values
+        keys = np.array([date_key(value) for value in values], dtype=np.int64)
+        # Asignación por posición: sin realinear índices
+        return (pd.Series(parsed[codes], index=raw.index, dtype=object),
+                pd.Series(keys[codes], index=raw.index))
+
+    def price_index(self, products_data: List[Dict]) -> pd.DataFrame:
+        """Precios por (origen, id); ante ids repetidos gana el último, como el dict del backend Python."""
+        prices = pd.DataFrame({
+            'source': [p.get('source') for p in products_data],
+            'product_id': [p.get('id') or p.get('product_id') for p in products_data],
+            'unit_price': [p.get('price', 0) for p in products_data],
+        }).drop_duplicates(['source', 'product_id'], keep='last')
+        prices['_source_key'] = prices['source'].astype(object).where(prices['source'].notna(), '')
+        return prices.drop(columns='source')
+
+    def transform_carts(self, carts_data: List[Dict], products_data: List[Dict],
+                        price_index: Any = None) -> RecordBatch:
+        """Explota los items de cada carrito y cruza precios con un merge."""
+        self.logger.info("[TRANSFORM] carts->sales (pandas): aplanando items y calculando metricas derivadas (total_amount)")
+        if not carts_data:
+            return RecordBatch.from_rows(SALES_COLUMNS, [], SALES_TYPES)
+        carts = pd.DataFrame.from_records(carts_data)
+        has_source = 'source' in carts.columns
+        carts = pd.DataFrame({
+            'cart_id': _col(carts, 'id'),
+            'user_id': _col(carts, 'userId'),
+            'source': _col(carts, 'source', None),
+            'products': _col(carts, 'products'),
+        }).join(pd.DataFrame(dict(zip(('date', 'date_key'), self._parse_dates(_col(carts, 'date'))))))
+
+        items = carts.explode('products', ignore_index=True)
+        items = items[items['products'].notna()].reset_index(drop=True)
+        if items.empty:
+            return RecordBatch.from_rows(SALES_COLUMNS, [], SALES_TYPES)
+        # Los items son planos: from_records es bastante más rápido que json_normalize
+        item_fields = pd.DataFrame.from_records(items.pop('products').tolist())
+        items['product_id'] = _col(item_fields, 'productId')
+        quantity = pd.to_numeric(_col(item_fields, 'quantity', 0), errors='coerce').fillna(0)
+        items['quantity'] = quantity.astype('int64') if (quantity % 1 == 0).all() else quantity
+
+        prices = price_index if price_index is not None else self.price_index(products_data)
+        items['_source_key'] = items['source'].astype(object).where(items['source'].notna(), '')
+        merged = items.merge(prices, on=['_source_key', 'product_id'], how='left', sort=False)
+
+        not_found = merged['unit_price'].isna()
+        if not_found.any():
+            self.logger.warning(
+                f"Productos no encontrados para {int(not_found.sum())} items de carrito: "
+                f"{sorted(merged.loc[not_found, 'product_id'].dropna().unique().tolist())[:20]}"
+            )
+            merged = merged[~not_found]
+
+        merged['unit_price'] = merged['unit_price'].astype(float)
+        merged['total_amount'] = merged['quantity'] * merged['unit_price']
+        invalid = (merged['quantity'] <= 0) | (merged['unit_price'] < 0)
+        if invalid.any():
+            self.logger.warning(f"Items inválidos omitidos (cantidad <= 0 o precio negativo): {int(invalid.sum())}")
+            merged = merged[~invalid]
+
+        merged['loaded_at'] = pd.Series([self.dates.now] * len(merged), index=merged.index, dtype=object)
+        for name in ('cart_id', 'user_id', 'product_id'):
+            merged[name] = _nullable_int(merged[name])
+        if not has_source:
+            merged = merged.drop(columns='source')
+
+        sales_transformed = _to_batch(merged, SALES_COLUMNS, SALES_TYPES)
+        self.logger.info(f"[TRANSFORM] sales: {len(sales_transformed)} registros de ventas transformados (incluye total_amount)")
+        return sales_transformed
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# transform_parallel.py - transformación por chunks en un pool de procesos
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional
+
+from src.price_index import PriceIndex
+from src.records import concat
+from src.utils import batched
+
+# Estado de cada proceso worker, inicializado una única vez por proceso
+_WORKER: Dict[str, Any] = {}
+
+
+def _mp_context():
+    """forkserver (spawn si no existe): el pool se crea desde hilos del DAG y
+    fork copiaría locks tomados por otros hilos."""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _init_worker(config: Dict[str, Any], products_data: Optional[List[Dict]], run_timestamp,
+                 shared_index: Optional[Dict[str, Any]] = None) -> None:
+    """Crea el transformer del worker y, para carritos, su índice de precios.
+
+    Con `shared_index` el índice se abre desde memoria compartida (sin copia).
+    """
+    from src.transform import create_transformer
+
+    transformer = create_transformer(config, parallel=False)
+    # Mismo created_at/loaded_at que el proceso principal
+    transformer.dates.start_run(run_timestamp)
+    _WORKER['transformer'] = transformer
+    _WORKER['products'] = products_data
+    if shared_index is not None:
+        _WORKER['price_index'] = PriceIndex.attach(shared_index)
+    else:
+        _WORKER['price_index'] = transformer.price_index(products_data) if products_data is not None else None
+
+
+def _transform_chunk(kind: str, chunk: List[Dict]) -> Any:
+    transformer = _WORKER['transformer']
+    if kind == 'products':
+        return transformer.transform_products(chunk)
+    if kind == 'users':
+        return transformer.transform_users(chunk)
+    return transformer.transform_carts(chunk, _WORKER['products'], _WORKER['price_index'])
+
+
+class ShardedTransformer:
+    """Reparte las transformaciones grandes en chunks de etl.chunk_size entre
+    etl.max_workers procesos y une los resultados en el orden de entrada.
+
+    Las entradas de solo lectura (productos e índice de precios) se envían a
+    cada worker una vez, en su inicializador, y no con cada chunk; el
+    PriceIndex se comparte por memoria compartida en lugar de copiarse. Las
+    entradas con menos de etl.parallel_min_records registros se transforman
+    en el proceso actual.
+    """
+
+    def __init__(self, transformer, config: Dict[str, Any]):
+        etl = config.get('etl') or {}
+        self.transformer = transformer
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.chunk_size = max(1, int(etl.get('chunk_size', 500) or 500))
+        self.max_workers = int(etl.get('max_workers', 1) or 1)
+        self.min_records = int(etl.get('parallel_min_records', 10000))
+
+    def __getattr__(self, name: str) -> Any:
+        # generate_date_dimension, find_missing_product_ids, etc.
+        return getattr(self.transformer, name)
+
+    def _should_shard(self, records: List[Dict]) -> bool:
+        return self.max_workers > 1 and len(records) >= max(self.min_records, self.chunk_size + 1)
+
+    def _map(self, kind: str, records: List[Dict], products_data: Optional[List[Dict]] = None,
+             shared_index: Optional[Dict[str, Any]] = None) -> List[Any]:
+        chunks = list(batched(records, self.chunk_size))
+        workers = min(self.max_workers, len(chunks))
+        self.logger.info(
+            f"[TRANSFORM] {kind}: {len(records)} registros en {len(chunks)} chunks sobre {workers} procesos"
+        )
+        initargs = (self.config, products_data, self.transformer.dates.now, shared_index)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                                 initializer=_init_worker, initargs=initargs) as pool:
+            # map conserva el orden de los chunks: resultado determinista
+            return list(pool.map(_transform_chunk, repeat(kind), chunks))
+
+    def transform_products(self, products):
+        if not self._should_shard(products):
+            return self.transformer.transform_products(products)
+        return concat(self._map('products', products))
+
+    def transform_users(self, users_data: List[Dict]) -> Dict[str, Any]:
+        if not self._should_shard(users_data):
+            return self.transformer.transform_users(users_data)
+        chunks = self._map('users', users_data)
+        return {key: concat(chunk[key] for chunk in chunks) for key in ('users', 'geography')}
+
+    def transform_carts(self, carts_data: List[Dict], products_data: List[Dict],
+                        price_index: Any = None) -> Any:
+        if not self._should_shard(carts_data):
+            return self.transformer.transform_carts(carts_data, products_data, price_index)
+        index = price_index if price_index is not None else self.transformer.price_index(products_data)
+        if not isinstance(index, PriceIndex):
+            # Backend pandas: cada worker arma su índice (DataFrame) desde los productos
+            return concat(self._map('carts', carts_data, products_data))
+        # El índice se construye una vez y los workers lo leen desde memoria compartida
+        try:
+            return concat(self._map('carts', carts_data, shared_index=index.share()))
+        finally:
+            # Libera solo el bloque compartido; el índice local sigue siendo usable
+            index.close(unlink=True)
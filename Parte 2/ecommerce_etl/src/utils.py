@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 
 # utils.py - módulo generado automáticamente
+import hashlib
+import json
 import logging
 import yaml
 import os
-from typing import Dict, Any
+from collections.abc import Sequence
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List
 from datetime import datetime, timedelta
 
 def setup_logging():
@@ -97,6 +101,35 @@ def is_cache_valid(cache_path, max_age_hours=24):
     
     return age < timedelta(hours=max_age_hours)
 
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Agrupa un iterable en listas de a lo sumo `size` elementos."""
+    if size <= 0:
+        raise ValueError("size debe ser mayor que 0")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def content_hash(data: Any) -> str:
+    """SHA-256 del contenido JSON canónico (claves ordenadas) de `data`."""
+    digest = hashlib.sha256()
+    encoder = json.JSONEncoder(sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    if isinstance(data, Sequence) and not isinstance(data, (list, tuple, str, bytes)):
+        # Secuencias perezosas (p. ej. ChunkedRecords): mismo hash que la lista, sin materializarla
+        digest.update(b'[')
+        for i, item in enumerate(data):
+            if i:
+                digest.update(b',')
+            for chunk in encoder.iterencode(item):
+                digest.update(chunk.encode('utf-8'))
+        digest.update(b']')
+        return digest.hexdigest()
+    for chunk in encoder.iterencode(data):
+        digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()
+
 # Configurar manejador global de excepciones
 import sys
 sys.excepthook = handle_exception
\ No newline at end of file
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# writer.py - escrituras a disco en segundo plano (fuera del camino crítico)
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BackgroundWriter:
+    """Ejecuta escrituras en un thread aparte, en orden FIFO, con cola acotada.
+
+    `submit` retorna de inmediato salvo que haya `max_pending` escrituras en
+    espera (backpressure). Los errores se acumulan y se retornan en `flush`.
+    Con enabled=False las escrituras se ejecutan en el thread que llama.
+    """
+
+    def __init__(self, max_pending: int = 8, enabled: bool = True):
+        self.enabled = enabled
+        self.logger = logging.getLogger(__name__)
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._errors: List[str] = []
+        self.stats = {
+            'submitted': 0,
+            'written': 0,
+            'failed': 0,
+            'write_seconds': 0.0,
+            'blocked_seconds': 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker, name='background-writer', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, label: str, fn: Callable[..., Any], *args, **kwargs) -> None:
+        """Encola `fn(*args, **kwargs)`; `label` identifica la escritura en errores."""
+        self._count('submitted')
+        if not self.enabled:
+            self._run(label, fn, args, kwargs)
+            return
+        self._ensure_started()
+        start = time.perf_counter()
+        self._queue.put((label, fn, args, kwargs))
+        self._count('blocked_seconds', time.perf_counter() - start)
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, label: str, fn: Callable[..., Any], args: tuple, kwargs: Dict) -> None:
+        start = time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+            self._count('written')
+        except Exception as e:
+            self.logger.warning(f"Escritura en segundo plano fallida ({label}): {e}")
+            self._count('failed')
+            with self._lock:
+                self._errors.append(f"No se pudo guardar {label}: {e}")
+        finally:
+            self._count('write_seconds', time.perf_counter() - start)
+
+    def flush(self) -> List[str]:
+        """Espera las escrituras pendientes y retorna (y limpia) los errores."""
+        if self.enabled:
+            self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def close(self) -> List[str]:
+        """Vacía la cola y detiene el thread."""
+        errors = self.flush()
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            self._thread = None
+        return errors
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.cache import ExtractCache
+
+
+def make_cache(tmp_path, **cache_cfg):
+    cfg = {'max_age_hours': 24, 'compression': 'gzip'}
+    cfg.update(cache_cfg)
+    return ExtractCache(str(tmp_path), {'cache': cfg})
+
+
+def test_put_get_roundtrip_compressed(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('products', [{'id': 1, 'title': 'ñandú'}])
+
+    assert cache.find_path('products').endswith('.json.gz')
+    assert cache.get('products') == [{'id': 1, 'title': 'ñandú'}]
+    assert list(cache.iter_records('products', batch_size=10)) == [[{'id': 1, 'title': 'ñandú'}]]
+    assert cache.stats['hits'] == 2
+    assert not [n for n in os.listdir(tmp_path) if '.tmp.' in n]
+
+
+def test_ttl_per_entry(tmp_path):
+    cache = make_cache(tmp_path, ttl_hours={'carts': 1})
+    cache.put('carts', [{'id': 1}])
+    cache.put('products', [{'id': 2}])
+    two_hours_ago = time.time() - 2 * 3600
+    for key in ('carts', 'products'):
+        os.utime(cache.find_path(key), (two_hours_ago, two_hours_ago))
+
+    assert cache.get('carts') is None
+    assert cache.get('carts', allow_stale=True) == [{'id': 1}]
+    assert cache.get('products') == [{'id': 2}]
+    assert cache.stats['stale'] == 1
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = make_cache(tmp_path, compression='none', max_size_mb=0.001)
+    cache.put('old', ['x' * 400])
+    old_path = cache.find_path('old')
+    os.utime(old_path, (time.time() - 100, os.stat(old_path).st_mtime))
+    cache.put('new', ['y' * 400])
+    cache.put('newer', ['z' * 400])
+
+    assert cache.find_path('old') is None
+    assert cache.get('newer') == ['z' * 400]
+    assert cache.stats['evictions'] >= 1
+
+
+def test_get_or_fill_single_fill_under_contention(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    def fill():
+        calls.append(1)
+        time.sleep(0.1)
+        data = [{'id': 1}]
+        cache.put('users', data)
+        return data
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fill('users', fill)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [[{'id': 1}]] * 4
+    assert cache.stats['shared_fills'] == 3
+
+
+def test_unknown_compression_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make_cache(tmp_path, compression='lz4')
@@ -0,0 +1,31 @@
+import os
+import time
+
+from src.checkpoint import RunCheckpoint
+from src.writer import BackgroundWriter
+
+
+def test_phase_is_marked_only_after_background_write(tmp_path):
+    writer = BackgroundWriter()
+    checkpoint = RunCheckpoint(str(tmp_path), 'run-1', writer=writer)
+    data = {'products': [{'id': 1}]}
+
+    checkpoint.complete('extract', data, fmt='json')
+    # El llamador puede reemplazar el dataset: se persiste el que se entregó
+    data['products'] = []
+    assert writer.flush() == []
+
+    assert checkpoint.done('extract')
+    assert checkpoint.outputs('extract') == {'products': [{'id': 1}]}
+    writer.close()
+
+
+def test_retention_removes_stale_unresumed_checkpoints(tmp_path):
+    for run_id in ('old', 'recent', 'current'):
+        RunCheckpoint(str(tmp_path), run_id).complete('extract')
+    stale = time.time() - 10 * 86400
+    os.utime(tmp_path / 'old', (stale, stale))
+    os.utime(tmp_path / 'current', (stale, stale))
+
+    assert RunCheckpoint.apply_retention(str(tmp_path), 7, keep='current') == 1
+    assert sorted(os.listdir(tmp_path)) == ['current', 'recent']
@@ -80,3 +80,13 @@ def test_validate_empty_data(test_config):
     validation = checker.validate_data('products', [])
     assert validation['is_valid'] is False
     assert 'No data to validate' in validation['errors'][0]
+
+def test_validate_full_dataset_with_reference_dimensions(test_config):
+    checker = DataQualityChecker(test_config)
+    sales = [{'cart_id': 10, 'product_id': 999, 'user_id': 1, 'quantity': 1, 'unit_price': 3}]
+    reference = {'products': [{'product_id': 1}], 'users': [{'user_id': 1}]}
+
+    res = checker.validate_full_dataset({'sales': sales}, reference)
+    assert any('no existe' in e for e in res['errors'])
+    # Las dimensiones de referencia no se revalidan ni se cuentan
+    assert res['records_checked'] == 1
@@ -0,0 +1,32 @@
+from datetime import date, datetime, timezone
+
+from src.dates import DateService, date_key
+
+
+def test_parse_is_memoized_and_invalid_uses_run_timestamp():
+    run_ts = datetime(2024, 1, 2, 3, 4, 5)
+    service = DateService(now=run_ts)
+
+    parsed = service.parse('2020-03-02T10:00:00.000Z')
+    assert parsed == datetime(2020, 3, 2, 10, tzinfo=timezone.utc)
+    assert service.parse('2020-03-02T10:00:00.000Z') is parsed
+    assert service.parse('2020-03-02') == datetime(2020, 3, 2)
+    assert service.parse('garbage') == run_ts
+    assert date_key(parsed) == 20200302
+
+
+def test_calendar_row_matches_strftime():
+    service = DateService()
+    day = date(2021, 1, 3)
+    row = service.calendar_row(day)
+
+    assert row == {
+        'date_key': int(day.strftime('%Y%m%d')), 'date': day, 'day': 3, 'month': 1, 'year': 2021,
+        'quarter': 1, 'iso_week': int(day.strftime('%V')), 'day_of_week': day.weekday(),
+        'day_name': day.strftime('%A'), 'month_name': day.strftime('%B'),
+    }
+    # Se retorna una copia: modificarla no altera la tabla
+    row['day'] = 99
+    assert service.calendar_row(day)['day'] == 3
+    assert service.to_date('2021-01-03T10:00:00') == day
+    assert service.to_date('nope') is None
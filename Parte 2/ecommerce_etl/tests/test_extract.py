@@ -1,7 +1,11 @@
+import json
+import time
 import pytest
 import requests
 import responses
-from src.extract import APIDataExtractor
+from unittest.mock import Mock
+from src.extract import APIDataExtractor, iter_json_array, iter_json_file
+from src.hedging import LatencyHistogram
 
 @pytest.fixture
 def mock_config():
@@ -85,4 +89,170 @@ def test_fetch_endpoint_error(mock_config):
     
     extractor = APIDataExtractor(mock_config)
     with pytest.raises(requests.exceptions.RequestException):
-        extractor.fetch_endpoint('products', '/products')
\ No newline at end of file
+        extractor.fetch_endpoint('products', '/products')
+
+def test_iter_json_array_small_chunks():
+    text = '[{"id": 1, "title": "a,]b"}, {"id": 22}, 333, "x"]'
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    assert list(iter_json_array(chunks)) == [{'id': 1, 'title': 'a,]b'}, {'id': 22}, 333, 'x']
+
+
+def test_iter_json_array_scalars_split_across_chunks():
+    assert list(iter_json_array(['[1.5e', '3, 2]'])) == [1500.0, 2]
+    assert list(iter_json_array(['[1.', '5]'])) == [1.5]
+    assert list(iter_json_array(['[tr', 'ue, nul', 'l]'])) == [True, None]
+
+
+@pytest.mark.parametrize('text', ['[1,,2]', '[,1]', '[1,]', '[1 2]'])
+def test_iter_json_array_rejects_empty_or_missing_elements(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text]))
+
+
+def test_iter_json_file_batches(tmp_path):
+    path = tmp_path / 'carts.json'
+    path.write_text(json.dumps([{'id': i} for i in range(5)]), encoding='utf-8')
+
+    batches = list(iter_json_file(str(path), batch_size=2, chunk_size=4))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[-1][0]['id'] == 4
+
+
+@responses.activate
+def test_stream_endpoint_paginated(mock_config):
+    mock_config['api']['pagination'] = {'enabled': True, 'page_size': 2}
+    pages = {0: [{'id': 1}, {'id': 2}], 2: [{'id': 3}, {'id': 4}], 4: [{'id': 5}]}
+
+    def callback(request):
+        offset = int(request.params['offset'])
+        return 200, {}, json.dumps(pages[offset])
+
+    responses.add_callback(responses.GET, 'https://fakestoreapi.com/carts', callback=callback)
+
+    extractor = APIDataExtractor(mock_config)
+    batches = list(extractor.stream_endpoint('carts', '/carts', batch_size=2))
+
+    assert [[r['id'] for r in b] for b in batches] == [[1, 2], [3, 4], [5]]
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_paginated_falls_back_when_offset_is_ignored(mock_config):
+    mock_config['api']['pagination'] = {'enabled': True, 'page_size': 2}
+    records = [{'id': i} for i in range(1, 6)]
+
+    def callback(request):
+        # Respeta limit pero ignora offset
+        limit = request.params.get('limit')
+        return 200, {}, json.dumps(records[:int(limit)] if limit else records)
+
+    responses.add_callback(responses.GET, 'https://fakestoreapi.com/carts', callback=callback)
+
+    extracted = list(APIDataExtractor(mock_config).stream_endpoint('carts', '/carts'))
+
+    assert extracted == records
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_paginated_fallback_aborts_on_mismatch(mock_config):
+    mock_config['api']['pagination'] = {'enabled': True, 'page_size': 2}
+
+    def callback(request):
+        first = [{'id': 1}, {'id': 2}] if request.params.get('limit') else [{'id': 9}]
+        return 200, {}, json.dumps(first)
+
+    responses.add_callback(responses.GET, 'https://fakestoreapi.com/carts', callback=callback)
+
+    with pytest.raises(RuntimeError, match='ignora el offset'):
+        list(APIDataExtractor(mock_config).stream_endpoint('carts', '/carts'))
+
+
+@responses.activate
+def test_fetch_endpoint_conditional_not_modified(mock_config, tmp_path):
+    responses.add(responses.GET, 'https://fakestoreapi.com/products', status=304)
+
+    extractor = APIDataExtractor(mock_config, cache_dir=str(tmp_path))
+    extractor.save_validators('products', {'etag': '"abc"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    data, validators = extractor.fetch_endpoint_conditional(
+        'products', '/products', extractor.load_validators('products')
+    )
+
+    assert data is None
+    assert validators['etag'] == '"abc"'
+    sent = responses.calls[0].request.headers
+    assert sent['If-None-Match'] == '"abc"'
+    assert sent['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+def test_latency_histogram_percentile():
+    hist = LatencyHistogram(window=100)
+    for ms in range(1, 101):
+        hist.record(ms / 1000.0)
+    assert hist.percentile(95) == pytest.approx(0.095)
+    assert hist.percentile(50) == pytest.approx(0.05)
+
+
+@responses.activate
+def test_hedged_get_returns_fastest(mock_config):
+    mock_config['api']['hedging'] = {'enabled': True, 'min_samples': 1, 'min_delay_ms': 10}
+    calls = []
+
+    def callback(request):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return 200, {}, json.dumps([{'id': 'slow'}])
+        return 200, {}, json.dumps([{'id': 'fast'}])
+
+    responses.add_callback(responses.GET, 'https://fakestoreapi.com/products', callback=callback)
+
+    extractor = APIDataExtractor(mock_config)
+    extractor.hedging.record('products', 0.01)
+    data = extractor.fetch_endpoint('products', '/products')
+    extractor.close()
+
+    assert data == [{'id': 'fast'}]
+    assert extractor.hedging.stats['hedges'] == 1
+    assert extractor.hedging.stats['hedge_wins'] == 1
+
+
+def test_hedged_get_closes_unused_responses_and_takes_a_token(mock_config):
+    mock_config['api']['hedging'] = {'enabled': True, 'min_samples': 1, 'min_delay_ms': 10}
+    mock_config['api']['rate_limit'] = {'enabled': True, 'rate_per_second': 100}
+    extractor = APIDataExtractor(mock_config)
+    extractor.hedging.record('products', 0.01)
+    sent = []
+
+    def timed_get(endpoint_name, url, **kwargs):
+        response = Mock()
+        sent.append(response)
+        if len(sent) == 1:
+            time.sleep(0.3)
+        return response
+
+    extractor._timed_get = timed_get
+    winner = extractor._get('products', 'https://fakestoreapi.com/products')
+    extractor.close()
+
+    # El hedge gana; la respuesta lenta se cierra al llegar y el hedge pasó por el rate limit
+    assert winner is sent[1] and not winner.close.called
+    assert sent[0].close.called
+    assert extractor.throttle.stats['requests'] == 2
+
+
+@responses.activate
+def test_rate_limited_get_honors_retry_after(mock_config):
+    mock_config['api']['rate_limit'] = {'enabled': True, 'rate_per_second': 100, 'initial_concurrency': 4}
+    responses.add(responses.GET, 'https://fakestoreapi.com/users', status=429, headers={'Retry-After': '0'})
+    responses.add(responses.GET, 'https://fakestoreapi.com/users', json=[{'id': 1}], status=200)
+
+    extractor = APIDataExtractor(mock_config)
+    data = extractor.fetch_endpoint('users', '/users')
+
+    assert data == [{'id': 1}]
+    stats = extractor.throttle.snapshot()
+    assert stats['throttled'] == 1
+    assert stats['retries'] == 1
+    assert stats['concurrency_limit'] == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from scripts.fake_store_server import FakeStoreData, FakeStoreServer, FaultInjector
+from src.extract import APIDataExtractor
+
+
+@pytest.fixture
+def server_config(sample_config):
+    def _build(server):
+        sample_config['api']['base_url'] = server.base_url
+        sample_config['api']['retry']['backoff_factor'] = 0
+        return sample_config
+    return _build
+
+
+def test_serves_fakestore_shaped_records(server_config):
+    with FakeStoreServer(data=FakeStoreData(products=5, users=3, carts=4)) as server:
+        extractor = APIDataExtractor(server_config(server))
+        products = extractor.fetch_endpoint('products', '/products')
+        carts = extractor.fetch_endpoint('carts', '/carts')
+        missing = extractor.fetch_product(99)
+
+    assert [p['id'] for p in products] == [1, 2, 3, 4, 5]
+    assert {'rate', 'count'} <= set(products[0]['rating'])
+    assert all(1 <= item['productId'] <= 5 for c in carts for item in c['products'])
+    assert missing is None
+
+
+def test_pagination_and_date_filters(server_config):
+    data = FakeStoreData(carts=50, cart_step_minutes=24 * 60)
+    with FakeStoreServer(data=data) as server:
+        config = server_config(server)
+        config['api']['pagination'] = {'enabled': True, 'page_size': 20}
+        extractor = APIDataExtractor(config)
+        batches = list(extractor.stream_endpoint('carts', '/carts', batch_size=20))
+        delta = extractor.fetch_endpoint('carts', '/carts', params={'startdate': '2020-02-15', 'enddate': '2020-02-16'})
+
+    assert [len(b) for b in batches] == [20, 20, 10]
+    assert [c['date'][:10] for c in delta] == ['2020-02-15', '2020-02-16']
+
+
+def test_injected_429_is_absorbed_by_throttle(server_config):
+    faults = FaultInjector(rate_limit_rps=2, retry_after=0)
+    with FakeStoreServer(faults=faults) as server:
+        config = server_config(server)
+        config['api']['rate_limit'] = {'enabled': True, 'rate_per_second': 50, 'default_backoff_seconds': 0.2}
+        extractor = APIDataExtractor(config)
+        results = [extractor.fetch_endpoint('users', '/users') for _ in range(4)]
+
+    assert all(len(r) == 10 for r in results)
+    assert server.stats.get('429', 0) >= 1
+    assert extractor.throttle.snapshot()['throttled'] >= 1
+
+
+def test_etag_not_modified(server_config, tmp_path):
+    with FakeStoreServer() as server:
+        extractor = APIDataExtractor(server_config(server), cache_dir=str(tmp_path))
+        data, validators = extractor.fetch_endpoint_conditional('products', '/products')
+        again, _ = extractor.fetch_endpoint_conditional('products', '/products', validators)
+
+    assert len(data) == 20
+    assert again is None
@@ -0,0 +1,26 @@
+from src.incremental import compute_watermark, date_filter_params, filter_new_carts
+
+
+CARTS = [
+    {'id': 1, 'date': '2020-03-02T00:00:00.000Z'},
+    {'id': 2, 'date': '2020-03-02T00:00:00.000Z'},
+    {'id': 3, 'date': '2020-03-05T00:00:00.000Z'},
+]
+
+
+def test_compute_watermark_takes_max_date_and_id():
+    watermark = compute_watermark(CARTS)
+    assert watermark == {'date': '2020-03-05T00:00:00+00:00', 'cart_id': 3}
+
+
+def test_filter_new_carts_after_watermark():
+    watermark = {'date': '2020-03-02T00:00:00+00:00', 'cart_id': 1}
+    assert [c['id'] for c in filter_new_carts(CARTS, watermark)] == [2, 3]
+    assert filter_new_carts(CARTS, None) == CARTS
+
+
+def test_date_filter_params():
+    params = date_filter_params({'date': '2020-03-02T00:00:00+00:00', 'cart_id': 1})
+    assert params['startdate'] == '2020-03-02'
+    assert 'enddate' in params
+    assert date_filter_params(None) == {}
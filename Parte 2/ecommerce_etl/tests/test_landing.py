@@ -0,0 +1,48 @@
+import os
+from datetime import date
+
+import pytest
+
+from src.landing import LandingZone
+
+
+def make_landing(tmp_path, **landing_cfg):
+    cfg = {'compression': 'gzip', 'retention_days': 7}
+    cfg.update(landing_cfg)
+    return LandingZone(str(tmp_path), {'etl': {'landing': cfg}})
+
+
+def test_write_records_manifest_and_merges_sources(tmp_path):
+    landing = make_landing(tmp_path)
+    path = landing.write('r1', 'a__carts', [{'id': 1}], 'carts', 'a', dt=date(2024, 5, 1))
+    landing.write('r1', 'b__carts', [{'id': 1}, {'id': 2}], 'carts', 'b', dt=date(2024, 5, 1))
+
+    assert path == os.path.join(str(tmp_path), 'endpoint=a__carts', 'dt=2024-05-01', 'run=r1', 'part-0000.json.gz')
+    entry = landing.runs()['r1']['endpoints']['b__carts']
+    assert entry['records'] == 2 and entry['source'] == 'b' and len(entry['sha256']) == 64
+    assert landing.read_run('r1') == {'carts': [{'id': 1}, {'id': 1}, {'id': 2}]}
+    with pytest.raises(KeyError):
+        landing.read_run('missing')
+
+
+def test_retention_removes_old_runs(tmp_path):
+    landing = make_landing(tmp_path)
+    landing.write('old', 'products', [{'id': 1}], dt=date(2024, 1, 1))
+    landing.write('new', 'products', [{'id': 2}], dt=date(2024, 1, 9))
+
+    assert landing.apply_retention(today=date(2024, 1, 10)) == 1
+    assert list(landing.runs()) == ['new']
+    assert landing.latest_run() == 'new'
+    assert not os.path.exists(os.path.join(str(tmp_path), 'endpoint=products', 'dt=2024-01-01'))
+
+
+def test_concurrent_runs_keep_every_manifest_entry(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Dos instancias (como dos ejecuciones) solo comparten el lock de archivo
+    zones = [make_landing(tmp_path), make_landing(tmp_path)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: zones[i % 2].write(f"r{i}", 'carts', [{'id': i}], dt=date(2024, 5, 1)),
+                      range(24)))
+
+    assert sorted(zones[0].runs()) == sorted(f"r{i}" for i in range(24))
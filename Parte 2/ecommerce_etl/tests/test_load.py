@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+
+import psycopg2.extras
+
+from src.load import DataLoader
+
+
+def _loader(monkeypatch, executed):
+    loader = DataLoader({
+        'database': {'host': 'h', 'port': 1, 'database': 'd', 'user': 'u', 'password': 'p'},
+        'etl': {'batch_size': 10},
+    })
+
+    class _Cursor:
+        statusmessage = None
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class _Conn:
+        def cursor(self):
+            return _Cursor()
+
+        def commit(self):
+            pass
+
+    @contextmanager
+    def _connection():
+        yield _Conn()
+
+    monkeypatch.setattr(loader, '_get_connection', _connection)
+    monkeypatch.setattr(psycopg2.extras, 'execute_batch',
+                        lambda cursor, query, rows: executed.append((query, rows)))
+    return loader
+
+
+def test_dimensions_upsert_on_source_and_id(monkeypatch):
+    executed = []
+    loader = _loader(monkeypatch, executed)
+
+    loader._insert_batch('dim_products', [
+        {'product_id': 1, 'title': 'a', 'price': 1.0, 'source': 'store_a'},
+        {'product_id': 1, 'title': 'b', 'price': 2.0, 'source': 'store_b'},
+    ])
+    loader._insert_batch('dim_users', [{'user_id': 1, 'email': 'x', 'username': 'x', 'source': 'store_a'}])
+
+    products_query, rows = executed[0]
+    assert 'ON CONFLICT (source, product_id) DO UPDATE' in products_query
+    assert 'source=EXCLUDED.source' not in products_query
+    assert rows == [(1, 'a', 1.0, 'store_a'), (1, 'b', 2.0, 'store_b')]
+    assert 'ON CONFLICT (source, user_id) DO NOTHING' in executed[1][0]
+
+
+def test_single_source_rows_use_default_source(monkeypatch):
+    executed = []
+    loader = _loader(monkeypatch, executed)
+
+    loader._insert_batch('dim_products', [{'product_id': 1, 'title': 'a', 'price': 1.0}])
+
+    query, rows = executed[0]
+    assert '(product_id,title,price)' in query
+    assert 'ON CONFLICT (source, product_id)' in query
+    assert rows == [(1, 'a', 1.0)]
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import responses
+
+from src.extract import APIDataExtractor
+from src.lookup import ProductLookup
+
+
+@responses.activate
+def test_lookup_memoizes_across_instances(sample_config, tmp_path):
+    responses.add(responses.GET, 'https://fakestoreapi.com/products/7', json={'id': 7, 'price': 3.5})
+    responses.add(responses.GET, 'https://fakestoreapi.com/products/9', body='', status=200)
+    store = str(tmp_path / 'product_lookup.json')
+
+    first = ProductLookup(APIDataExtractor(sample_config), store).resolve([7, 9, 7])
+    second = ProductLookup(APIDataExtractor(sample_config), store).resolve([7, 9])
+
+    assert first == {7: {'id': 7, 'price': 3.5}}
+    assert second == first
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_not_found_expires_after_negative_ttl(sample_config, tmp_path):
+    responses.add(responses.GET, 'https://fakestoreapi.com/products/9', body='', status=200)
+    responses.add(responses.GET, 'https://fakestoreapi.com/products/9', json={'id': 9, 'price': 1.0})
+    store = str(tmp_path / 'product_lookup.json')
+
+    assert ProductLookup(APIDataExtractor(sample_config), store, negative_ttl_hours=0).resolve([9]) == {}
+    # Publicado después: con el TTL vencido se vuelve a consultar
+    found = ProductLookup(APIDataExtractor(sample_config), store, negative_ttl_hours=0).resolve([9])
+
+    assert found == {9: {'id': 9, 'price': 1.0}}
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_fetch_product_coalesces_concurrent_requests(sample_config):
+    gate = threading.Event()
+
+    def callback(request):
+        gate.wait(1)
+        return 200, {}, '{"id": 5}'
+
+    responses.add_callback(responses.GET, 'https://fakestoreapi.com/products/5', callback=callback)
+    extractor = APIDataExtractor(sample_config)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(extractor.fetch_product(5))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert results == [{'id': 5}] * 3
+    assert len(responses.calls) == 1
@@ -0,0 +1,450 @@
+import os
+import threading
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+import pytest
+import responses
+
+from main import ETLPipeline
+from scripts.fake_store_server import FakeStoreData, FakeStoreServer
+from src.cache import ExtractCache
+from src.checkpoint import RunCheckpoint
+from src.landing import LandingZone
+from src.state import StateStore
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    etl = ETLPipeline(config_path='tests/test_config.yaml')
+    etl.cache_dir = str(tmp_path / 'cache')
+    etl.raw_dir = str(tmp_path / 'raw')
+    etl.processed_dir = str(tmp_path / 'processed')
+    for d in (etl.cache_dir, etl.raw_dir, etl.processed_dir):
+        os.makedirs(d, exist_ok=True)
+    etl.extractor.cache_dir = etl.cache_dir
+    etl.cache = ExtractCache(etl.cache_dir, etl.config)
+    etl.stats['cache'] = etl.cache.stats
+    etl.state_dir = str(tmp_path / 'state')
+    etl.state = StateStore(str(tmp_path / 'state' / 'pipeline_state.json'))
+    etl.product_lookup.store_path = str(tmp_path / 'state' / 'product_lookup.json')
+    etl.landing = LandingZone(str(tmp_path / 'landing'), etl.config)
+    etl.checkpoint = RunCheckpoint(str(tmp_path / 'checkpoints'), etl.run_id, writer=etl.writer)
+    return etl
+
+
+@responses.activate
+def test_extract_phase_concurrent(pipeline):
+    pipeline.config['etl']['max_workers'] = 3
+    for name in ('products', 'carts', 'users'):
+        responses.add(
+            responses.GET,
+            f'https://fakestoreapi.com/{name}',
+            json=[{'id': 1, 'source': name}],
+            status=200
+        )
+
+    raw_data = pipeline._extract_phase()
+
+    assert list(raw_data.keys()) == ['products', 'carts', 'users']
+    assert raw_data['carts'][0]['source'] == 'carts'
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_extract_phase_failure_raises(pipeline):
+    responses.add(responses.GET, 'https://fakestoreapi.com/products', json=[{'id': 1}], status=200)
+    responses.add(responses.GET, 'https://fakestoreapi.com/carts', status=404)
+    responses.add(responses.GET, 'https://fakestoreapi.com/users', json=[{'id': 1}], status=200)
+
+    with pytest.raises(Exception):
+        pipeline._extract_phase()
+    assert any('carts' in e for e in pipeline.stats['errors'])
+
+
+@responses.activate
+def test_force_refresh_reuses_cache_on_304(pipeline):
+    pipeline.config['api']['endpoints'] = {'products': '/products'}
+    pipeline.force_refresh = True
+    responses.add(
+        responses.GET,
+        'https://fakestoreapi.com/products',
+        json=[{'id': 1, 'title': 'cached'}],
+        headers={'ETag': '"v1"'},
+        status=200
+    )
+    responses.add(responses.GET, 'https://fakestoreapi.com/products', status=304)
+
+    first = pipeline._extract_phase()
+    second = pipeline._extract_phase()
+
+    assert second == first
+    assert responses.calls[1].request.headers['If-None-Match'] == '"v1"'
+
+
+@responses.activate
+def test_incremental_extracts_only_new_carts(pipeline):
+    pipeline.config['api']['endpoints'] = {'carts': '/carts'}
+    pipeline.incremental = True
+    pipeline.state.set('watermarks', {'carts': {'date': '2020-03-02T00:00:00+00:00', 'cart_id': 2}})
+    responses.add(
+        responses.GET,
+        'https://fakestoreapi.com/carts',
+        json=[
+            {'id': 2, 'date': '2020-03-02T00:00:00.000Z', 'products': []},
+            {'id': 7, 'date': '2020-03-04T00:00:00.000Z', 'products': []},
+        ],
+        status=200
+    )
+
+    raw_data = pipeline._extract_phase()
+    pipeline._commit_watermarks()
+
+    assert [c['id'] for c in raw_data['carts']] == [7]
+    assert responses.calls[0].request.params['startdate'] == '2020-03-02'
+    assert pipeline.state.get('watermarks')['carts']['cart_id'] == 7
+
+
+@responses.activate
+def test_incremental_without_state_watermark_extracts_everything(pipeline, monkeypatch):
+    pipeline.config['api']['endpoints'] = {'carts': '/carts'}
+    pipeline.incremental = True
+    # fact_sales con ventas no alcanza para derivar la marca: no se filtra nada
+    monkeypatch.setattr(pipeline.loader, 'count_rows', lambda data_type: 5)
+    carts = [{'id': 1, 'date': '2020-03-02T00:00:00.000Z', 'products': []},
+             {'id': 2, 'date': '2020-03-02T23:00:00.000Z', 'products': []}]
+    responses.add(responses.GET, 'https://fakestoreapi.com/carts', json=carts, status=200)
+
+    raw_data = pipeline._extract_phase()
+    pipeline._commit_watermarks()
+
+    assert [c['id'] for c in raw_data['carts']] == [1, 2]
+    assert 'startdate' not in responses.calls[0].request.params
+    assert pipeline.state.get('watermarks')['carts']['cart_id'] == 2
+
+
+def test_multi_source_extraction_tags_records(pipeline):
+    with FakeStoreServer(data=FakeStoreData(products=3, users=2, carts=2, seed=1)) as store_a, \
+            FakeStoreServer(data=FakeStoreData(products=3, users=2, carts=2, seed=2)) as store_b:
+        pipeline.config['api']['sources'] = [
+            {'name': 'store_a', 'base_url': store_a.base_url},
+            {'name': 'store_b', 'base_url': store_b.base_url},
+        ]
+        raw_data = pipeline._extract_phase()
+        transformed = pipeline._transform_phase(raw_data)
+
+    assert len(raw_data['products']) == 6
+    assert {p['source'] for p in raw_data['products']} == {'store_a', 'store_b'}
+    prices = {(p['source'], p['product_id']): p['price'] for p in transformed['products']}
+    for sale in transformed['sales']:
+        assert sale['unit_price'] == prices[(sale['source'], sale['product_id'])]
+    assert os.path.exists(os.path.join(pipeline.raw_dir, 'store_b__carts.json'))
+
+
+@responses.activate
+def test_cache_written_under_lock_and_untagged(pipeline):
+    responses.add(responses.GET, 'https://fakestoreapi.com/products', json=[{'id': 1}], status=200)
+    gate = threading.Event()
+    # Writer ocupado: la entrada de caché no debe depender de él
+    pipeline.writer.submit('bloqueo', gate.wait, 5)
+    try:
+        data = pipeline._extract_endpoint('products', '/products', {'name': 'store_a', 'tagged': True, 'base_url': 'https://fakestoreapi.com'})
+        assert pipeline.cache.get('store_a__products') == [{'id': 1}]
+    finally:
+        gate.set()
+    pipeline._drain_writer()
+
+    assert data == [{'id': 1, 'source': 'store_a'}]
+    assert pipeline.cache.get('store_a__products') == [{'id': 1}]
+
+
+def test_snapshots_written_in_background(pipeline):
+    pipeline.transformer.transform_products = lambda products: [{'product_id': 1}]
+    transformed = pipeline._transform_phase({'products': [{'id': 1}]})
+
+    assert transformed['products'] == [{'product_id': 1}]
+    assert pipeline.load_processed_snapshot('products') == [{'product_id': 1}]
+    assert pipeline.stats['writer']['written'] >= 1
+    assert pipeline.stats['errors'] == []
+
+
+@responses.activate
+def test_replay_reads_landing_run_without_api(pipeline):
+    pipeline.config['api']['endpoints'] = {'products': '/products', 'users': '/users'}
+    for name in ('products', 'users'):
+        responses.add(responses.GET, f'https://fakestoreapi.com/{name}', json=[{'id': 1}], status=200)
+    pipeline._extract_phase()
+    pipeline._drain_writer()
+    calls = len(responses.calls)
+
+    run = pipeline.landing.runs()[pipeline.run_id]
+    assert run['endpoints']['products']['path'].startswith(f'endpoint=products/dt={run["dt"]}/run=')
+    assert pipeline._replay_phase('latest') == {'products': [{'id': 1}], 'users': [{'id': 1}]}
+    assert len(responses.calls) == calls
+
+
+def test_unchanged_entities_skip_transform_and_reuse_loaded_output(pipeline, monkeypatch):
+    pipeline.config['etl']['skip_unchanged'] = {'enabled': True}
+    rows = {'users': 1, 'geography': 1}
+    monkeypatch.setattr(pipeline.loader, 'count_rows', lambda data_type: rows[data_type])
+    raw = {'users': [{'id': 1, 'name': {'firstname': 'a', 'lastname': 'b'}, 'address': {}}]}
+    first = pipeline._transform_phase(raw)
+    assert 'users' in first
+    pipeline._commit_content_hashes(first)
+    pipeline._drain_writer()
+
+    second = pipeline._transform_phase(raw)
+
+    assert 'users' not in second and 'geography' not in second
+    assert pipeline.stats['skipped_entities'] == ['users']
+    assert pipeline.reused_data['users'][0]['user_id'] == 1
+
+    changed = pipeline._transform_phase({'users': [dict(raw['users'][0], email='x@y.z')]})
+    assert 'users' in changed
+
+    # Warehouse recreado: mismo hash pero dimensiones vacías, se vuelve a cargar
+    pipeline._commit_content_hashes(pipeline._transform_phase(raw))
+    pipeline._drain_writer()
+    rows['users'] = 0
+    assert 'users' in pipeline._transform_phase(raw)
+
+
+def test_skip_unchanged_is_opt_in(pipeline):
+    raw = {'users': [{'id': 1, 'name': {'firstname': 'a', 'lastname': 'b'}, 'address': {}}]}
+    pipeline._commit_content_hashes(pipeline._transform_phase(raw))
+    pipeline._drain_writer()
+
+    assert 'users' in pipeline._transform_phase(raw) and not pipeline.stats['skipped_entities']
+
+
+def test_lookup_dimensions_load_distinct_categories(pipeline, monkeypatch):
+    loaded = {}
+    monkeypatch.setattr(pipeline.loader, 'load_data', lambda data_type, data, **_: loaded.setdefault(data_type, data))
+    pipeline.config['etl']['lookup_dimensions'] = ['category']
+    products = pipeline.transformer.transform_products([
+        {'id': 1, 'price': 1.0, 'category': 'Jewelery'},
+        {'id': 2, 'price': 2.0, 'category': 'jewelery'},
+        {'id': 3, 'price': 3.0, 'category': 'electronics'},
+    ])
+
+    pipeline._load_phase({'products': products})
+
+    assert list(loaded) == ['categories', 'products']
+    assert loaded['categories'].to_dicts() == [{'category': 'jewelery'}, {'category': 'electronics'}]
+
+
+def test_streaming_mode_loads_chunk_by_chunk(pipeline, monkeypatch):
+    loaded = []
+    monkeypatch.setattr(pipeline.loader, 'load_data', lambda data_type, data: loaded.append((data_type, data)))
+    monkeypatch.setattr(pipeline, '_tests_phase', lambda: True)
+    pipeline.config['etl']['chunk_size'] = 4
+    data = FakeStoreData(products=6, users=5, carts=10, seed=3)
+
+    with FakeStoreServer(data=data) as store:
+        pipeline.config['api']['base_url'] = store.base_url
+        pipeline.extractor.base_url = store.base_url
+        pipeline._run_streaming()
+        batch = pipeline._transform_phase(pipeline._extract_phase())
+        pipeline._data_quality_phase(batch)
+
+    def rows(data_type):
+        return [dict(r) for kind, chunk in loaded if kind == data_type for r in chunk]
+
+    def key(sale):
+        return sale['cart_id'], sale['product_id']
+
+    # Cada chunk llega al LOAD por separado y el resultado coincide con el modo batch
+    assert sum(1 for kind, _ in loaded if kind == 'sales') == 3
+    assert sorted(map(key, rows('sales'))) == sorted(map(key, batch['sales']))
+    date_keys = [d['date_key'] for d in rows('dates')]
+    assert len(date_keys) == len(set(date_keys)) == len(batch['dates'])
+    assert pipeline.stats['streaming']['records'] == 6 + 5 + 10
+
+
+def test_stream_state_skips_repeated_carts_and_dates():
+    from src.records import RecordBatch
+    from src.streaming import IdSet, StreamState
+
+    state = StreamState()
+    fresh, repeated = state.new_carts([{'id': 1}, {'id': 2}])
+    assert len(fresh) == 2 and repeated == 0
+    fresh, repeated = state.new_carts([{'id': 2}, {'id': 3}, {'id': 2, 'source': 'b'}])
+    assert [c['id'] for c in fresh] == [3, 2] and repeated == 1
+
+    state.remember({'dates': RecordBatch({'date_key': [20200101]})})
+    dates = state.new_dates(RecordBatch({'date_key': [20200101, 20200102]}))
+    assert dates.column('date_key') == [20200102]
+
+    ids = IdSet()
+    assert ids.add(10 ** 6) and not ids.add(10 ** 6) and 'x' not in ids
+    assert len(ids) == 1 and 10 ** 6 in ids and 5 not in ids
+
+
+def test_stream_state_prices_products_keyed_by_product_id(pipeline):
+    from src.streaming import StreamState
+
+    state = StreamState()
+    state.add_products([{'id': 1, 'price': 2.0}, {'product_id': 2, 'price': 3.0}])
+    carts = [{'id': 1, 'userId': 1, 'date': '2020-03-02',
+              'products': [{'productId': 1, 'quantity': 1}, {'productId': 2, 'quantity': 1}]}]
+    sales = pipeline.transformer.transform_carts(carts, None, state.price_index(pipeline.transformer))
+
+    # Como en modo batch, los productos con solo product_id también tienen precio
+    assert [row['unit_price'] for row in sales] == [2.0, 3.0]
+
+
+def test_id_set_stays_small_for_huge_and_dense_ids():
+    import tracemalloc
+    from src.streaming import IdSet
+
+    ids = IdSet()
+    tracemalloc.start()
+    try:
+        # Ids externos arbitrarios: no deben reservar un bitmap hasta el id
+        for value in (10 ** 9, 10 ** 12, 2 ** 62, -5):
+            assert ids.add(value) and not ids.add(value)
+        for value in range(100000):
+            ids.add(value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 1024 * 1024
+    assert len(ids) == 100004
+    assert 10 ** 12 in ids and 10 ** 12 + 1 not in ids and 99999 in ids and 100000 not in ids
+
+
+def test_overlapped_stages_match_streaming(pipeline, monkeypatch):
+    loaded = []
+    monkeypatch.setattr(pipeline.loader, 'load_data', lambda data_type, data: loaded.append((data_type, len(data))))
+    monkeypatch.setattr(pipeline, '_tests_phase', lambda: True)
+    pipeline.config['etl']['chunk_size'] = 3
+    pipeline.config['etl']['overlap'] = {'queue_size': 1}
+
+    with FakeStoreServer(data=FakeStoreData(products=5, users=4, carts=9, seed=4)) as store:
+        pipeline.config['api']['base_url'] = store.base_url
+        pipeline.extractor.base_url = store.base_url
+        pipeline._run_overlapped()
+        overlapped = list(loaded)
+        loaded.clear()
+        pipeline._run_streaming()
+
+    # Mismo orden FIFO de cargas: dimensiones antes que las ventas
+    assert overlapped == loaded
+    assert [kind for kind, _ in overlapped].index('sales') > [kind for kind, _ in overlapped].index('users')
+    assert pipeline.stats['stages']['load_max_depth'] <= 1
+
+
+def test_overlapped_stage_failure_stops_all_stages(pipeline, monkeypatch):
+    def _fail(data_type, data):
+        raise RuntimeError('db caída')
+
+    monkeypatch.setattr(pipeline.loader, 'load_data', _fail)
+    monkeypatch.setattr(pipeline, '_tests_phase', lambda: True)
+    pipeline.config['etl']['chunk_size'] = 1
+    pipeline.config['etl']['overlap'] = {'queue_size': 1}
+
+    with FakeStoreServer(data=FakeStoreData(products=5, users=4, carts=20, seed=4)) as store:
+        pipeline.config['api']['base_url'] = store.base_url
+        pipeline.extractor.base_url = store.base_url
+        with pytest.raises(RuntimeError, match='db caída'):
+            pipeline._run_overlapped()
+
+    assert not [t for t in threading.enumerate() if t.name.startswith('stage-')]
+
+
+def test_scheduled_dag_loads_same_rows_as_batch(pipeline, monkeypatch):
+    loaded = []
+    monkeypatch.setattr(pipeline.loader, 'load_data', lambda data_type, data: loaded.append((data_type, len(data))))
+    monkeypatch.setattr(pipeline, '_tests_phase', lambda: True)
+    pipeline.config['etl']['scheduler'] = {'max_workers': 4}
+
+    with FakeStoreServer(data=FakeStoreData(products=5, users=4, carts=9, seed=4)) as store:
+        pipeline.config['api']['base_url'] = store.base_url
+        pipeline.extractor.base_url = store.base_url
+        validated = pipeline._run_scheduled()
+        batch = pipeline._transform_phase(pipeline._extract_phase())
+        pipeline._data_quality_phase(batch)
+
+    assert {k: len(v) for k, v in validated.items()} == {k: len(v) for k, v in batch.items()}
+    assert sorted(loaded) == sorted((k, len(v)) for k, v in batch.items() if len(v))
+    # fact_sales se carga después de las dimensiones que referencia
+    kinds = [kind for kind, _ in loaded]
+    assert all(kinds.index('sales') > kinds.index(dim) for dim in ('dates', 'products', 'users'))
+    assert {'extract:carts', 'validate:sales', 'load:sales'} <= set(pipeline.stats['tasks'])
+
+
+def test_resume_continues_from_last_committed_load_batch(pipeline, monkeypatch, tmp_path):
+    @contextmanager
+    def _connection():
+        yield MagicMock()
+
+    inserted = []
+    fail = {'at': 2}
+
+    def _insert(table, batch):
+        # Falla transitoria en el segundo lote de fact_sales
+        if table == 'fact_sales':
+            fail['at'] -= 1
+            if fail['at'] == 0:
+                raise RuntimeError('conexión perdida')
+        inserted.append((table, len(batch)))
+
+    def _configure(etl):
+        monkeypatch.setattr(etl.loader, '_get_connection', _connection)
+        monkeypatch.setattr(etl.loader, '_resolve_table_name', lambda cursor, base: base)
+        monkeypatch.setattr(etl.loader, '_insert_batch', _insert)
+        monkeypatch.setattr(etl, '_tests_phase', lambda: True)
+        etl.config['etl']['batch_size'] = 10
+        etl.config['api']['base_url'] = store.base_url
+        etl.extractor.base_url = store.base_url
+
+    with FakeStoreServer(data=FakeStoreData(products=5, users=4, carts=20, seed=4)) as store:
+        _configure(pipeline)
+        with pytest.raises(RuntimeError, match='conexión perdida'):
+            pipeline.run()
+        assert pipeline.checkpoint.next_phase() == 'load'
+        assert pipeline.checkpoint.offset('sales') == 10
+        expected = len(pipeline.checkpoint.outputs('data_quality')['sales'])
+        inserted.clear()
+
+        # Equivalente a --resume latest con los directorios del fixture
+        resumed = ETLPipeline(config_path='tests/test_config.yaml')
+        for attr in ('cache', 'state', 'landing', 'raw_dir', 'processed_dir'):
+            setattr(resumed, attr, getattr(pipeline, attr))
+        resumed.checkpoint = RunCheckpoint.resume(str(tmp_path / 'checkpoints'), 'latest')
+        resumed.resume, resumed.run_id = 'latest', resumed.checkpoint.run_id
+        _configure(resumed)
+        monkeypatch.setattr(resumed, '_extract_phase', lambda: pytest.fail('no debe re-extraer'))
+        resumed.run()
+
+    # Solo se cargan los lotes restantes de fact_sales, sin repetir dimensiones ni fases
+    assert resumed.run_id == pipeline.run_id
+    assert {table for table, _ in inserted} == {'fact_sales'}
+    assert sum(n for _, n in inserted) == expected - 10
+    assert not resumed.checkpoint.exists()
+
+
+def test_memory_budget_spills_datasets_without_changing_results(pipeline, tmp_path):
+    from src.spill import MemoryBudget
+
+    with FakeStoreServer(data=FakeStoreData(products=5, users=4, carts=30, seed=4)) as store:
+        pipeline.config['api']['base_url'] = store.base_url
+        pipeline.extractor.base_url = store.base_url
+        raw = pipeline._extract_phase()
+    expected = pipeline._transform_phase(raw)
+    pipeline._data_quality_phase(expected)
+
+    # chunk_rows pequeño: los carritos raw se guardan y transforman por chunks
+    pipeline.memory = MemoryBudget(str(tmp_path / 'spill'), budget_bytes=1, chunk_rows=7)
+    raw_data = pipeline.memory.datasets('raw')
+    raw_data.update(raw)
+    assert repr(raw_data['carts']) == 'ChunkedRecords(30 registros en 5 chunks)'
+    transformed = pipeline._transform_phase(raw_data)
+    raw_data.clear()
+    pipeline._data_quality_phase(transformed)
+
+    # Con un presupuesto mínimo todo lo frío va a disco y se relee al usarlo
+    assert pipeline.memory.stats['spilled'] > 0 and pipeline.memory.stats['paged_in'] > 0
+    assert list(transformed) == list(expected)
+    assert all(transformed[key] == expected[key] for key in expected)
@@ -0,0 +1,37 @@
+from src.price_index import PriceIndex
+
+
+def test_dense_index_by_source_and_id():
+    index = PriceIndex.build([
+        {'id': 1, 'price': 2.0, 'source': 'a'},
+        {'id': 1, 'price': 5.0, 'source': 'b'},
+        {'id': 3, 'price': '7.5', 'source': 'a'},
+        {'id': 3, 'price': 8.0, 'source': 'a'},
+    ])
+
+    assert index.mapping is None and index.span == 4
+    assert index.price('a', 1) == 2.0 and index.price('b', 1) == 5.0
+    # Ante ids repetidos gana el último
+    assert index.price('a', 3) == 8.0
+    assert index.price('b', 3) is None and index.price('c', 1) is None
+    assert index.price('a', 99) is None and index.price('a', '1') is None
+    assert ('a', 1) in index and ('a', 2) not in index
+
+
+def test_sparse_or_non_integer_ids_use_mapping():
+    assert PriceIndex.build([{'id': 10 ** 9, 'price': 1}]).mapping == {(None, 10 ** 9): 1.0}
+    index = PriceIndex.build([{'id': 'sku-1', 'price': 3}])
+    assert index.price(None, 'sku-1') == 3.0
+
+
+def test_shared_memory_attach_reads_same_prices():
+    index = PriceIndex.build([{'id': i, 'price': i * 1.5} for i in range(1, 50)])
+    handle = index.share()
+    try:
+        attached = PriceIndex.attach(handle)
+        assert [attached.price(None, i) for i in (1, 49, 50)] == [1.5, 73.5, None]
+        attached.close()
+    finally:
+        index.close(unlink=True)
+    # Cerrar el bloque compartido no invalida el índice local
+    assert index.price(None, 2) == 3.0
@@ -0,0 +1,108 @@
+import pickle
+from array import array
+from contextlib import contextmanager
+
+import psycopg2.extras
+
+from src.load import DataLoader
+from src.records import RecordBatch, concat, distinct_values, take
+
+TYPES = {'cart_id': 'q', 'unit_price': 'd'}
+
+
+def _batch():
+    return RecordBatch.from_rows(
+        ['cart_id', 'unit_price', 'source'],
+        [(1, 10.5, 'a'), (2, 3.0, None), (3, 1.25, 'b')],
+        TYPES,
+    )
+
+
+def test_numeric_columns_are_typed_arrays():
+    batch = _batch()
+
+    assert isinstance(batch.column('cart_id'), array) and batch.column('cart_id').typecode == 'q'
+    assert isinstance(batch.column('unit_price'), array)
+    assert batch.column('source') == ['a', None, 'b']
+    # Una columna con nulos no entra en un array tipado y queda como lista
+    assert RecordBatch({'cart_id': [1, None]}, TYPES).column('cart_id') == [1, None]
+
+
+def test_rows_behave_like_dicts():
+    batch = _batch()
+
+    assert len(batch) == 3
+    assert batch[0] == {'cart_id': 1, 'unit_price': 10.5, 'source': 'a'}
+    assert batch[-1].get('source') == 'b'
+    assert [row['cart_id'] for row in batch] == [1, 2, 3]
+    assert batch == batch.to_dicts()
+    assert list(batch.rows(['source', 'cart_id'])) == [('a', 1), (None, 2), ('b', 3)]
+
+
+def test_slice_take_and_concat_keep_columns():
+    batch = _batch()
+
+    assert batch[1:].to_pydict()['cart_id'] == [2, 3]
+    assert take(batch, [2, 0]).to_pydict()['cart_id'] == [3, 1]
+    assert take([{'a': 1}, {'a': 2}], [1]) == [{'a': 2}]
+
+    other = RecordBatch.from_rows(['cart_id', 'unit_price'], [(4, 2.0)], TYPES)
+    merged = concat([batch, other])
+    assert merged.to_pydict()['cart_id'] == [1, 2, 3, 4]
+    assert merged[3]['source'] is None
+    assert pickle.loads(pickle.dumps(merged)) == merged
+
+
+def test_loader_inserts_record_batch_columns(monkeypatch):
+    loader = DataLoader({
+        'database': {'host': 'h', 'port': 1, 'database': 'd', 'user': 'u', 'password': 'p'},
+        'etl': {'batch_size': 2},
+    })
+    executed = []
+
+    class _Cursor:
+        statusmessage = None
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class _Conn:
+        def cursor(self):
+            return _Cursor()
+
+        def commit(self):
+            pass
+
+    @contextmanager
+    def _connection():
+        yield _Conn()
+
+    monkeypatch.setattr(loader, '_get_connection', _connection)
+    monkeypatch.setattr(psycopg2.extras, 'execute_batch',
+                        lambda cursor, query, rows: executed.append((query, rows)))
+
+    sales = RecordBatch.from_rows(
+        ['cart_id', 'product_id', 'quantity', 'total_amount', 'source'],
+        [(1, 7, 2, 20.0, 'a')],
+        {'cart_id': 'q', 'product_id': 'q', 'quantity': 'q', 'total_amount': 'd'},
+    )
+    loader._insert_batch('public.fact_sales', sales)
+
+    query, rows = executed[0]
+    assert '(product_id,quantity,total_amount,source)' in query
+    assert rows == [(7, 2, 20.0, 'a')]
+
+
+def test_dict_column_take_concat_and_distinct():
+    first = RecordBatch.from_rows(['city'], [(0,), (1,), (0,)], dictionaries={'city': ['Lima', None]})
+    second = RecordBatch.from_rows(['city'], [(0,), (1,)], dictionaries={'city': ['Quito', 'Lima']})
+
+    assert take(first, [2, 1]).column('city') == ['Lima', None]
+    merged = concat([first, second])
+    assert list(merged.column('city')) == ['Lima', None, 'Lima', 'Quito', 'Lima']
+    assert merged.column('city').dictionary == ['Lima', None, 'Quito']
+    assert distinct_values(merged, 'city') == ['Lima', 'Quito']
+    assert distinct_values([{'city': 'a'}, {'city': 'a'}, {}], 'city') == ['a']
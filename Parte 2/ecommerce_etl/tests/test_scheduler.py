@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from src.scheduler import TaskGraph
+
+
+def test_tasks_receive_dependency_results_and_run_in_parallel():
+    graph = TaskGraph()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def _independent(value):
+        # Ambas ramas deben estar corriendo a la vez para pasar la barrera
+        barrier.wait()
+        return value
+
+    graph.add('a', lambda: _independent(2))
+    graph.add('b', lambda: _independent(3))
+    graph.add('sum', lambda a, b: a + b, ['a', 'b'])
+
+    results = graph.run(max_workers=2)
+
+    assert results['sum'] == 5
+    assert set(graph.timings) == {'a', 'b', 'sum'}
+
+
+def test_failure_skips_dependents_and_reraises():
+    graph = TaskGraph()
+    ran = []
+
+    def _fail():
+        raise RuntimeError('boom')
+
+    graph.add('fail', _fail)
+    graph.add('after', lambda _: ran.append('after'), ['fail'])
+    graph.add('other', lambda: ran.append('other'))
+
+    with pytest.raises(RuntimeError, match='boom'):
+        graph.run(max_workers=2)
+    assert 'after' not in ran and 'fail' in graph.timings
+
+
+def test_unknown_dependency_and_cycles_are_rejected():
+    graph = TaskGraph()
+    graph.add('a', lambda b: b, ['b'])
+    with pytest.raises(ValueError, match='no existe'):
+        graph.run()
+
+    graph.add('b', lambda a: a, ['a'])
+    with pytest.raises(ValueError, match='Ciclo'):
+        graph.run()
+
+
+def test_keep_releases_consumed_results():
+    graph = TaskGraph()
+    graph.add('raw', lambda: [1, 2, 3])
+    graph.add('total', sum, ['raw'])
+
+    results = graph.run(keep=['total'])
+
+    assert results == {'total': 6}
@@ -0,0 +1,56 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from src.snapshot import find_snapshot, read_snapshot, write_snapshot
+
+SALES = [
+    {
+        'cart_id': 1, 'user_id': 2, 'product_id': 3,
+        'date': datetime(2020, 3, 2, tzinfo=timezone.utc), 'date_key': 20200302,
+        'quantity': 4, 'unit_price': 10.5, 'total_amount': 42.0,
+        'loaded_at': datetime(2024, 1, 1, 12, 0),
+    },
+]
+
+
+def test_json_snapshot_roundtrip(tmp_path):
+    path = write_snapshot(SALES, str(tmp_path), 'sales')
+
+    assert path.endswith('sales.json')
+    # JSON serializa fechas como texto
+    assert read_snapshot(str(tmp_path), 'sales')[0]['loaded_at'] == '2024-01-01 12:00:00'
+    assert read_snapshot(str(tmp_path), 'missing') is None
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_columnar_snapshot_keeps_types(tmp_path, fmt):
+    pytest.importorskip('pyarrow')
+    write_snapshot(SALES, str(tmp_path), 'sales', 'json')
+    path = write_snapshot(SALES, str(tmp_path), 'sales', fmt)
+
+    assert path.endswith(f'sales.{fmt}')
+    # El snapshot previo en otro formato se reemplaza
+    assert find_snapshot(str(tmp_path), 'sales') == path
+    assert read_snapshot(str(tmp_path), 'sales') == SALES
+
+
+def test_columnar_snapshot_typed_dates(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    from src.snapshot import read_snapshot_table
+
+    dates = [{'date_key': 20200302, 'date': date(2020, 3, 2), 'day': 2, 'day_name': 'Monday'}]
+    path = write_snapshot(dates, str(tmp_path), 'dates', 'parquet')
+
+    table = read_snapshot_table(path)
+    assert table.schema.field('date_key').type == pa.int32()
+    assert table.schema.field('date').type == pa.date32()
+    assert table.to_pylist() == dates
+
+
+def test_untypable_records_fall_back_to_json(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = write_snapshot([{'id': 1}, {'id': 'x'}], str(tmp_path), 'raw', 'parquet')
+
+    assert path.endswith('raw.json')
+    assert read_snapshot(str(tmp_path), 'raw') == [{'id': 1}, {'id': 'x'}]
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from src.records import DictColumn, RecordBatch
+from src.spill import ChunkedRecords, MemoryBudget, estimate_size, iter_chunks, pin_datasets
+from src.utils import content_hash
+
+
+def _sales(n):
+    return RecordBatch({
+        'cart_id': list(range(n)),
+        'total_amount': [float(i) for i in range(n)],
+        'category': DictColumn([i % 2 for i in range(n)], ['a', None]),
+        'loaded_at': [datetime(2024, 1, 1)] * n,
+    }, types={'cart_id': 'q', 'total_amount': 'd'})
+
+
+def test_estimate_size_counts_typed_columns_exactly():
+    batch = RecordBatch({'id': list(range(1000))}, types={'id': 'q'})
+    assert estimate_size(batch) == 8000
+    assert estimate_size([{'a': 'x' * 100}] * 100) > 100 * 100
+
+
+def test_largest_cold_dataset_spills_and_pages_back_in(tmp_path):
+    budget = MemoryBudget(str(tmp_path / 'spill'), budget_bytes=estimate_size(_sales(500)) + 1000)
+    datasets = budget.datasets('transformed')
+    datasets['sales'] = _sales(500)
+    datasets['raw'] = [{'id': i} for i in range(20)]
+    datasets['more'] = _sales(100)
+
+    # 'sales' es el más grande entre los fríos: va a disco; los demás quedan
+    assert not datasets.in_memory('sales') and datasets.in_memory('more')
+    assert budget.stats['spilled'] == 1
+
+    sales = datasets['sales']
+    assert sales == _sales(500)
+    assert sales.types == {'cart_id': 'q', 'total_amount': 'd'}
+    assert isinstance(sales.column('category'), DictColumn)
+    assert budget.stats['paged_in'] == 1 and datasets.in_memory('sales')
+
+    datasets.clear()
+    assert budget.resident_bytes == 0 and not list((tmp_path / 'spill').rglob('*.*'))
+    budget.close()
+    assert not (tmp_path / 'spill').exists()
+
+
+def test_without_budget_only_tracks(tmp_path):
+    budget = MemoryBudget(str(tmp_path / 'spill'))
+    datasets = budget.datasets('raw')
+    datasets.update({'a': _sales(1000), 'b': [{'id': 1}]})
+    assert datasets.in_memory('a') and budget.stats['spilled'] == 0
+    assert budget.stats['peak_mb'] >= 0 and dict(datasets)['b'] == [{'id': 1}]
+
+
+def test_large_lists_are_chunked_and_adopted_without_reading(tmp_path):
+    budget = MemoryBudget(str(tmp_path / 'spill'), budget_bytes=1, chunk_rows=4)
+    records = [{'id': i} for i in range(10)]
+    datasets = budget.datasets('raw')
+    datasets['carts'] = records
+    datasets['small'] = records[:3]
+
+    carts = datasets['carts']
+    assert isinstance(carts, ChunkedRecords) and not isinstance(datasets['small'], ChunkedRecords)
+    assert carts == records and carts[-1] == {'id': 9} and carts[3:6] == records[3:6]
+    assert [len(chunk) for chunk in iter_chunks(carts, 100)] == [4, 4, 2]
+    assert content_hash(carts) == content_hash(records)
+
+    # adopt mueve las entradas (ya en disco) a otro mapping sin releerlas
+    paged_in = budget.stats['paged_in']
+    merged = budget.datasets('validated')
+    merged.adopt(datasets)
+    assert len(datasets) == 0 and budget.stats['paged_in'] == paged_in
+    assert merged['carts'] == records and merged['small'] == records[:3]
+
+    # Reemplazar el dataset borra sus chunks de disco
+    merged['carts'] = []
+    assert not list((tmp_path / 'spill').rglob('carts#*'))
+
+
+def test_pinned_datasets_are_written_without_paging_in(tmp_path):
+    budget = MemoryBudget(str(tmp_path / 'spill'), budget_bytes=1, chunk_rows=4)
+    datasets = budget.datasets('transformed')
+    datasets['sales'] = _sales(50)
+    datasets['carts'] = [{'id': i} for i in range(10)]
+    datasets['other'] = _sales(10)
+    pinned = pin_datasets(datasets)
+
+    # El llamador reemplaza un dataset antes de que la escritura lo lea
+    spilled = list((tmp_path / 'spill').rglob('sales.*'))
+    datasets['sales'] = _sales(5)
+    datasets['more'] = _sales(5)
+    assert spilled and all(path.exists() for path in spilled)
+
+    paged_in, resident = budget.stats['paged_in'], budget.resident_bytes
+    written = dict(pinned.items())
+    assert written['sales'] == _sales(50) and list(written['carts']) == [{'id': i} for i in range(10)]
+    assert budget.stats['paged_in'] == paged_in and budget.resident_bytes == resident
+
+    pinned.release()
+    assert not any(path.exists() for path in spilled)
@@ -0,0 +1,28 @@
+import time
+
+from src.throttle import AIMDController, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after_seconds_and_date():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470) == 10.0
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.08
+
+
+def test_aimd_additive_increase_multiplicative_decrease():
+    controller = AIMDController(initial=2, min_limit=1, max_limit=4)
+    for _ in range(2):
+        controller.on_success(0.01)
+    assert controller.limit == 3
+    controller.on_success(0.5)  # latencia degradada: no sube
+    assert controller.limit == 3
+    controller.on_congestion()
+    assert controller.limit == 1
@@ -16,4 +16,161 @@ def test_generate_date_dimension():
     dates = transformer.generate_date_dimension(sales_data)
     assert len(dates) == 1
     assert dates[0]['year'] == 2025
-    assert dates[0]['month'] == 10
\ No newline at end of file
+    assert dates[0]['month'] == 10
+def test_find_missing_product_ids(sample_config, sample_products):
+    transformer = DataTransformer(sample_config)
+    carts = [
+        {'id': 1, 'products': [{'productId': 1, 'quantity': 1}, {'productId': 7, 'quantity': 2}]},
+        {'id': 2, 'products': [{'productId': 7, 'quantity': 1}, {'productId': 9, 'quantity': 1}]},
+    ]
+
+    assert transformer.find_missing_product_ids(carts, sample_products) == {7, 9}
+
+
+def _without_timestamps(records):
+    return [{k: v for k, v in r.items() if k not in ('loaded_at', 'created_at')} for r in records]
+
+
+def test_pandas_backend_matches_python_backend(sample_config):
+    pytest.importorskip('pandas')
+    from scripts.fake_store_server import FakeStoreData
+    from src.transform import create_transformer
+    from src.transform_pandas import PandasDataTransformer
+
+    data = FakeStoreData(products=15, users=5, carts=40)
+    products = [data.product(i) for i in range(1, 16)]
+    users = [data.user(i) for i in range(1, 6)]
+    # Productos 16-20 no están en products: sus items se omiten en ambos backends
+    carts = [data.cart(i) for i in range(1, 41)] + [
+        {'id': 41, 'userId': 1, 'date': '2020-03-02', 'products': [{'productId': 1, 'quantity': 0}]},
+        {'id': 42, 'userId': 2, 'date': 'invalid', 'products': []},
+    ]
+    python_backend = DataTransformer(sample_config)
+    pandas_backend = create_transformer({'etl': {'transform_backend': 'pandas'}})
+    assert isinstance(pandas_backend, PandasDataTransformer)
+
+    assert pandas_backend.transform_products(products) == python_backend.transform_products(products)
+    expected_users = python_backend.transform_users(users)
+    actual_users = pandas_backend.transform_users(users)
+    for key in ('users', 'geography'):
+        assert _without_timestamps(actual_users[key]) == _without_timestamps(expected_users[key])
+
+    expected = python_backend.transform_carts(carts, products)
+    actual = pandas_backend.transform_carts(carts, products)
+    assert expected and _without_timestamps(actual) == _without_timestamps(expected)
+    assert [type(v) for v in actual[0].values()] == [type(v) for v in expected[0].values()]
+
+
+def test_pandas_backend_keeps_source_keys(sample_config):
+    from src.transform_pandas import PandasDataTransformer
+
+    products = [{'id': 1, 'price': 2.0, 'source': 'a'}, {'id': 1, 'price': 5.0, 'source': 'b'}]
+    carts = [{'id': 1, 'userId': 1, 'date': '2020-03-02T10:00:00.000Z', 'source': 'b',
+              'products': [{'productId': 1, 'quantity': 2}]}]
+    sales = PandasDataTransformer(sample_config).transform_carts(carts, products)
+
+    assert sales[0]['unit_price'] == 5.0 and sales[0]['source'] == 'b'
+    assert sales[0]['date_key'] == 20200302
+
+
+def test_sharded_transform_matches_serial(sample_config):
+    from scripts.fake_store_server import FakeStoreData
+    from src.transform import create_transformer
+    from src.transform_parallel import ShardedTransformer
+
+    data = FakeStoreData(products=10, users=7, carts=25)
+    products = [data.product(i) for i in range(1, 11)]
+    users = [data.user(i) for i in range(1, 8)]
+    carts = [data.cart(i) for i in range(1, 26)]
+    sharded = create_transformer(
+        {'etl': {'max_workers': 2, 'chunk_size': 4, 'parallel_min_records': 1}}
+    )
+    assert isinstance(sharded, ShardedTransformer)
+    serial = DataTransformer(sample_config)
+
+    assert sharded.transform_products(products) == serial.transform_products(products)
+    assert _without_timestamps(sharded.transform_users(users)['users']) == \
+        _without_timestamps(serial.transform_users(users)['users'])
+    assert _without_timestamps(sharded.transform_carts(carts, products)) == \
+        _without_timestamps(serial.transform_carts(carts, products))
+    assert sharded.find_missing_product_ids(carts, products) == set()
+
+
+def test_sharded_transform_runs_from_worker_thread():
+    from concurrent.futures import ThreadPoolExecutor
+    from scripts.fake_store_server import FakeStoreData
+    from src.transform import create_transformer
+
+    # Como en el DAG: el pool de procesos se crea desde un hilo (forkserver, no fork)
+    data = FakeStoreData(products=10, users=1, carts=12)
+    products = [data.product(i) for i in range(1, 11)]
+    carts = [data.cart(i) for i in range(1, 13)]
+    sharded = create_transformer({'etl': {'max_workers': 2, 'chunk_size': 4, 'parallel_min_records': 1}})
+    with ThreadPoolExecutor(max_workers=1) as threads:
+        sales = threads.submit(sharded.transform_carts, carts, products).result(timeout=60)
+    assert _without_timestamps(sales) == _without_timestamps(sharded.transformer.transform_carts(carts, products))
+
+
+@pytest.mark.parametrize('backend', ['python', 'pandas'])
+def test_low_cardinality_columns_are_dictionary_encoded(backend):
+    from src.records import DictColumn
+    from src.transform import create_transformer
+
+    transformer = create_transformer({'etl': {'transform_backend': backend}})
+    products = transformer.transform_products([
+        {'id': 1, 'price': 1.0, 'category': "Men's Clothing"},
+        {'id': 2, 'price': 2.0, 'category': "men's clothing"},
+        {'id': 3, 'price': 3.0},
+    ])
+    category = products.column('category')
+    assert isinstance(category, DictColumn)
+    # Las variantes raw normalizan al mismo valor y comparten código
+    assert list(category) == ["men's clothing", "men's clothing", None]
+    assert category.codes[0] == category.codes[1]
+
+    geography = transformer.transform_users([
+        {'id': i, 'address': {'city': ' kilcoole ', 'zipcode': '12926-3874 '}} for i in (1, 2)
+    ])['geography']
+    assert isinstance(geography.column('city'), DictColumn)
+    assert [row['city'] for row in geography] == ['Kilcoole', 'Kilcoole']
+    assert geography.column('zipcode').dictionary == ['12926-3874']
+
+
+@pytest.mark.parametrize('backend', ['python', 'pandas'])
+def test_price_index_accepts_product_id_key(backend):
+    from src.transform import create_transformer
+
+    # Productos ya normalizados (p. ej. del lookup o la landing) traen product_id en vez de id
+    products = [{'product_id': 3, 'price': 4.0}]
+    carts = [{'id': 1, 'userId': 1, 'date': '2020-03-02', 'products': [{'productId': 3, 'quantity': 2}]}]
+    sales = create_transformer({'etl': {'transform_backend': backend}}).transform_carts(carts, products)
+
+    assert sales[0]['unit_price'] == 4.0 and sales[0]['total_amount'] == 8.0
+
+
+def test_pandas_backend_matches_python_on_mixed_dates_and_id_keys(sample_config):
+    from datetime import datetime
+    from src.dates import DateService
+    from src.transform import create_transformer
+
+    python_backend = DataTransformer(sample_config)
+    pandas_backend = create_transformer({'etl': {'transform_backend': 'pandas'}})
+    python_backend.dates = pandas_backend.dates = DateService(now=datetime(2024, 5, 6, 12, 0))
+
+    products = [{'id': 1, 'price': 2.0}, {'product_id': 2, 'price': 3.0}]
+    items = [{'productId': 1, 'quantity': 1}, {'productId': 2, 'quantity': 2}]
+    carts = [
+        {'id': 1, 'userId': 1, 'date': 'invalid', 'products': items},
+        {'id': 2, 'userId': 1, 'date': '2020-01-02', 'products': items},
+        # Con offset: el día es el local del string, sin pasar a UTC
+        {'id': 3, 'userId': 2, 'date': '2020-03-02T23:00:00-05:00', 'products': items},
+        {'id': 4, 'userId': 2, 'products': items},
+    ]
+    expected = python_backend.transform_carts(carts, products)
+    actual = pandas_backend.transform_carts(carts, products)
+
+    assert actual == expected
+    assert [row['date_key'] for row in actual][::2] == [20240506, 20200102, 20200302, 20240506]
+    # Claves mixtas id/product_id: product_id sigue siendo entero
+    assert [row['product_id'] for row in pandas_backend.transform_products(products)] == [1, 2]
+    assert pandas_backend.transform_products(products) == python_backend.transform_products(products)
@@ -0,0 +1,44 @@
+import threading
+
+from src.writer import BackgroundWriter
+
+
+def test_writes_run_in_order_off_caller_thread():
+    writer = BackgroundWriter(max_pending=2)
+    gate = threading.Event()
+    done = []
+
+    writer.submit('slow', lambda: (gate.wait(5), done.append('slow')))
+    writer.submit('fast', done.append, 'fast')
+    # submit no espera a que la escritura termine
+    assert done == []
+
+    gate.set()
+    assert writer.flush() == []
+    assert done == ['slow', 'fast']
+    assert writer.stats['written'] == 2
+    writer.close()
+
+
+def test_errors_are_reported_on_flush():
+    writer = BackgroundWriter()
+
+    def fail():
+        raise OSError('disk full')
+
+    writer.submit('raw products', fail)
+    writer.submit('raw users', lambda: None)
+
+    assert writer.flush() == ['No se pudo guardar raw products: disk full']
+    assert writer.flush() == []
+    assert writer.stats['failed'] == 1
+    writer.close()
+
+
+def test_disabled_writer_runs_inline():
+    writer = BackgroundWriter(enabled=False)
+    done = []
+    writer.submit('x', done.append, 1)
+
+    assert done == [1]
+    assert writer.close() == []